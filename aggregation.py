@@ -0,0 +1,147 @@
+"""
+Forecast Aggregation Engine
+Vectorized daily summaries (min/max/mean, precipitation, dominant condition) for many locations at once
+"""
+
+from collections import namedtuple
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+from models import ForecastSlot, SECONDS_PER_DAY, WEEKDAY_NAMES
+from compact_forecast import CompactForecast
+
+# Slots of N locations flattened into parallel arrays; `location` indexes the input forecasts,
+# `condition` holds codes into the `conditions` vocabulary and `timezone_offset` is per location
+ForecastColumns = namedtuple('ForecastColumns', [
+    'location', 'dt', 'temp', 'temp_min', 'temp_max', 'precipitation', 'condition',
+    'conditions', 'timezone_offset'
+])
+
+_NUMERIC_FIELDS = {
+    name: (ForecastSlot._fields.index(name), dtype) for name, dtype in (
+        ('dt', np.int64), ('temp', np.float64), ('temp_min', np.float64),
+        ('temp_max', np.float64), ('precipitation', np.float64))
+}
+_CONDITION = ForecastSlot._fields.index('condition')
+
+# One row per (location, local day), sorted by location then day.
+# `day` counts local days since 1970-01-01; `condition` is the most frequent slot condition
+DailyAggregates = namedtuple('DailyAggregates', [
+    'location', 'day', 'temp_min', 'temp_max', 'temp_mean', 'precipitation', 'condition', 'slots'
+])
+
+def columns_from_forecasts(forecasts):
+    """Flatten Forecast records or CompactForecasts into ForecastColumns"""
+    forecasts = list(forecasts)
+    if forecasts and all(isinstance(f, CompactForecast) for f in forecasts):
+        return _columns_from_compact(forecasts)
+    counts = np.fromiter((len(f.slots) for f in forecasts), dtype=np.int64, count=len(forecasts))
+    slots = list(chain.from_iterable(f.slots for f in forecasts))
+    # One C-level pass per field; conditions are interned to small integer codes on the way
+    fields = {
+        name: np.fromiter(map(itemgetter(index), slots), dtype=dtype, count=len(slots))
+        for name, (index, dtype) in _NUMERIC_FIELDS.items()
+    }
+    vocabulary = {}
+    intern = vocabulary.setdefault
+    condition = np.fromiter((intern(slot[_CONDITION], len(vocabulary)) for slot in slots),
+                            dtype=np.int64, count=len(slots))
+    return ForecastColumns(
+        location=np.repeat(np.arange(len(forecasts)), counts),
+        condition=condition,
+        conditions=np.array(list(vocabulary), dtype=object),
+        timezone_offset=np.fromiter((f.timezone_offset or 0 for f in forecasts), dtype=np.int64,
+                                    count=len(forecasts)),
+        **fields
+    )
+
+def _columns_from_compact(forecasts):
+    """ForecastColumns from CompactForecasts: their arrays are concatenated without touching slots"""
+    counts = np.fromiter((len(f) for f in forecasts), dtype=np.int64, count=len(forecasts))
+    fields = {
+        name: np.concatenate([np.frombuffer(getattr(f, name), dtype=getattr(f, name).typecode)
+                              for f in forecasts]).astype(dtype, copy=False)
+        for name, (_, dtype) in _NUMERIC_FIELDS.items()
+    }
+    # Re-map each forecast's own condition codes onto one shared vocabulary
+    vocabulary = {}
+    intern = vocabulary.setdefault
+    condition = np.concatenate([
+        np.fromiter((intern(c, len(vocabulary)) for c in f.conditions), dtype=np.int64,
+                    count=len(f.conditions))[np.frombuffer(f.condition_code, dtype=np.uint8)]
+        for f in forecasts
+    ])
+    return ForecastColumns(
+        location=np.repeat(np.arange(len(forecasts)), counts),
+        condition=condition,
+        conditions=np.array(list(vocabulary), dtype=object),
+        timezone_offset=np.fromiter((f.timezone_offset for f in forecasts), dtype=np.int64,
+                                    count=len(forecasts)),
+        **fields
+    )
+
+def aggregate_daily(columns, max_days=None):
+    """Summarize ForecastColumns per location and local day in one vectorized pass"""
+    location = np.asarray(columns.location, dtype=np.int64)
+    if location.size == 0:
+        empty = np.empty(0)
+        return DailyAggregates(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                               empty, empty, empty, empty, np.empty(0, dtype=object), np.empty(0, dtype=np.int64))
+
+    # Local calendar day of every slot, using its location's UTC offset
+    offsets = np.asarray(columns.timezone_offset, dtype=np.int64)[location]
+    day = (np.asarray(columns.dt, dtype=np.int64) + offsets) // SECONDS_PER_DAY
+
+    # Sort by (location, day) so each group is one contiguous run
+    order = np.lexsort((day, location))
+    location, day = location[order], day[order]
+    temp = np.asarray(columns.temp, dtype=np.float64)[order]
+    temp_min = np.asarray(columns.temp_min, dtype=np.float64)[order]
+    temp_max = np.asarray(columns.temp_max, dtype=np.float64)[order]
+    precipitation = np.asarray(columns.precipitation, dtype=np.float64)[order]
+    condition = np.asarray(columns.condition, dtype=np.int64)[order]
+    vocabulary = np.asarray(columns.conditions, dtype=object)
+
+    new_group = np.empty(location.size, dtype=bool)
+    new_group[0] = True
+    new_group[1:] = (location[1:] != location[:-1]) | (day[1:] != day[:-1])
+    starts = np.flatnonzero(new_group)
+    group = np.cumsum(new_group) - 1
+    slots = np.diff(np.append(starts, location.size))
+
+    # Dominant condition: per-group histogram over the condition vocabulary
+    histogram = np.bincount(group * len(vocabulary) + condition,
+                            minlength=len(starts) * len(vocabulary)).reshape(len(starts), len(vocabulary))
+
+    result = DailyAggregates(
+        location=location[starts],
+        day=day[starts],
+        temp_min=np.minimum.reduceat(temp_min, starts),
+        temp_max=np.maximum.reduceat(temp_max, starts),
+        temp_mean=np.add.reduceat(temp, starts) / slots,
+        precipitation=np.add.reduceat(precipitation, starts),
+        condition=vocabulary[histogram.argmax(axis=1)],
+        slots=slots
+    )
+    if max_days is not None:
+        result = _first_days(result, max_days)
+    return result
+
+def _first_days(result, max_days):
+    """Keep each location's first max_days days"""
+    first_row = np.flatnonzero(np.r_[True, result.location[1:] != result.location[:-1]])
+    rank = np.arange(result.location.size) - np.repeat(first_row, np.diff(np.append(first_row, result.location.size)))
+    keep = rank < max_days
+    return DailyAggregates(*(field[keep] for field in result))
+
+def aggregate_forecasts(forecasts, max_days=None):
+    """Daily summaries for a list of Forecast records; row.location indexes the list"""
+    return aggregate_daily(columns_from_forecasts(forecasts), max_days=max_days)
+
+def to_frame(aggregates):
+    """DailyAggregates as a pandas DataFrame (with `date` and `weekday` columns)"""
+    import pandas as pd  # only reporting needs pandas; keep it off the aggregation import path
+    frame = pd.DataFrame(aggregates._asdict())
+    frame['date'] = pd.to_datetime(frame['day'], unit='D')
+    frame['weekday'] = np.asarray(WEEKDAY_NAMES, dtype=object)[frame['day'].to_numpy() % 7]
+    return frame
@@ -3,16 +3,25 @@ Weather App - Main Application
 A beautiful, minimalist weather application built with Streamlit
 """
 
+import time
+_imports_started = time.perf_counter()
+
 import streamlit as st
 import requests
 from utils import (
-    get_weather_icon, get_forecast_data, get_location_by_ip,
-    get_weather_by_coords, get_weather_by_city, process_forecast_data
+    get_condition_icon, get_location_by_ip, get_weather_and_forecast,
+    process_forecast_data
 )
+from gazetteer import get_gazetteer
+from history import HISTORY_ENABLED, get_history_store
+from metrics import start_metrics_exporter
+from profiler import note_import_time, run_profiled
 from templates import (
     load_css, render_weather_card, render_forecast_days, render_welcome_screen
 )
 
+note_import_time(time.perf_counter() - _imports_started)
+
 # Set page configuration
 st.set_page_config(
     page_title="Weather App - Live Weather Forecast",
@@ -21,6 +30,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Expose metrics on METRICS_PORT / METRICS_FILE if configured (once per process)
+start_metrics_exporter()
+
 # Load and apply CSS styles
 css_styles = load_css()
 st.markdown(f"<style>{css_styles}</style>", unsafe_allow_html=True)
@@ -31,6 +43,20 @@ def main():
     # Search inputs
     city = st.text_input("Search for a city", placeholder="Enter city name", label_visibility="collapsed")
 
+    # Suggestions from the offline gazetteer (skipped if no dump is installed)
+    place = None
+    gazetteer = get_gazetteer()
+    if city and gazetteer:
+        suggestions = gazetteer.search(city, k=5)
+        if suggestions:
+            place = st.selectbox(
+                "Suggestions",
+                [None] + suggestions,
+                index=1,
+                format_func=lambda p: f'Search "{city}"' if p is None else f"{p.name}, {p.country}",
+                label_visibility="collapsed"
+            )
+
     # Buttons below search bar
     col1, col2 = st.columns([1, 1])
     with col1:
@@ -55,38 +81,39 @@ def main():
     use_auto_location = st.session_state.get('auto_location', False)
 
     if (city and search_btn) or use_auto_location:
-        display_weather_data(city, use_auto_location)
+        display_weather_data(city, use_auto_location, place)
     else:
         # Display welcome screen
         welcome_html = render_welcome_screen()
         st.markdown(welcome_html, unsafe_allow_html=True)
 
-def display_weather_data(city, use_auto_location):
-    """Display weather data for the given city or auto-detected location"""
+def display_weather_data(city, use_auto_location, place=None):
+    """Display weather data for the given city, gazetteer place or auto-detected location"""
     
     try:
-        # Get weather data
+        # Get current weather and forecast together
         if use_auto_location:
-            current_lat = st.session_state.get('auto_lat')
-            current_lon = st.session_state.get('auto_lon')
-            current_data = get_weather_by_coords(current_lat, current_lon)
+            current_data, forecast_data = get_weather_and_forecast(
+                lat=st.session_state.get('auto_lat'),
+                lon=st.session_state.get('auto_lon')
+            )
             if current_data:
-                lat = current_lat
-                lon = current_lon
                 st.session_state['auto_location'] = False
             else:
                 st.error("❌ Could not get weather data for your location")
                 return
+        elif place:
+            # Gazetteer already knows the coordinates, so no geocoding round trip
+            current_data, forecast_data = get_weather_and_forecast(lat=place.lat, lon=place.lon)
+            if not current_data:
+                st.error("❌ Could not get weather data for this city. Please try again.")
+                return
         else:
-            current_data = get_weather_by_city(city)
+            current_data, forecast_data = get_weather_and_forecast(city=city)
             if not current_data:
                 st.error("❌ City not found or API error. Please check the city name and try again.")
                 return
-            lat = current_data['coord']['lat']
-            lon = current_data['coord']['lon']
         
-        # Get forecast data
-        forecast_data = get_forecast_data(lat, lon)
         forecast_list = process_forecast_data(forecast_data)
         
         # Render forecast days HTML
@@ -94,24 +121,43 @@ def display_weather_data(city, use_auto_location):
         
         # Render complete weather card
         weather_html = render_weather_card(
-            city_name=current_data['name'],
-            weather_icon=get_weather_icon(current_data['weather'][0]['main']),
-            temperature=current_data['main']['temp'],
-            min_temp=current_data['main']['temp_min'],
-            max_temp=current_data['main']['temp_max'],
-            description=current_data['weather'][0]['description'].title(),
+            city_name=place.name if place and not use_auto_location else current_data.name,
+            weather_icon=get_condition_icon(current_data.condition_id, current_data.icon, current_data.condition),
+            temperature=current_data.temp,
+            min_temp=current_data.temp_min,
+            max_temp=current_data.temp_max,
+            description=current_data.description.title(),
             forecast_days_html=forecast_days_html
         )
         
         # Display the weather card
         st.markdown(weather_html, unsafe_allow_html=True)
+        display_history(current_data)
         
     except requests.exceptions.RequestException:
         st.error("❌ Network error. Please check your internet connection and try again.")
-    except KeyError as e:
-        st.error(f"❌ Unexpected response format from weather API: {e}")
     except Exception as e:
         st.error(f"❌ An unexpected error occurred: {e}")
 
+def display_history(current_data, days=7):
+    """Chart the temperatures recorded locally for this location (no extra API calls)"""
+    if not HISTORY_ENABLED or current_data.lat is None:
+        return
+    try:
+        trend = get_history_store().downsample(
+            current_data.lat, current_data.lon, 3 * 3600, start=time.time() - days * 86400
+        )
+    except OSError:
+        return
+    if len(trend.start) < 2:
+        return
+    with st.expander(f"📈 Observed temperature, last {days} days"):
+        st.line_chart(
+            {'time': trend.start.astype('datetime64[s]'), 'min °C': trend.temp_min,
+             'mean °C': trend.temp_mean, 'max °C': trend.temp_max},
+            x='time', y=['min °C', 'mean °C', 'max °C']
+        )
+
 if __name__ == "__main__":
-    main()
+    # PROFILE_RERUNS=true, or an operator's ?<PROFILE_QUERY_PARAM>=<token>, profiles this rerun
+    run_profiled(main)
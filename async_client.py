@@ -0,0 +1,142 @@
+"""
+Async Weather Client
+asyncio-native counterparts of the utils.py fetchers, over the provider pool and httpx
+"""
+
+import asyncio
+import threading
+import httpx
+# close_async_client and get_async_client stay importable from here for existing callers
+from async_http import fetch_json, close_async_client, get_async_client
+from rate_limit import get_rate_limiter, RateLimitTimeout
+from resilience import CircuitOpenError
+from utils import (
+    API_KEY, GEOCODING_URL, IP_LOCATION_URL,
+    current_weather_cache, forecast_cache, geocode_store, _city_key, _coords_key
+)
+from geocode_store import NOT_FOUND
+from decoding import decode_geocode, decode_ip_location
+from compact_forecast import CompactForecast
+from providers import get_provider_pool, ProviderError, LocationNotFound
+from quota import get_quota_ledger, SAVED_CACHE
+from history import record_current
+
+# Failures an async fetcher turns into a None result
+FETCH_ERRORS = (httpx.HTTPError, ValueError, RateLimitTimeout, CircuitOpenError, ProviderError)
+
+async def _load(cache, key, fetch):
+    """Return a cached record or await fetch() and store its result, raising on failure"""
+    data = cache.get(key)
+    if data is not None:
+        get_quota_ledger().record_saved(SAVED_CACHE)
+    else:
+        data = await fetch()
+        cache.set(key, data)
+    return data
+
+async def _observe(pending):
+    """Await a provider's CurrentWeather and record it in the observation history
+
+    The history append (and an occasional compaction) is blocking file I/O, so it runs in a
+    worker thread rather than on the event loop serving the other fetches of a batch.
+    """
+    return await asyncio.to_thread(record_current, await pending)
+
+async def _compact(pending):
+    """Await a provider's Forecast and pack it into the CompactForecast the caches keep"""
+    return CompactForecast.from_forecast(await pending)
+
+async def _cached_fetch(cache, key, fetch):
+    """Return a cached record or fetch and store it; failures return None"""
+    try:
+        return await _load(cache, key, fetch)
+    except FETCH_ERRORS:
+        return None
+
+async def get_weather_by_city(city):
+    """Get CurrentWeather by city name"""
+    if geocode_store.lookup(city) is NOT_FOUND:
+        return None
+    try:
+        data = await _load(current_weather_cache, _city_key(city),
+                           lambda: _observe(get_provider_pool().current_by_city_async(city)))
+    except LocationNotFound:
+        geocode_store.record_missing(city)
+        return None
+    except FETCH_ERRORS:
+        return None
+    geocode_store.record(city, data.lat, data.lon, data.name)
+    return data
+
+async def get_weather_by_coords(lat, lon):
+    """Get CurrentWeather using coordinates"""
+    return await _cached_fetch(current_weather_cache, _coords_key('weather', lat, lon),
+                               lambda: _observe(get_provider_pool().current_by_coords_async(lat, lon)))
+
+async def get_forecast_data(lat, lon):
+    """Get the 5-day forecast as a CompactForecast"""
+    return await _cached_fetch(forecast_cache, _coords_key('forecast', lat, lon),
+                               lambda: _compact(get_provider_pool().forecast_async(lat, lon)))
+
+async def get_location_by_ip():
+    """Get approximate location using IP geolocation"""
+    try:
+        location = await fetch_json(IP_LOCATION_URL, decode=decode_ip_location)
+        if location:
+            return location
+    except FETCH_ERRORS:
+        pass
+    return None, None, None
+
+async def get_coordinates(city_name):
+    """Get coordinates for a city using OpenWeatherMap Geocoding API"""
+    cached = geocode_store.lookup(city_name)
+    if cached is NOT_FOUND:
+        return None, None, None
+    if cached:
+        return cached
+    params = {'q': city_name, 'limit': 1, 'appid': API_KEY}
+    try:
+        match = await fetch_json(GEOCODING_URL, params, decode_geocode, get_rate_limiter(API_KEY))
+    except FETCH_ERRORS:
+        return None, None, None
+    if match:
+        geocode_store.record(city_name, *match)
+        return match
+    geocode_store.record_missing(city_name)
+    return None, None, None
+
+async def get_weather_and_forecast(city=None, lat=None, lon=None):
+    """Get (CurrentWeather, Forecast), fetching both concurrently when coordinates are known"""
+    if lat is None or lon is None:
+        coords = geocode_store.lookup(city)
+        if coords is NOT_FOUND:
+            return None, None
+        if coords is None:
+            current_data = await get_weather_by_city(city)
+            if not current_data:
+                return None, None
+            return current_data, await get_forecast_data(current_data.lat, current_data.lon)
+        lat, lon = coords[0], coords[1]
+    current = get_weather_by_city(city) if city else get_weather_by_coords(lat, lon)
+    current_data, forecast_data = await asyncio.gather(current, get_forecast_data(lat, lon))
+    return current_data, forecast_data
+
+# Sync bridge: one background event loop shared by all synchronous callers
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_background_loop():
+    """Start the background event loop thread on first use"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='weather-async', daemon=True).start()
+                _loop = loop
+    return _loop
+
+def run_sync(coro, timeout=None):
+    """Run a coroutine on the shared background loop, e.g. run_sync(get_weather_by_city('London'))"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop()).result(timeout)
@@ -0,0 +1,117 @@
+"""
+Async HTTP Client for Weather App
+Pooled httpx clients per event loop, with the retry budget, circuit breakers and rate limiting of http_client.py
+"""
+
+import asyncio
+import time
+import weakref
+from urllib.parse import urlsplit
+import httpx
+from http_client import POOL_MAXSIZE, CONNECT_TIMEOUT, READ_TIMEOUT, redact
+from rate_limit import RateLimitTimeout, current_priority, BACKGROUND
+from resilience import get_circuit_breaker, backoff_delay, RETRY_ATTEMPTS, RETRY_BUDGET, RETRYABLE_STATUS
+from metrics import upstream_requests, upstream_in_flight
+from decoding import loads
+from quota import get_quota_ledger
+
+ASYNC_TIMEOUT = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+ASYNC_LIMITS = httpx.Limits(max_connections=POOL_MAXSIZE * 4, max_keepalive_connections=POOL_MAXSIZE)
+
+# httpx clients are bound to the event loop they were first used on
+_clients = weakref.WeakKeyDictionary()
+
+def get_async_client():
+    """Get the pooled AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=ASYNC_TIMEOUT, limits=ASYNC_LIMITS)
+        _clients[loop] = client
+    return client
+
+async def close_async_client():
+    """Close the AsyncClient for the running event loop"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+def _redacted(error):
+    """Copy of an httpx error with the API key masked in its message, which quotes the request URL"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return httpx.HTTPStatusError(redact(error), request=error.request, response=error.response)
+    if isinstance(error, httpx.RequestError):
+        return type(error)(redact(error), request=error.request)
+    return error
+
+async def _counted_get(url, host, endpoint, params, timeout):
+    """Send one upstream GET, counting it by endpoint and status and in the quota ledger"""
+    upstream_in_flight.inc()
+    status = 'error'
+    try:
+        response = await get_async_client().get(url, params=params, timeout=timeout)
+        status = str(response.status_code)
+        get_quota_ledger().record_call(endpoint, background=current_priority() >= BACKGROUND, host=host)
+        return response
+    finally:
+        upstream_in_flight.dec()
+        upstream_requests.inc(endpoint, status)
+
+async def fetch_json(url, params=None, decode=loads, limiter=None, max_wait=None):
+    """GET a URL and return decode(body), retrying under the host's circuit breaker within RETRY_BUDGET
+
+    With a limiter every attempt, retries included, waits for its own token: the first up to
+    max_wait, a retry only for what is left of the budget.
+    """
+    breaker = get_circuit_breaker(url)
+    parts = urlsplit(url)
+    host, endpoint = parts.netloc, parts.path
+    deadline = None
+    error = response = None
+    for attempt in range(RETRY_ATTEMPTS):
+        if limiter is not None:
+            if deadline is None:
+                await limiter.acquire_async(max_wait=max_wait)
+            else:
+                try:
+                    await limiter.acquire_async(max_wait=deadline - time.monotonic())
+                except RateLimitTimeout:
+                    break
+        if deadline is None:
+            deadline = time.monotonic() + RETRY_BUDGET
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        breaker.check()
+        timeout = httpx.Timeout(min(READ_TIMEOUT, remaining), connect=min(CONNECT_TIMEOUT, remaining))
+        error = response = retry_after = None
+        try:
+            response = await _counted_get(url, host, endpoint, params, timeout)
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            error = e
+        except BaseException:
+            # Cancelled or failed some other way: settle the call so a half-open probe is released
+            breaker.record_failure()
+            raise
+        else:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRYABLE_STATUS:
+                break
+            retry_after = response.headers.get('Retry-After')
+        delay = backoff_delay(attempt, retry_after)
+        if attempt + 1 >= RETRY_ATTEMPTS or time.monotonic() + delay >= deadline:
+            break
+        await asyncio.sleep(delay)
+    # Out of attempts, budget or quota: surface the last error or the last response's status,
+    # without the credentials in the URL they quote (callers hand these on, e.g. batch results)
+    if error is not None:
+        raise _redacted(error) from None
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise _redacted(e) from None
+    return decode(response.content)
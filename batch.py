@@ -0,0 +1,100 @@
+"""
+Batch Weather Lookups
+Fetch current weather for many cities or coordinates with bounded concurrency
+"""
+
+import asyncio
+import os
+from collections import namedtuple
+from async_client import _load, _observe, run_sync
+from providers import get_provider_pool, ProviderError, LocationNotFound
+from http_client import redact
+from rate_limit import request_priority, BACKGROUND
+from quota import get_quota_ledger, api_caller, SAVED_COALESCED
+from geocode_store import NOT_FOUND
+from utils import current_weather_cache, geocode_store, _city_key, _coords_key
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '10'))
+
+# One entry per input location, in input order; exactly one of data/error is set
+BatchResult = namedtuple('BatchResult', ['location', 'data', 'error'])
+
+def _location_key(location):
+    """Normalize a city name or (lat, lon) pair into a dedup/cache key"""
+    if isinstance(location, str):
+        if not location.strip():
+            raise ValueError("Empty city name")
+        return _city_key(location)
+    lat, lon = location
+    return _coords_key('weather', lat, lon)
+
+def _public_error(error):
+    """The error as batch callers get it; one whose message quotes credentials becomes a masked ProviderError"""
+    message = redact(error)
+    if message == str(error):
+        return error
+    return ProviderError(f"{type(error).__name__}: {message}")
+
+async def _fetch_location(location, key):
+    """Fetch current weather for one location, raising on failure"""
+    pool = get_provider_pool()
+    if isinstance(location, str):
+        if geocode_store.lookup(location) is NOT_FOUND:
+            raise LookupError(f"City not found: {location}")
+        fetch = lambda: _observe(pool.current_by_city_async(location))
+    else:
+        fetch = lambda: _observe(pool.current_by_coords_async(location[0], location[1]))
+    try:
+        data = await _load(current_weather_cache, key, fetch)
+    except LocationNotFound:
+        if isinstance(location, str):
+            geocode_store.record_missing(location)
+        raise
+    if isinstance(location, str):
+        geocode_store.record(location, data.lat, data.lon, data.name)
+    return data
+
+async def get_weather_for_cities_async(locations, max_concurrency=BATCH_CONCURRENCY):
+    """Get current weather for city names and/or (lat, lon) pairs as a list of BatchResult"""
+    locations = list(locations)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(location, key):
+        async with semaphore:
+            # Batch jobs queue behind interactive searches and wait as long as it takes for quota
+            with request_priority(BACKGROUND, max_wait=float('inf')), api_caller('batch'):
+                return await _fetch_location(location, key)
+
+    # Duplicate locations share one task
+    keys = []
+    tasks = {}
+    for location in locations:
+        try:
+            key = _location_key(location)
+        except (TypeError, ValueError) as e:
+            keys.append(e)
+            continue
+        keys.append(key)
+        if key not in tasks:
+            tasks[key] = asyncio.ensure_future(run(location, key))
+        else:
+            get_quota_ledger().record_saved(SAVED_COALESCED, caller='batch')
+
+    if tasks:
+        await asyncio.wait(tasks.values())
+
+    results = []
+    for location, key in zip(locations, keys):
+        if isinstance(key, Exception):
+            results.append(BatchResult(location, None, key))
+            continue
+        task = tasks[key]
+        if task.exception() is not None:
+            results.append(BatchResult(location, None, _public_error(task.exception())))
+        else:
+            results.append(BatchResult(location, task.result(), None))
+    return results
+
+def get_weather_for_cities(locations, max_concurrency=BATCH_CONCURRENCY):
+    """Synchronous wrapper around get_weather_for_cities_async"""
+    return run_sync(get_weather_for_cities_async(locations, max_concurrency))
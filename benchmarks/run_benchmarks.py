@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Weather App Microbenchmarks
+Times forecast decoding, storage and aggregation, icon lookup, template rendering, the full display
+path and the observation history
+
+Run: python benchmarks/run_benchmarks.py                  # print timings
+     python benchmarks/run_benchmarks.py --save main      # save as baseline "main"
+     python benchmarks/run_benchmarks.py --compare main   # report changes against it
+"""
+
+import argparse
+import atexit
+import copy
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINES_DIR = os.path.join(BENCH_DIR, 'baselines')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+# Keep the app's config modules offline and quiet while benchmarking
+os.environ.setdefault('OPENWEATHER_API_KEY', 'benchmark')
+os.environ.setdefault('GEOCODE_DB_PATH', ':memory:')
+os.environ.setdefault('HISTORY_ENABLED', 'false')
+
+# Forecast sizes: the API's 5 days of 3-hour slots, and far larger synthetic series
+FORECAST_SIZES = {
+    'realistic': 40,
+    'large': 2000,
+    'huge': 20000,
+}
+
+# Locations in the multi-location aggregation benchmarks
+AGGREGATION_LOCATIONS = 1000
+
+# Percent slowdown against the baseline reported as a regression
+DEFAULT_THRESHOLD = 10.0
+
+def load_fixture(name):
+    """Load a recorded API payload from benchmarks/fixtures"""
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def synthetic_forecast(slots):
+    """Stretch the recorded forecast to the given number of 3-hour slots"""
+    recorded = load_fixture('forecast.json')
+    pattern = recorded['list']
+    start = pattern[0]['dt']
+    items = []
+    for i in range(slots):
+        item = copy.deepcopy(pattern[i % len(pattern)])
+        item['dt'] = start + i * 10800
+        items.append(item)
+    recorded['list'] = items
+    recorded['cnt'] = slots
+    return recorded
+
+def build_benchmarks():
+    """Return [(name, callable)] for every benchmark"""
+    import utils
+    import templates
+    import decoding
+    import aggregation
+    from compact_forecast import CompactForecast
+    from incremental_forecast import IncrementalForecast
+    import conditions as condition_table
+
+    current = decoding.decode_current(load_fixture('current_weather.json'))
+    bodies = {size: json.dumps(synthetic_forecast(slots)).encode('utf-8')
+              for size, slots in FORECAST_SIZES.items()}
+    # The caches hold CompactForecasts, so that is what the aggregation and display paths see
+    forecasts = {size: decoding.decode_compact_forecast(body) for size, body in bodies.items()}
+    packed = forecasts['realistic'].to_bytes()
+    # Two consecutive refreshes: the window moves on by one 3-hour slot
+    slots = forecasts['realistic'].to_forecast().slots
+    successor = slots[-1]._replace(dt=slots[-1].dt + 10800)
+    refreshes = [forecasts['realistic'], CompactForecast.from_forecast(
+        forecasts['realistic'].to_forecast()._replace(slots=slots[1:] + [successor]))]
+    incremental = IncrementalForecast()
+    forecast_list = utils.process_forecast_data(forecasts['realistic'])
+    forecast_html = templates.render_forecast_days(forecast_list)
+    conditions = ['Clear', 'Clouds', 'Rain', 'Drizzle', 'Thunderstorm', 'Snow', 'Mist', 'Smoke', 'Tornado']
+
+    benchmarks = []
+    for size, body in bodies.items():
+        # json.loads is the pre-records baseline: a full nested dict per payload
+        benchmarks.append((f'json.loads[{size}]', lambda body=body: json.loads(body)))
+        benchmarks.append((f'decode_forecast[{size}]', lambda body=body: decoding.decode_forecast(body)))
+        benchmarks.append((f'decode_compact_forecast[{size}]',
+                           lambda body=body: decoding.decode_compact_forecast(body)))
+    for size, forecast in forecasts.items():
+        # A location's first aggregation, comparable with baselines from before the running aggregates
+        benchmarks.append((f'process_forecast_data[{size}]',
+                           lambda forecast=forecast: (utils.forecast_aggregates.clear(),
+                                                      utils.process_forecast_data(forecast))))
+    # A rerun on the same cached forecast, served from the location's running aggregate
+    benchmarks.append(('process_forecast_data[rerun]',
+                       lambda: utils.process_forecast_data(forecasts['realistic'])))
+    base = forecasts['realistic'].to_forecast()
+    many = [CompactForecast.from_forecast(base._replace(lat=base.lat + i)) for i in range(AGGREGATION_LOCATIONS)]
+    benchmarks += [
+        # One Python pass per location against a single vectorized pass over all of them
+        (f'process_forecast_data[{AGGREGATION_LOCATIONS} locations]',
+         lambda: (utils.forecast_aggregates.clear(),
+                  [utils.process_forecast_data(forecast) for forecast in many])),
+        (f'aggregate_forecasts[{AGGREGATION_LOCATIONS} locations]',
+         lambda: aggregation.aggregate_forecasts(many, max_days=5)),
+    ]
+    benchmarks += [
+        # Alternating between the two applies one retired and one new slot per call
+        ('IncrementalForecast.update[next refresh]',
+         lambda: incremental.update(refreshes[incremental.updates % 2], max_days=5)),
+        ('IncrementalForecast.update[full rebuild]',
+         lambda: IncrementalForecast().update(refreshes[0], max_days=5)),
+        ('CompactForecast.to_bytes[realistic]', forecasts['realistic'].to_bytes),
+        ('CompactForecast.from_bytes[realistic]', lambda: CompactForecast.from_bytes(packed)),
+        ('get_weather_icon[all conditions]',
+         lambda: [utils.get_weather_icon(c) for c in conditions]),
+        ('classify[all conditions]',
+         lambda: [condition_table.classify(row[0], row[3] + 'd') for row in condition_table.CONDITIONS]),
+        ('classify_many[huge]',
+         lambda: condition_table.classify_many(forecasts['huge'].condition_id)),
+        ('render_forecast_days[5 days]', lambda: templates.render_forecast_days(forecast_list)),
+        ('render_weather_card', lambda: templates.render_weather_card(
+            current.name, '☀️', current.temp, current.temp_min,
+            current.temp_max, current.description.title(), forecast_html)),
+        ('load_css', templates.load_css),
+        ('load_template', lambda: templates.load_template('weather_card.html')),
+    ]
+    benchmarks += build_display_benchmarks(current, forecasts)
+    benchmarks += build_history_benchmarks(current)
+    return benchmarks
+
+def build_history_benchmarks(current, days=365):
+    """Benchmark the observation history on a year of hourly observations in a temporary directory"""
+    import time
+    from history import HistoryStore
+
+    root = tempfile.mkdtemp(prefix='weather-history-')
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    store = HistoryStore(root)
+    now = int(time.time())
+    start = now - days * 86400
+    for t in range(start, now, 3600):
+        store.record(current.lat, current.lon, t, current.temp + (t // 3600) % 24 / 4, current.condition_id)
+    store.compact(current.lat, current.lon)
+    print(f"ℹ️ History: {days} days of hourly observations in {store.disk_usage(current.lat, current.lon):,} bytes")
+    clock = [now]
+
+    def record():
+        clock[0] += 1
+        store.record(current.lat + 1, current.lon, clock[0], current.temp, current.condition_id)
+
+    return [
+        ('history.record', record),
+        ('history.scan[1 year]', lambda: store.scan(current.lat, current.lon, start, now)),
+        ('history.scan[1 week]', lambda: store.scan(current.lat, current.lon, now - 7 * 86400, now)),
+        ('history.downsample[1 year daily]',
+         lambda: store.downsample(current.lat, current.lon, 86400, start, now)),
+    ]
+
+def build_display_benchmarks(current, forecasts):
+    """Benchmark app.display_weather_data with the network replaced by decoded recorded payloads"""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            import app
+        # Bare-mode Streamlit warns on every element; its loggers set their own levels
+        for name in list(logging.root.manager.loggerDict):
+            if name.startswith('streamlit'):
+                logging.getLogger(name).setLevel(logging.ERROR)
+    except ImportError as e:
+        print(f"⚠️ Skipping display_weather_data benchmarks: {e}")
+        return []
+
+    benchmarks = []
+    for size in ('realistic', 'large'):
+        forecast = forecasts[size]
+        def run(forecast=forecast):
+            app.get_weather_and_forecast = lambda **kwargs: (current, forecast)
+            app.display_weather_data(current.name, False)
+        benchmarks.append((f'display_weather_data[{size}]', run))
+    return benchmarks
+
+def measure(func, repeat=5, min_time=0.2):
+    """Seconds per call: best and median over `repeat` runs of an auto-sized loop"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {'best': min(runs), 'median': statistics.median(runs), 'loops': number}
+
+def format_time(seconds):
+    """Human-readable duration"""
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def run_all(pattern=None, repeat=5):
+    """Run the benchmarks whose name contains pattern and return their results"""
+    results = {}
+    for name, func in build_benchmarks():
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(func, repeat=repeat)
+        print(f"{name:<40} {format_time(results[name]['best']):>12}  "
+              f"(median {format_time(results[name]['median'])}, {results[name]['loops']} loops)")
+    return results
+
+def baseline_path(label):
+    return os.path.join(BASELINES_DIR, f"{label}.json")
+
+def save_baseline(label, results):
+    """Write results to benchmarks/baselines/<label>.json"""
+    os.makedirs(BASELINES_DIR, exist_ok=True)
+    payload = {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    with open(baseline_path(label), 'w', encoding='utf-8') as file:
+        json.dump(payload, file, indent=2, sort_keys=True)
+    print(f"\n💾 Saved baseline '{label}' to {baseline_path(label)}")
+
+def compare(label, results, threshold=DEFAULT_THRESHOLD):
+    """Print a comparison against a saved baseline; return the names that regressed"""
+    with open(baseline_path(label), 'r', encoding='utf-8') as file:
+        baseline = json.load(file)['results']
+
+    print(f"\n📊 Compared with baseline '{label}' (best of runs, threshold {threshold:g}%)")
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {'-':>12} {format_time(result['best']):>12} {'new':>9}")
+            continue
+        before, after = baseline[name]['best'], result['best']
+        change = (after - before) / before * 100
+        marker = ''
+        if change > threshold:
+            marker = ' ❌ slower'
+            regressions.append(name)
+        elif change < -threshold:
+            marker = ' ✅ faster'
+        print(f"{name:<40} {format_time(before):>12} {format_time(after):>12} {change:>+8.1f}%{marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the weather app microbenchmarks")
+    parser.add_argument('-k', dest='pattern', help="only run benchmarks whose name contains this")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', metavar='LABEL', help="save results as a baseline")
+    parser.add_argument('--compare', metavar='LABEL', help="compare results with a saved baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="percent slowdown reported as a regression")
+    args = parser.parse_args()
+
+    results = run_all(args.pattern, args.repeat)
+    if args.save:
+        save_baseline(args.save, results)
+    if args.compare:
+        regressions = compare(args.compare, results, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
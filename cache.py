@@ -0,0 +1,111 @@
+"""
+Response Cache for Weather App
+Size-bounded, TTL-expiring in-process cache for API responses
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Entry states returned by TTLCache.lookup()
+FRESH = 'fresh'        # younger than ttl
+STALE = 'stale'        # past ttl but within max_stale: serve and refresh in background
+EXPIRED = 'expired'    # past max_stale but within stale_if_error: only serve if upstream fails
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL, optionally kept longer for stale serving"""
+
+    def __init__(self, maxsize, ttl, name='cache', max_stale=0, stale_if_error=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.max_stale = max_stale
+        self.stale_if_error = stale_if_error
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.stale_fallbacks = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _state(self, age):
+        """Classify an entry by age, or None if it is too old to keep"""
+        if age < self.ttl:
+            return FRESH
+        if age < self.ttl + self.max_stale:
+            return STALE
+        if age < self.ttl + self.stale_if_error:
+            return EXPIRED
+        return None
+
+    def lookup(self, key):
+        """Return (value, state) for key, or (None, None) if missing"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            value, stored_at = entry
+            state = self._state(now - stored_at)
+            if state is None:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None, None
+            self._data.move_to_end(key)
+            if state == FRESH:
+                self.hits += 1
+            elif state == STALE:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+            return value, state
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        value, state = self.lookup(key)
+        return value if state == FRESH else None
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        stored_at = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def record_stale_fallback(self):
+        """Count an expired entry served because the upstream call failed"""
+        with self._lock:
+            self.stale_fallbacks += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return hit/miss/eviction counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'stale_fallbacks': self.stale_fallbacks,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else 0.0
+            }
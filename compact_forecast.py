@@ -0,0 +1,269 @@
+"""
+Compact Forecast Storage for Weather App
+Array-backed forecasts for caches and batch jobs, with slot and day views and a bytes format
+"""
+
+import math
+import struct
+import sys
+from array import array
+from models import ForecastSlot, Forecast, SECONDS_PER_DAY, weekday_name
+
+# Column name -> array typecode. Timestamps are unsigned 32-bit (good until 2106), temperatures
+# and precipitation float32 (ample for the API's 0.01 precision); condition and icon are codes
+# into per-forecast vocabularies of interned strings
+COLUMNS = (
+    ('dt', 'I'),
+    ('temp', 'f'),
+    ('temp_min', 'f'),
+    ('temp_max', 'f'),
+    ('precipitation', 'f'),
+    ('condition_id', 'H'),
+    ('condition_code', 'B'),
+    ('icon_code', 'B'),
+)
+
+# magic, lat, lon, timezone_offset, slots; then the provider, conditions and icons
+# string lists (count, byte length, NUL-joined UTF-8) and the columns in COLUMNS order
+_MAGIC = b'WFC1'
+_HEADER = struct.Struct('<4sddiI')
+_STRINGS = struct.Struct('<II')
+
+def _pack_strings(strings):
+    encoded = '\0'.join(strings).encode('utf-8')
+    return _STRINGS.pack(len(strings), len(encoded)) + encoded
+
+def _unpack_strings(view, offset):
+    """Return (strings, next offset)"""
+    count, length = _STRINGS.unpack_from(view, offset)
+    offset += _STRINGS.size
+    if offset + length > len(view):
+        raise ValueError("truncated compact forecast")
+    text = bytes(view[offset:offset + length]).decode('utf-8')
+    return (text.split('\0') if count else []), offset + length
+
+class SlotView:
+    """One 3-hour slot of a CompactForecast, with the same attributes as ForecastSlot"""
+
+    __slots__ = ('_forecast', '_index')
+
+    def __init__(self, forecast, index):
+        self._forecast = forecast
+        self._index = index
+
+    @property
+    def dt(self):
+        return self._forecast.dt[self._index]
+
+    @property
+    def temp(self):
+        return self._forecast.temp[self._index]
+
+    @property
+    def temp_min(self):
+        return self._forecast.temp_min[self._index]
+
+    @property
+    def temp_max(self):
+        return self._forecast.temp_max[self._index]
+
+    @property
+    def condition(self):
+        return self._forecast.conditions[self._forecast.condition_code[self._index]]
+
+    @property
+    def condition_id(self):
+        return self._forecast.condition_id[self._index]
+
+    @property
+    def icon(self):
+        return self._forecast.icons[self._forecast.icon_code[self._index]]
+
+    @property
+    def precipitation(self):
+        return self._forecast.precipitation[self._index]
+
+    def to_slot(self):
+        """Copy out as a ForecastSlot"""
+        return ForecastSlot(self.dt, self.temp, self.temp_min, self.temp_max, self.condition,
+                            self.condition_id, self.icon, self.precipitation)
+
+    def __repr__(self):
+        return f"SlotView({self.to_slot()!r})"
+
+class DayView:
+    """The slots of one local calendar day of a CompactForecast (slot indexes start:stop)"""
+
+    __slots__ = ('_forecast', 'day', 'start', 'stop')
+
+    def __init__(self, forecast, day, start, stop):
+        self._forecast = forecast
+        self.day = day
+        self.start = start
+        self.stop = stop
+
+    @property
+    def weekday(self):
+        return weekday_name(self.day)
+
+    @property
+    def min_temp(self):
+        return min(self._forecast.temp[self.start:self.stop])
+
+    @property
+    def max_temp(self):
+        return max(self._forecast.temp[self.start:self.stop])
+
+    @property
+    def precipitation(self):
+        return sum(self._forecast.precipitation[self.start:self.stop])
+
+    @property
+    def condition(self):
+        """Condition of the day's first slot"""
+        return self._forecast.conditions[self._forecast.condition_code[self.start]]
+
+    @property
+    def slots(self):
+        return [SlotView(self._forecast, i) for i in range(self.start, self.stop)]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __repr__(self):
+        return f"DayView(day={self.day}, weekday={self.weekday!r}, slots={self.start}:{self.stop})"
+
+class CompactForecast:
+    """A Forecast stored as parallel typed arrays; treat instances as read-only so caches can share them"""
+
+    __slots__ = ('lat', 'lon', 'timezone_offset', 'provider', 'conditions', 'icons') + tuple(
+        name for name, _ in COLUMNS)
+
+    def __init__(self, lat, lon, timezone_offset, provider, conditions, icons, **columns):
+        self.lat = lat
+        self.lon = lon
+        self.timezone_offset = timezone_offset or 0
+        self.provider = provider
+        self.conditions = tuple(map(sys.intern, conditions))
+        self.icons = tuple(map(sys.intern, icons))
+        for name, typecode in COLUMNS:
+            setattr(self, name, columns.get(name) or array(typecode))
+
+    @classmethod
+    def from_forecast(cls, forecast):
+        """Pack a Forecast (or another CompactForecast, returned as is)"""
+        if isinstance(forecast, cls):
+            return forecast
+        if forecast.slots:
+            dt, temp, temp_min, temp_max, condition, condition_id, icon, precipitation = zip(*forecast.slots)
+        else:
+            dt = temp = temp_min = temp_max = condition = condition_id = icon = precipitation = ()
+        conditions = {}
+        icons = {}
+        return cls(
+            forecast.lat, forecast.lon, forecast.timezone_offset, forecast.provider, conditions, icons,
+            dt=array('I', dt),
+            temp=array('f', temp),
+            temp_min=array('f', temp_min),
+            temp_max=array('f', temp_max),
+            precipitation=array('f', precipitation),
+            condition_id=array('H', condition_id),
+            condition_code=array('B', [conditions.setdefault(c, len(conditions)) for c in condition]),
+            icon_code=array('B', [icons.setdefault(i, len(icons)) for i in icon])
+        )
+
+    def to_forecast(self):
+        """Unpack into a Forecast of ForecastSlot records"""
+        return Forecast(self.lat, self.lon, self.timezone_offset, [slot.to_slot() for slot in self],
+                        self.provider)
+
+    def __len__(self):
+        return len(self.dt)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.dt)
+        if not 0 <= index < len(self.dt):
+            raise IndexError("slot index out of range")
+        return SlotView(self, index)
+
+    def __iter__(self):
+        return (SlotView(self, i) for i in range(len(self.dt)))
+
+    @property
+    def slots(self):
+        """Slot views, so a CompactForecast can stand in for a Forecast"""
+        return list(self)
+
+    def days(self, max_days=None):
+        """DayView per local calendar day (by timezone_offset), first max_days of them"""
+        starts = []
+        days = []
+        offset = self.timezone_offset
+        current = None
+        for index, dt in enumerate(self.dt):
+            day = (dt + offset) // SECONDS_PER_DAY
+            if day != current:
+                if len(days) == max_days:
+                    break
+                current = day
+                days.append(day)
+                starts.append(index)
+        else:
+            index = len(self.dt)
+        stops = starts[1:] + [index]
+        return [DayView(self, day, start, stop) for day, start, stop in zip(days, starts, stops)]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column arrays"""
+        return sum(getattr(self, name).itemsize * len(getattr(self, name)) for name, _ in COLUMNS)
+
+    def to_bytes(self):
+        """Serialize to a self-describing little-endian byte string"""
+        lat = math.nan if self.lat is None else self.lat
+        lon = math.nan if self.lon is None else self.lon
+        parts = [_HEADER.pack(_MAGIC, lat, lon, self.timezone_offset, len(self.dt))]
+        for strings in ([self.provider] if self.provider else [], self.conditions, self.icons):
+            parts.append(_pack_strings(strings))
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            if sys.byteorder == 'big':
+                column = array(column.typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Deserialize the output of to_bytes(), raising ValueError if it is malformed"""
+        view = memoryview(data)
+        try:
+            magic, lat, lon, timezone_offset, count = _HEADER.unpack_from(view)
+            if magic != _MAGIC:
+                raise ValueError("not a compact forecast")
+            offset = _HEADER.size
+            provider, offset = _unpack_strings(view, offset)
+            conditions, offset = _unpack_strings(view, offset)
+            icons, offset = _unpack_strings(view, offset)
+            columns = {}
+            for name, typecode in COLUMNS:
+                column = array(typecode)
+                size = column.itemsize * count
+                if offset + size > len(view):
+                    raise ValueError("truncated compact forecast")
+                column.frombytes(view[offset:offset + size])
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                columns[name] = column
+                offset += size
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"malformed compact forecast: {e}") from e
+        return cls(
+            None if math.isnan(lat) else lat, None if math.isnan(lon) else lon, timezone_offset,
+            provider[0] if provider else None, conditions, icons, **columns
+        )
+
+    def __repr__(self):
+        return (f"CompactForecast(lat={self.lat}, lon={self.lon}, timezone_offset={self.timezone_offset}, "
+                f"slots={len(self.dt)}, provider={self.provider!r})")
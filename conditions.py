@@ -0,0 +1,226 @@
+"""
+Weather Condition Table
+Icon, background, day/night flag and severity for every OpenWeatherMap condition id, precomputed at import
+"""
+
+from collections import defaultdict, namedtuple
+
+# How disruptive a condition is, for sorting and alerting
+SEVERITY_NONE = 0
+SEVERITY_LIGHT = 1
+SEVERITY_MODERATE = 2
+SEVERITY_SEVERE = 3
+SEVERITY_EXTREME = 4
+
+# icon: per condition group (the app cards); emoji: per OpenWeatherMap icon code, so it
+# tells day from night and few from many clouds; background: CSS gradient for the page
+ConditionStyle = namedtuple('ConditionStyle', [
+    'id', 'group', 'description', 'icon', 'emoji', 'background', 'is_day', 'severity'
+])
+
+# Vectorized lookup result: one array per ConditionStyle field that varies
+ConditionArrays = namedtuple('ConditionArrays', ['group', 'icon', 'emoji', 'background', 'is_day', 'severity'])
+
+DEFAULT_ICON = '🌤️'
+
+# https://openweathermap.org/weather-conditions: (id, group, description, icon number, severity)
+CONDITIONS = (
+    (200, 'Thunderstorm', 'thunderstorm with light rain', '11', SEVERITY_MODERATE),
+    (201, 'Thunderstorm', 'thunderstorm with rain', '11', SEVERITY_SEVERE),
+    (202, 'Thunderstorm', 'thunderstorm with heavy rain', '11', SEVERITY_SEVERE),
+    (210, 'Thunderstorm', 'light thunderstorm', '11', SEVERITY_MODERATE),
+    (211, 'Thunderstorm', 'thunderstorm', '11', SEVERITY_SEVERE),
+    (212, 'Thunderstorm', 'heavy thunderstorm', '11', SEVERITY_EXTREME),
+    (221, 'Thunderstorm', 'ragged thunderstorm', '11', SEVERITY_SEVERE),
+    (230, 'Thunderstorm', 'thunderstorm with light drizzle', '11', SEVERITY_MODERATE),
+    (231, 'Thunderstorm', 'thunderstorm with drizzle', '11', SEVERITY_SEVERE),
+    (232, 'Thunderstorm', 'thunderstorm with heavy drizzle', '11', SEVERITY_SEVERE),
+    (300, 'Drizzle', 'light intensity drizzle', '09', SEVERITY_LIGHT),
+    (301, 'Drizzle', 'drizzle', '09', SEVERITY_LIGHT),
+    (302, 'Drizzle', 'heavy intensity drizzle', '09', SEVERITY_MODERATE),
+    (310, 'Drizzle', 'light intensity drizzle rain', '09', SEVERITY_LIGHT),
+    (311, 'Drizzle', 'drizzle rain', '09', SEVERITY_LIGHT),
+    (312, 'Drizzle', 'heavy intensity drizzle rain', '09', SEVERITY_MODERATE),
+    (313, 'Drizzle', 'shower rain and drizzle', '09', SEVERITY_MODERATE),
+    (314, 'Drizzle', 'heavy shower rain and drizzle', '09', SEVERITY_MODERATE),
+    (321, 'Drizzle', 'shower drizzle', '09', SEVERITY_LIGHT),
+    (500, 'Rain', 'light rain', '10', SEVERITY_LIGHT),
+    (501, 'Rain', 'moderate rain', '10', SEVERITY_MODERATE),
+    (502, 'Rain', 'heavy intensity rain', '10', SEVERITY_SEVERE),
+    (503, 'Rain', 'very heavy rain', '10', SEVERITY_SEVERE),
+    (504, 'Rain', 'extreme rain', '10', SEVERITY_EXTREME),
+    (511, 'Rain', 'freezing rain', '13', SEVERITY_SEVERE),
+    (520, 'Rain', 'light intensity shower rain', '09', SEVERITY_LIGHT),
+    (521, 'Rain', 'shower rain', '09', SEVERITY_MODERATE),
+    (522, 'Rain', 'heavy intensity shower rain', '09', SEVERITY_SEVERE),
+    (531, 'Rain', 'ragged shower rain', '09', SEVERITY_MODERATE),
+    (600, 'Snow', 'light snow', '13', SEVERITY_LIGHT),
+    (601, 'Snow', 'snow', '13', SEVERITY_MODERATE),
+    (602, 'Snow', 'heavy snow', '13', SEVERITY_SEVERE),
+    (611, 'Snow', 'sleet', '13', SEVERITY_MODERATE),
+    (612, 'Snow', 'light shower sleet', '13', SEVERITY_LIGHT),
+    (613, 'Snow', 'shower sleet', '13', SEVERITY_MODERATE),
+    (615, 'Snow', 'light rain and snow', '13', SEVERITY_LIGHT),
+    (616, 'Snow', 'rain and snow', '13', SEVERITY_MODERATE),
+    (620, 'Snow', 'light shower snow', '13', SEVERITY_LIGHT),
+    (621, 'Snow', 'shower snow', '13', SEVERITY_MODERATE),
+    (622, 'Snow', 'heavy shower snow', '13', SEVERITY_SEVERE),
+    (701, 'Mist', 'mist', '50', SEVERITY_LIGHT),
+    (711, 'Smoke', 'smoke', '50', SEVERITY_MODERATE),
+    (721, 'Haze', 'haze', '50', SEVERITY_LIGHT),
+    (731, 'Dust', 'sand/dust whirls', '50', SEVERITY_MODERATE),
+    (741, 'Fog', 'fog', '50', SEVERITY_MODERATE),
+    (751, 'Sand', 'sand', '50', SEVERITY_MODERATE),
+    (761, 'Dust', 'dust', '50', SEVERITY_MODERATE),
+    (762, 'Ash', 'volcanic ash', '50', SEVERITY_SEVERE),
+    (771, 'Squall', 'squalls', '50', SEVERITY_SEVERE),
+    (781, 'Tornado', 'tornado', '50', SEVERITY_EXTREME),
+    (800, 'Clear', 'clear sky', '01', SEVERITY_NONE),
+    (801, 'Clouds', 'few clouds', '02', SEVERITY_NONE),
+    (802, 'Clouds', 'scattered clouds', '03', SEVERITY_NONE),
+    (803, 'Clouds', 'broken clouds', '04', SEVERITY_NONE),
+    (804, 'Clouds', 'overcast clouds', '04', SEVERITY_NONE),
+)
+
+# Icon by condition group keyword, first match wins (unknown groups get DEFAULT_ICON)
+GROUP_ICONS = (
+    ('clear', '☀️'),
+    ('clouds', '☁️'),
+    ('rain', '🌧️'),
+    ('drizzle', '🌦️'),
+    ('thunderstorm', '⛈️'),
+    ('snow', '❄️'),
+    ('mist', '🌫️'),
+    ('fog', '🌫️'),
+    ('haze', '🌫️'),
+)
+
+# Emoji by OpenWeatherMap icon code
+ICON_EMOJI = {
+    '01d': '☀️', '01n': '🌙',
+    '02d': '⛅', '02n': '☁️',
+    '03d': '☁️', '03n': '☁️',
+    '04d': '☁️', '04n': '☁️',
+    '09d': '🌧️', '09n': '🌧️',
+    '10d': '🌦️', '10n': '🌧️',
+    '11d': '⛈️', '11n': '⛈️',
+    '13d': '❄️', '13n': '❄️',
+    '50d': '🌫️', '50n': '🌫️',
+}
+
+# Page backgrounds by description keyword, first match wins
+CLEAR_DAY_BACKGROUND = "linear-gradient(135deg, #74b9ff 0%, #0984e3 50%, #fdcb6e 100%)"
+CLEAR_NIGHT_BACKGROUND = "linear-gradient(135deg, #2d3436 0%, #636e72 50%, #74b9ff 100%)"
+DESCRIPTION_BACKGROUNDS = (
+    ('cloud', "linear-gradient(135deg, #636e72 0%, #74b9ff 50%, #ddd 100%)"),
+    ('rain', "linear-gradient(135deg, #2d3436 0%, #636e72 50%, #74b9ff 100%)"),
+    ('snow', "linear-gradient(135deg, #ddd 0%, #74b9ff 50%, #fff 100%)"),
+)
+DEFAULT_BACKGROUND = "linear-gradient(135deg, #667eea 0%, #764ba2 100%)"
+
+def _keyword_icon(text):
+    """Group icon by keyword (the rule the table is built from)"""
+    text = text.lower()
+    for keyword, icon in GROUP_ICONS:
+        if keyword in text:
+            return icon
+    return DEFAULT_ICON
+
+def _background(description, is_day):
+    if 'clear' in description:
+        return CLEAR_DAY_BACKGROUND if is_day else CLEAR_NIGHT_BACKGROUND
+    for keyword, background in DESCRIPTION_BACKGROUNDS:
+        if keyword in description:
+            return background
+    return DEFAULT_BACKGROUND
+
+def _style(condition_id, group, description, icon_number, severity, is_day):
+    return ConditionStyle(
+        id=condition_id,
+        group=group,
+        description=description,
+        icon=_keyword_icon(group),
+        emoji=ICON_EMOJI.get(f"{icon_number}{'d' if is_day else 'n'}", DEFAULT_ICON),
+        background=_background(description, is_day),
+        is_day=is_day,
+        severity=severity
+    )
+
+# (condition id, is_day) -> ConditionStyle
+_BY_ID = {
+    (row[0], is_day): _style(*row, is_day)
+    for row in CONDITIONS for is_day in (True, False)
+}
+# icon code -> ConditionStyle of the first condition drawn with that icon
+_BY_ICON = {}
+for _row in CONDITIONS:
+    for _suffix, _is_day in (('d', True), ('n', False)):
+        _BY_ICON.setdefault(_row[3] + _suffix, _BY_ID[(_row[0], _is_day)])
+# condition group name (lower case) -> icon; grows with unknown names seen at run time
+_ICON_BY_NAME = {row[1].lower(): _keyword_icon(row[1]) for row in CONDITIONS}
+
+# condition id -> severity; unknown ids read as SEVERITY_NONE
+_SEVERITY_BY_ID = defaultdict(int, {row[0]: row[4] for row in CONDITIONS})
+
+UNKNOWN_DAY = ConditionStyle(0, '', '', DEFAULT_ICON, DEFAULT_ICON, DEFAULT_BACKGROUND, True, SEVERITY_NONE)
+UNKNOWN_NIGHT = UNKNOWN_DAY._replace(is_day=False)
+
+def classify(condition_id, icon_code=None):
+    """ConditionStyle for a condition id; a night icon code ('..n') selects the night variant"""
+    is_day = not (icon_code and icon_code[-1] == 'n')
+    style = _BY_ID.get((condition_id, is_day))
+    if style is None:
+        return UNKNOWN_DAY if is_day else UNKNOWN_NIGHT
+    return style
+
+def most_severe(condition_ids):
+    """The most severe of a run of condition ids, the earliest of equally severe ones"""
+    # max() keeps the first maximum; dict.fromkeys drops repeats but keeps first-seen order
+    return max(dict.fromkeys(condition_ids), key=_SEVERITY_BY_ID.__getitem__)
+
+def classify_icon(icon_code):
+    """ConditionStyle for an OpenWeatherMap icon code such as '10d'"""
+    style = _BY_ICON.get(icon_code)
+    if style is None:
+        return UNKNOWN_NIGHT if icon_code and icon_code[-1] == 'n' else UNKNOWN_DAY
+    return style
+
+def icon_for_condition(name):
+    """Group icon for a condition name such as 'Rain' (for records that carry no id)"""
+    icon = _ICON_BY_NAME.get(name)
+    if icon is None:
+        icon = _ICON_BY_NAME.get(name.lower())
+        if icon is None:
+            icon = _keyword_icon(name)
+        # Provider-specific spellings are few; remember each after its first keyword scan
+        _ICON_BY_NAME[name] = icon
+    return icon
+
+_arrays = None
+
+def _lookup_arrays():
+    """Dense id-indexed tables for classify_many, built on first use"""
+    global _arrays
+    if _arrays is None:
+        import numpy as np  # only vectorized callers need numpy
+        styles = [UNKNOWN_DAY, UNKNOWN_NIGHT] + [_BY_ID[(row[0], is_day)]
+                                                 for row in CONDITIONS for is_day in (True, False)]
+        row_of_id = np.zeros(1000, dtype=np.int16)
+        for index, row in enumerate(CONDITIONS):
+            row_of_id[row[0]] = 2 + 2 * index
+        columns = {
+            field: np.array([getattr(style, field) for style in styles],
+                            dtype=np.int8 if field == 'severity' else bool if field == 'is_day' else object)
+            for field in ConditionArrays._fields
+        }
+        _arrays = (row_of_id, columns)
+    return _arrays
+
+def classify_many(condition_ids, is_day=True):
+    """Vectorized classify(): ConditionArrays for an array of ids and a day/night flag (scalar or array)"""
+    import numpy as np
+    row_of_id, columns = _lookup_arrays()
+    ids = np.asarray(condition_ids, dtype=np.int64)
+    rows = np.where((ids >= 0) & (ids < len(row_of_id)), row_of_id[np.clip(ids, 0, len(row_of_id) - 1)], 0)
+    rows = rows + ~np.asarray(is_day, dtype=bool)  # night variants follow their day rows
+    return ConditionArrays(*(columns[field][rows] for field in ConditionArrays._fields))
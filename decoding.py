@@ -0,0 +1,124 @@
+"""
+Payload Decoding for Weather App
+Fast JSON parsing straight into the compact records in models.py, validating shape on the way
+"""
+
+import json
+from metrics import timed
+from models import CurrentWeather, ForecastSlot, Forecast
+from compact_forecast import CompactForecast
+
+# Largest values of the CompactForecast columns the slots end up in: unsigned 32-bit
+# timestamps and unsigned 16-bit condition ids
+MAX_TIMESTAMP = 0xFFFFFFFF
+MAX_CONDITION_ID = 0xFFFF
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; the stdlib parser gives the same results, slower
+    _loads = json.loads
+
+class DecodeError(ValueError):
+    """Raised when a payload is not JSON or lacks fields the app relies on"""
+
+def loads(data):
+    """Parse JSON bytes or text, raising DecodeError"""
+    try:
+        return _loads(data)
+    except ValueError as e:
+        raise DecodeError(f"Invalid JSON: {e}") from e
+
+def _payload(data):
+    """Parse raw bytes/text; already-parsed payloads pass through"""
+    return loads(data) if isinstance(data, (bytes, bytearray, memoryview, str)) else data
+
+@timed('parse')
+def decode_current(data, provider='openweathermap'):
+    """Decode an OpenWeatherMap /weather payload into CurrentWeather"""
+    payload = _payload(data)
+    try:
+        weather = payload['weather'][0]
+        main = payload['main']
+        coord = payload['coord']
+        return CurrentWeather(
+            name=payload['name'],
+            lat=float(coord['lat']),
+            lon=float(coord['lon']),
+            temp=float(main['temp']),
+            temp_min=float(main['temp_min']),
+            temp_max=float(main['temp_max']),
+            condition=weather['main'],
+            description=weather['description'],
+            condition_id=int(weather.get('id', 0)),
+            icon=weather.get('icon', ''),
+            observed_at=int(payload.get('dt', 0)),
+            provider=provider
+        )
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise DecodeError(f"Malformed current weather payload: {e!r}") from e
+
+@timed('parse')
+def decode_forecast(data, provider='openweathermap'):
+    """Decode an OpenWeatherMap /forecast payload into a Forecast of ForecastSlot records"""
+    payload = _payload(data)
+    try:
+        city = payload.get('city') or {}
+        coord = city.get('coord') or {}
+        slots = []
+        append = slots.append
+        make = ForecastSlot._make
+        for item in payload['list']:
+            weather = item['weather'][0]
+            main = item['main']
+            # Adding 0.0 rejects non-numbers (TypeError) and is much cheaper than float()
+            temp = main['temp'] + 0.0
+            rain = item.get('rain')
+            snow = item.get('snow')
+            # Checked here so a bad slot is a DecodeError, not an error from the typed arrays later
+            dt = item['dt']
+            condition_id = weather.get('id', 0)
+            if dt.__class__ is not int or not 0 <= dt <= MAX_TIMESTAMP:
+                raise ValueError(f"bad slot time {dt!r}")
+            if condition_id.__class__ is not int or not 0 <= condition_id <= MAX_CONDITION_ID:
+                raise ValueError(f"bad condition id {condition_id!r}")
+            append(make((
+                dt,
+                temp,
+                main.get('temp_min', temp) + 0.0,
+                main.get('temp_max', temp) + 0.0,
+                weather['main'],
+                condition_id,
+                weather.get('icon', ''),
+                (rain.get('3h', 0.0) if rain else 0.0) + (snow.get('3h', 0.0) if snow else 0.0)
+            )))
+        return Forecast(coord.get('lat'), coord.get('lon'), int(city.get('timezone', 0)), slots, provider)
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+        raise DecodeError(f"Malformed forecast payload: {e!r}") from e
+
+def decode_compact_forecast(data, provider='openweathermap'):
+    """Decode a /forecast payload into a CompactForecast, the form the caches keep"""
+    return CompactForecast.from_forecast(decode_forecast(data, provider))
+
+@timed('parse')
+def decode_geocode(data):
+    """Decode a geocoding /direct payload into (lat, lon, name), or None when nothing matched"""
+    payload = _payload(data)
+    try:
+        if not payload:
+            return None
+        first = payload[0]
+        return float(first['lat']), float(first['lon']), first['name']
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise DecodeError(f"Malformed geocoding payload: {e!r}") from e
+
+@timed('parse')
+def decode_ip_location(data):
+    """Decode an ip-api.com payload into (lat, lon, city), or None if the lookup failed"""
+    payload = _payload(data)
+    try:
+        if payload.get('status') != 'success':
+            return None
+        return float(payload['lat']), float(payload['lon']), payload['city']
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise DecodeError(f"Malformed IP location payload: {e!r}") from e
@@ -0,0 +1,113 @@
+"""
+Offline Gazetteer for Weather App
+Prefix index over a GeoNames city dump for instant search suggestions
+"""
+
+import heapq
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from geocode_store import normalize_city_name
+
+# GeoNames "cities15000.txt"-style dump (https://download.geonames.org/export/dump/)
+GAZETTEER_PATH = os.getenv(
+    'GAZETTEER_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cities15000.txt')
+)
+
+# GeoNames TSV column positions
+_NAME, _ASCII_NAME, _LAT, _LON, _COUNTRY, _POPULATION = 1, 2, 4, 5, 8, 14
+
+# Prefixes this short match thousands of names, so their answers are memoized
+_MEMO_PREFIX_LENGTH = 2
+
+Place = namedtuple('Place', ['name', 'country', 'lat', 'lon', 'population'])
+
+class Gazetteer:
+    """Sorted-array prefix index of places ranked by population"""
+
+    def __init__(self, places):
+        self._names = []
+        self._countries = []
+        self._lats = array('d')
+        self._lons = array('d')
+        self._populations = array('q')
+        entries = []
+        for name, country, lat, lon, population in places:
+            idx = len(self._names)
+            self._names.append(name)
+            self._countries.append(country)
+            self._lats.append(lat)
+            self._lons.append(lon)
+            self._populations.append(population)
+            entries.append((normalize_city_name(name), idx))
+        entries.sort()
+        # Parallel arrays: normalized names for bisect, place index for each key
+        self._keys = [key for key, _ in entries]
+        self._order = array('l', (idx for _, idx in entries))
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+    @classmethod
+    def from_geonames(cls, path):
+        """Load a GeoNames TSV dump"""
+        def rows():
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    cols = line.rstrip('\n').split('\t')
+                    if len(cols) <= _POPULATION:
+                        continue
+                    yield (
+                        cols[_NAME] or cols[_ASCII_NAME],
+                        cols[_COUNTRY],
+                        float(cols[_LAT]),
+                        float(cols[_LON]),
+                        int(cols[_POPULATION] or 0)
+                    )
+        return cls(rows())
+
+    def __len__(self):
+        return len(self._names)
+
+    def _place(self, idx):
+        """Build the Place record for a place index"""
+        return Place(self._names[idx], self._countries[idx], self._lats[idx],
+                     self._lons[idx], self._populations[idx])
+
+    def search(self, prefix, k=5):
+        """Return up to k places whose name starts with prefix, most populous first"""
+        key = normalize_city_name(prefix)
+        if not key:
+            return []
+        if len(key) <= _MEMO_PREFIX_LENGTH:
+            memo_key = (key, k)
+            result = self._memo.get(memo_key)
+            if result is None:
+                result = self._search(key, k)
+                with self._memo_lock:
+                    self._memo[memo_key] = result
+            return result
+        return self._search(key, k)
+
+    def _search(self, key, k):
+        """Rank the index range sharing the normalized prefix"""
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + '\uffff', lo)
+        candidates = self._order[lo:hi]
+        populations = self._populations
+        top = heapq.nlargest(k, candidates, key=populations.__getitem__)
+        return [self._place(idx) for idx in top]
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer(path=GAZETTEER_PATH):
+    """Get the process-wide gazetteer, or None if no dump is installed"""
+    global _gazetteer
+    if _gazetteer is None and os.path.exists(path):
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.from_geonames(path)
+    return _gazetteer
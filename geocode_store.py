@@ -0,0 +1,124 @@
+"""
+Geocode Store for Weather App
+Persistent SQLite cache of city name to coordinates lookups
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+GEOCODE_DB_PATH = os.getenv(
+    'GEOCODE_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'geocode.sqlite3')
+)
+# "City not found" answers are remembered for a day in case the API learns the name
+NEGATIVE_GEOCODE_TTL = float(os.getenv('NEGATIVE_GEOCODE_TTL', '86400'))
+
+# Returned by lookup() for names the API is known not to resolve
+NOT_FOUND = object()
+
+def normalize_city_name(name):
+    """Normalize a city name for lookups: strip diacritics, casefold, collapse whitespace"""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+class GeocodeStore:
+    """City coordinates kept in SQLite and mirrored in memory for instant lookups"""
+
+    def __init__(self, path=GEOCODE_DB_PATH, negative_ttl=NEGATIVE_GEOCODE_TTL):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS geocode ('
+            'key TEXT PRIMARY KEY, lat REAL, lon REAL, name TEXT, updated REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self.warm()
+
+    def warm(self):
+        """Load every stored entry into memory"""
+        rows = self._conn.execute('SELECT key, lat, lon, name, updated FROM geocode').fetchall()
+        with self._lock:
+            for key, lat, lon, name, updated in rows:
+                self._entries[key] = (lat, lon, name, updated)
+        return len(rows)
+
+    def lookup(self, city_name):
+        """Return (lat, lon, name), NOT_FOUND for known-missing cities, or None if unknown"""
+        key = normalize_city_name(city_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            lat, lon, name, updated = entry
+            if lat is None:
+                if time.time() - updated > self.negative_ttl:
+                    self.misses += 1
+                    return None
+                self.negative_hits += 1
+                return NOT_FOUND
+            self.hits += 1
+            return lat, lon, name
+
+    def record(self, city_name, lat, lon, name=None):
+        """Remember the coordinates a city name resolved to"""
+        self._write(normalize_city_name(city_name), lat, lon, name or city_name)
+
+    def record_missing(self, city_name):
+        """Remember that a city name did not resolve"""
+        self._write(normalize_city_name(city_name), None, None, None)
+
+    def _write(self, key, lat, lon, name):
+        """Update memory and disk for one key"""
+        updated = time.time()
+        with self._lock:
+            existing = self._entries.get(key)
+            if lat is not None and existing is not None and existing[:3] == (lat, lon, name):
+                return
+            self._entries[key] = (lat, lon, name, updated)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO geocode (key, lat, lon, name, updated) VALUES (?, ?, ?, ?, ?)',
+                (key, lat, lon, name, updated)
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return lookup counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.negative_hits
+            return {
+                'name': 'geocode',
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'negative_hits': self.negative_hits,
+                'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0
+            }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_geocode_store():
+    """Get the process-wide geocode store, warm-loading it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = GeocodeStore()
+    return _store
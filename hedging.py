@@ -0,0 +1,163 @@
+"""
+Request Hedging for Weather App
+Send a backup request when the first one is slower than recent calls usually are
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Hedge once the primary has taken longer than this percentile of recent latencies
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '0.95'))
+# Extra requests allowed, as a fraction of all requests
+HEDGE_MAX_RATIO = float(os.getenv('HEDGE_MAX_RATIO', '0.05'))
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+HEDGE_WORKERS = int(os.getenv('HEDGE_WORKERS', '16'))
+
+class LatencyTracker:
+    """Recent latencies for one endpoint with a cached percentile"""
+
+    def __init__(self, window=256, recompute_every=16):
+        self._samples = deque(maxlen=window)
+        self._recompute_every = recompute_every
+        self._since_recompute = 0
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Add one observed latency"""
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_recompute += 1
+            if self._since_recompute >= self._recompute_every or len(self._samples) < self._recompute_every:
+                self._sorted = sorted(self._samples)
+                self._since_recompute = 0
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        """Latency at quantile p (0-1) of the recent window, or None without samples"""
+        ordered = self._sorted
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+class HedgeBudget:
+    """Caps hedges to a fraction of requests, earning credit per request"""
+
+    def __init__(self, ratio, burst=10):
+        self.ratio = ratio
+        self.burst = burst
+        self._credit = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def earn(self):
+        """Credit one request"""
+        with self._lock:
+            self.requests += 1
+            self._credit = min(self.burst, self._credit + self.ratio)
+
+    def available(self):
+        """Whether there is credit for a hedge right now (try_spend() takes it)"""
+        with self._lock:
+            return self._credit >= 1
+
+    def try_spend(self):
+        """Use one credit for a hedge if available"""
+        with self._lock:
+            if self._credit >= 1:
+                self._credit -= 1
+                self.hedges += 1
+                return True
+            return False
+
+    def record_win(self):
+        """Count a hedge that finished before its primary"""
+        with self._lock:
+            self.hedge_wins += 1
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+_budget = HedgeBudget(HEDGE_MAX_RATIO)
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_latency_tracker(key):
+    """Get the latency tracker for an endpoint key"""
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _trackers[key] = tracker
+        return tracker
+
+def _get_executor():
+    """Start the hedging worker pool on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='weather-hedge')
+    return _executor
+
+def _timed(tracker, call):
+    """Run call() and record its latency"""
+    started = time.monotonic()
+    result = call()
+    tracker.record(time.monotonic() - started)
+    return result
+
+def hedged_call(call, key, may_hedge=None):
+    """Run call(), racing one backup call if it is unusually slow; may_hedge() can veto the backup"""
+    if not HEDGE_ENABLED:
+        return call()
+    tracker = get_latency_tracker(key)
+    _budget.earn()
+    delay = tracker.percentile(HEDGE_PERCENTILE) if len(tracker) >= HEDGE_MIN_SAMPLES else None
+    if delay is None:
+        return _timed(tracker, call)
+
+    executor = _get_executor()
+    # Run in a copy of the caller's context so priority and quota attribution follow the call
+    primary = executor.submit(contextvars.copy_context().run, _timed, tracker, call)
+    done, _ = wait([primary], timeout=delay)
+    # Ask may_hedge() only when there is credit, and take the credit only for a backup that goes out:
+    # a veto (e.g. no spare rate-limit token) must not drain the budget
+    if (done or not _budget.available() or (may_hedge is not None and not may_hedge())
+            or not _budget.try_spend()):
+        return primary.result()
+
+    backup = executor.submit(contextvars.copy_context().run, _timed, tracker, call)
+    pending = {primary, backup}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    _budget.record_win()
+                return future.result()
+    # Both failed: surface the primary's error
+    return primary.result()
+
+def get_hedging_stats():
+    """Return hedge counters and per-endpoint latency percentiles"""
+    with _trackers_lock:
+        trackers = dict(_trackers)
+    return {
+        'enabled': HEDGE_ENABLED,
+        'requests': _budget.requests,
+        'hedges': _budget.hedges,
+        'hedge_wins': _budget.hedge_wins,
+        'endpoints': {
+            key: {'p50': t.percentile(0.5), 'p95': t.percentile(0.95), 'p99': t.percentile(0.99)}
+            for key, t in trackers.items()
+        }
+    }
@@ -0,0 +1,394 @@
+"""
+Observation History for Weather App
+Append-only local store of current-weather observations per location, in memory-mapped NumPy segments
+"""
+
+import calendar
+import fnmatch
+import glob
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): writers in one process still coordinate through a lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ENABLED = os.getenv('HISTORY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+HISTORY_DIR = os.getenv(
+    'HISTORY_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'history')
+)
+# Observations are dropped after this many days, and downsampled to hourly after HISTORY_RAW_DAYS
+HISTORY_RETENTION_DAYS = float(os.getenv('HISTORY_RETENTION_DAYS', '1825'))
+HISTORY_RAW_DAYS = float(os.getenv('HISTORY_RAW_DAYS', '30'))
+# Records appended to a location's active file before a writer folds them into month segments
+HISTORY_COMPACT_RECORDS = int(os.getenv('HISTORY_COMPACT_RECORDS', '4096'))
+
+# One observation, or `samples` of them merged: temp is their mean and temp_min/temp_max the
+# lowest/highest temp seen; t is the (first) observation time in UTC seconds. 20 bytes each
+RECORD = np.dtype([
+    ('t', '<u4'), ('temp', '<f4'), ('temp_min', '<f4'), ('temp_max', '<f4'),
+    ('condition_id', '<u2'), ('samples', '<u2')
+])
+DOWNSAMPLE_SECONDS = 3600
+_MAX_TIME = int(np.iinfo(np.uint32).max)
+
+# Result of HistoryStore.downsample(): one array per field, one row per non-empty bucket
+Downsampled = namedtuple('Downsampled', ['start', 'temp_min', 'temp_max', 'temp_mean', 'samples'])
+
+# Files in a location directory: appended observations, observations being compacted,
+# and sorted, de-duplicated month segments (YYYY-MM.npy)
+ACTIVE_FILE = 'active.bin'
+PENDING_PATTERN = 'pending-*.bin'
+COMPACT_LOCK_FILE = 'compact.lock'
+_SEGMENT_NAME = re.compile(r'\d{4}-\d{2}\.npy')
+# Month segments kept memory-mapped between scans
+SEGMENT_CACHE_SIZE = 256
+
+def location_key(lat, lon):
+    """Directory name for a location (2 decimals is ~1 km)"""
+    return f"{round(float(lat), 2):.2f}_{round(float(lon), 2):.2f}"
+
+def _month_bounds(name):
+    """(start, end) UTC timestamps of a YYYY-MM segment name"""
+    year, month = int(name[:4]), int(name[5:7])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return calendar.timegm((year, month, 1, 0, 0, 0)), calendar.timegm((next_year, next_month, 1, 0, 0, 0))
+
+def _sorted_unique(records):
+    """Sort by time, keeping the last single observation written for each timestamp
+
+    Repeated fetches of one observation collapse; a merged record and a late observation
+    with the same timestamp (its bucket start) both stay, for the next downsampling to merge.
+    """
+    order = np.argsort(records['t'], kind='stable')
+    records = records[order]
+    if len(records) > 1:
+        times = records['t']
+        single = records['samples'] == 1
+        repeated = np.r_[(times[1:] == times[:-1]) & single[1:] & single[:-1], False]
+        records = records[~repeated]
+    return records
+
+def _bucket_runs(records, bucket):
+    """(bucket index, run starts) of time-sorted records grouped by bucket"""
+    index = records['t'].astype(np.int64) // bucket
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    return index, starts
+
+def _merge_buckets(records, bucket):
+    """Merge time-sorted records into one record per bucket, weighting means by samples"""
+    if not len(records):
+        return records
+    index, starts = _bucket_runs(records, bucket)
+    samples = records['samples'].astype(np.int64)
+    merged = np.empty(len(starts), dtype=RECORD)
+    merged['t'] = index[starts] * bucket
+    merged['temp'] = np.add.reduceat(records['temp'] * samples, starts) / np.add.reduceat(samples, starts)
+    merged['temp_min'] = np.minimum.reduceat(records['temp_min'], starts)
+    merged['temp_max'] = np.maximum.reduceat(records['temp_max'], starts)
+    merged['condition_id'] = records['condition_id'][np.r_[starts[1:], len(records)] - 1]  # latest
+    merged['samples'] = np.minimum(np.add.reduceat(samples, starts), np.iinfo(np.uint16).max)
+    return merged
+
+def _read_unsorted(path):
+    """Records of an append-only file (memory-mapped), or None if empty or missing"""
+    try:
+        count = os.path.getsize(path) // RECORD.itemsize
+        if not count:
+            return None
+        return np.memmap(path, dtype=RECORD, mode='r', shape=(count,))
+    except OSError:  # compacted away since it was listed
+        return None
+
+class HistoryStore:
+    """Per-location observation history: O_APPEND writes from any thread or process, month segments for reads"""
+
+    def __init__(self, root=HISTORY_DIR, retention_days=HISTORY_RETENTION_DAYS,
+                 raw_days=HISTORY_RAW_DAYS, compact_records=HISTORY_COMPACT_RECORDS):
+        self.root = root
+        self.retention = retention_days * 86400
+        self.raw = raw_days * 86400
+        self.compact_records = compact_records
+        self._lock = threading.Lock()             # guards _maps
+        self._flock_fallback = threading.RLock()  # stands in for flock where fcntl is missing
+        self._maps = OrderedDict()                # segment path -> (stat signature, memmap)
+        self.appended = 0
+        self.compactions = 0
+
+    def _dir(self, key, create=False):
+        directory = os.path.join(self.root, key)
+        if create:
+            os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @contextmanager
+    def _flock(self, fd, exclusive, blocking=True):
+        """Hold an advisory lock on fd; yields False if non-blocking and already held"""
+        if fcntl is None:
+            acquired = self._flock_fallback.acquire(blocking)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    self._flock_fallback.release()
+            return
+        flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def record(self, lat, lon, t, temp, condition_id=0):
+        """Append one observation for a location"""
+        record = np.zeros(1, dtype=RECORD)
+        record[0] = (int(t), temp, temp, temp, condition_id, 1)
+        key = location_key(lat, lon)
+        path = os.path.join(self._dir(key, create=True), ACTIVE_FILE)
+        while True:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                with self._flock(fd, exclusive=False):
+                    # A compaction may have moved the file away between open and lock
+                    try:
+                        current = os.path.samestat(os.fstat(fd), os.stat(path))
+                    except FileNotFoundError:
+                        current = False
+                    if not current:
+                        continue
+                    # One O_APPEND write per record: concurrent writers never interleave bytes
+                    os.write(fd, record.tobytes())
+                    size = os.fstat(fd).st_size
+                    break
+            finally:
+                os.close(fd)
+        self.appended += 1
+        if size >= self.compact_records * RECORD.itemsize:
+            self.compact(lat, lon, blocking=False)
+
+    def record_current(self, current):
+        """Append a CurrentWeather observation (timestamped by the API, or now)"""
+        if current.lat is None or current.lon is None:
+            return
+        self.record(current.lat, current.lon, current.observed_at or time.time(),
+                    current.temp, current.condition_id or 0)
+
+    def _listing(self, directory):
+        """([(start, end, path)] of month segments oldest first, [paths] of uncompacted files)"""
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return [], []
+        segments = []
+        unsorted = []
+        for name in names:
+            if _SEGMENT_NAME.fullmatch(name):
+                start, end = _month_bounds(name)
+                segments.append((start, end, os.path.join(directory, name)))
+            elif name == ACTIVE_FILE or fnmatch.fnmatch(name, PENDING_PATTERN):
+                unsorted.append(os.path.join(directory, name))
+        return segments, unsorted
+
+    def _segments(self, directory):
+        return self._listing(directory)[0]
+
+    def _open_segment(self, path):
+        """Memory-mapped month segment, reused until a compaction replaces the file"""
+        signature = os.stat(path)
+        signature = (signature.st_ino, signature.st_mtime_ns, signature.st_size)
+        with self._lock:
+            cached = self._maps.get(path)
+            if cached is not None and cached[0] == signature:
+                self._maps.move_to_end(path)
+                return cached[1]
+        segment = np.load(path, mmap_mode='r')
+        with self._lock:
+            self._maps[path] = (signature, segment)
+            while len(self._maps) > SEGMENT_CACHE_SIZE:
+                self._maps.popitem(last=False)
+        return segment
+
+    def scan(self, lat, lon, start=None, end=None):
+        """Records with start <= t < end for a location, time-sorted (a copy, not a view)"""
+        directory = self._dir(location_key(lat, lon))
+        # Clamped to the uint32 range of RECORD['t'] so comparisons stay in its dtype
+        lo = min(max(0, 0 if start is None else int(start)), _MAX_TIME)
+        hi = min(max(0, _MAX_TIME if end is None else int(end)), _MAX_TIME)
+        parts = []
+        segments, unsorted = self._listing(directory)
+        for seg_start, seg_end, path in segments:
+            if seg_end <= lo or seg_start >= hi:
+                continue
+            try:
+                segment = self._open_segment(path)
+            except (OSError, ValueError):  # removed by retention since the listing
+                continue
+            times = segment['t']
+            parts.append(np.array(segment[np.searchsorted(times, lo):np.searchsorted(times, hi)]))
+        # Not yet compacted: small and unsorted, so filter with a mask
+        for path in unsorted:
+            records = _read_unsorted(path)
+            if records is not None:
+                parts.append(np.array(records[(records['t'] >= lo) & (records['t'] < hi)]))
+        if not parts:
+            return np.empty(0, dtype=RECORD)
+        return _sorted_unique(np.concatenate(parts))
+
+    def downsample(self, lat, lon, bucket_seconds, start=None, end=None):
+        """Min/max/mean temperature per bucket_seconds bucket over a time range"""
+        records = self.scan(lat, lon, start, end)
+        if not len(records):
+            empty = np.empty(0)
+            return Downsampled(np.empty(0, dtype=np.int64), empty, empty, empty, np.empty(0, dtype=np.int64))
+        merged = _merge_buckets(records, int(bucket_seconds))
+        samples = records['samples'].astype(np.int64)
+        _, starts = _bucket_runs(records, int(bucket_seconds))
+        return Downsampled(
+            start=merged['t'].astype(np.int64),
+            temp_min=merged['temp_min'].astype(np.float64),
+            temp_max=merged['temp_max'].astype(np.float64),
+            temp_mean=merged['temp'].astype(np.float64),
+            samples=np.add.reduceat(samples, starts)  # uncapped, unlike the stored uint16
+        )
+
+    def compact(self, lat, lon, now=None, blocking=True):
+        """Fold appended observations into month segments and apply downsampling and retention
+
+        Returns False if another compaction of the location was running and blocking is False.
+        """
+        directory = self._dir(location_key(lat, lon), create=True)
+        lock_fd = os.open(os.path.join(directory, COMPACT_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with self._flock(lock_fd, exclusive=True, blocking=blocking) as acquired:
+                if not acquired:
+                    return False
+                self._rotate_active(directory)
+                self._compact_locked(directory, time.time() if now is None else now)
+        finally:
+            os.close(lock_fd)
+        self.compactions += 1
+        return True
+
+    def _rotate_active(self, directory):
+        """Rename the active file to pending-*, waiting for in-progress appends"""
+        path = os.path.join(directory, ACTIVE_FILE)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        try:
+            with self._flock(fd, exclusive=True):
+                os.replace(path, os.path.join(directory, f'pending-{time.time_ns()}.bin'))
+        finally:
+            os.close(fd)
+
+    def _compact_locked(self, directory, now):
+        """Merge pending files into month segments (compaction lock held)"""
+        pending_paths = sorted(glob.glob(os.path.join(directory, PENDING_PATTERN)))
+        pending = [np.array(r) for r in map(_read_unsorted, pending_paths) if r is not None]
+        incoming = np.concatenate(pending) if pending else np.empty(0, dtype=RECORD)
+        retain_after = now - self.retention
+        raw_after = now - self.raw
+
+        months = incoming['t'].astype('datetime64[s]').astype('datetime64[M]')
+        touched = {str(month): incoming[months == month] for month in np.unique(months)}
+        existing = {os.path.basename(path)[:7]: (start, end, path)
+                    for start, end, path in self._segments(directory)}
+
+        for name in sorted(set(touched) | set(existing)):
+            start, end = _month_bounds(name)
+            path = os.path.join(directory, f'{name}.npy')
+            new = touched.get(name)
+            if end <= retain_after:
+                if name in existing:
+                    os.remove(path)
+                continue
+            if new is None and start >= raw_after and start >= retain_after:
+                continue  # untouched, and nothing in it is due for downsampling or retention
+            old = np.load(path) if name in existing else np.empty(0, dtype=RECORD)
+            records = _sorted_unique(old if new is None else np.concatenate([old, new]))
+            records = records[records['t'] >= retain_after]
+            due = records['t'] < raw_after
+            if due.any():
+                records = np.concatenate([_merge_buckets(records[due], DOWNSAMPLE_SECONDS), records[~due]])
+            if new is None and len(records) == len(old) and np.array_equal(records, old):
+                continue
+            if not len(records):
+                # Everything fell out of retention; a month seen only in pending files has no segment yet
+                if name in existing:
+                    os.remove(path)
+                continue
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as file:
+                np.save(file, records)
+            # Readers holding the old segment keep their memory map; new readers see the merge
+            os.replace(temp_path, path)
+
+        for path in pending_paths:
+            os.remove(path)
+
+    def compact_all(self, now=None):
+        """Compact every location (for a scheduled maintenance job)"""
+        for lat, lon in self.locations():
+            self.compact(lat, lon, now=now)
+
+    def locations(self):
+        """[(lat, lon)] of every location with history"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        result = []
+        for name in sorted(names):
+            try:
+                lat, lon = name.split('_')
+                result.append((float(lat), float(lon)))
+            except ValueError:
+                continue
+        return result
+
+    def disk_usage(self, lat, lon):
+        """Bytes on disk for a location"""
+        directory = self._dir(location_key(lat, lon))
+        return sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, '*'))
+                   if not path.endswith(COMPACT_LOCK_FILE))
+
+    def stats(self):
+        """Return write counters for monitoring"""
+        return {'name': 'history', 'locations': len(self.locations()),
+                'appended': self.appended, 'compactions': self.compactions}
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history_store():
+    """Get the process-wide history store"""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = HistoryStore()
+    return _history
+
+def record_current(current):
+    """Record a fetched CurrentWeather when HISTORY_ENABLED; history failures never fail the fetch"""
+    if HISTORY_ENABLED and current is not None:
+        try:
+            get_history_store().record_current(current)
+        except OSError as e:
+            logger.warning("Could not record observation history: %s", e)
+    return current
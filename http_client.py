@@ -0,0 +1,98 @@
+"""
+HTTP Client for Weather App
+Process-wide pooled, keep-alive session shared by every weather fetcher
+"""
+
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from resilience import call_with_retries
+from hedging import hedged_call
+from metrics import stage_timer, upstream_requests, upstream_in_flight
+from quota import get_quota_ledger
+from rate_limit import current_priority, BACKGROUND
+
+# Pool and timeout settings (override via environment variables)
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Query parameters carrying credentials; exception messages quote the full request URL
+SECRET_PARAMS = ('appid',)
+_SECRET_VALUE = re.compile(r'\b(%s)=[^&\s\'"]*' % '|'.join(SECRET_PARAMS))
+
+_session = None
+_session_lock = threading.Lock()
+
+def redact(error):
+    """Text of an exception (or message) with credential query parameters masked, safe to log or return"""
+    return _SECRET_VALUE.sub(r'\1=***', str(error))
+
+def _build_session():
+    """Create a session with a bounded keep-alive pool per host"""
+    session = requests.Session()
+    # pool_block keeps us at POOL_MAXSIZE sockets per host under load
+    # instead of opening throwaway connections that exhaust ephemeral ports
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=True
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session():
+    """Get the shared session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def close_session():
+    """Close the shared session and release pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def _counted_get(session, url, host, endpoint, params, timeout):
+    """Send one upstream GET, counting it by endpoint and status and in the quota ledger"""
+    upstream_in_flight.inc()
+    status = 'error'
+    try:
+        response = session.get(url, params=params, timeout=timeout)
+        status = str(response.status_code)
+        # Anything the API answered counts against the quota, errors included (if the host is billed)
+        get_quota_ledger().record_call(endpoint, background=current_priority() >= BACKGROUND, host=host)
+        return response
+    finally:
+        upstream_in_flight.dec()
+        upstream_requests.inc(endpoint, status)
+
+def http_get(url, params=None, timeout=None, may_hedge=None, acquire=None):
+    """Send a GET request through the shared session with retries, hedging and a circuit breaker
+
+    acquire(max_wait=...) is called before every attempt, e.g. a rate limiter's acquire.
+    """
+    connect_timeout, read_timeout = timeout or DEFAULT_TIMEOUT
+    session = get_session()
+    parts = urlsplit(url)
+    host, endpoint = parts.netloc, parts.path
+
+    def send(attempt_timeout):
+        return hedged_call(
+            lambda: _counted_get(session, url, host, endpoint, params, attempt_timeout),
+            url, may_hedge
+        )
+
+    with stage_timer('fetch'):
+        return call_with_retries(send, url, connect_timeout, read_timeout, acquire=acquire)
@@ -0,0 +1,147 @@
+"""
+Incremental Forecast Aggregation for Weather App
+Keeps per-day statistics for a location and recomputes only the days whose slots changed between refreshes
+"""
+
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from compact_forecast import CompactForecast
+from conditions import most_severe
+from models import SECONDS_PER_DAY, weekday_name
+
+# Summary of one local calendar day; min/max/mean are over the slots' temperatures, `condition`
+# is the condition of the day's first slot and `condition_id` the day's most severe condition
+# (the earliest of equally severe ones), which process_forecast_data draws the day's icon from
+DailySummary = namedtuple('DailySummary', [
+    'day', 'weekday', 'min_temp', 'max_temp', 'temp_mean', 'precipitation', 'condition', 'condition_id',
+    'slots'
+])
+
+# Result of IncrementalForecast.update(): current day summaries and the local days that changed
+ForecastUpdate = namedtuple('ForecastUpdate', ['days', 'changed'])
+
+def _day_bounds(forecast, start=0):
+    """{local day: (start, stop)} slot ranges of a CompactForecast from slot index start on (dt sorted)"""
+    dt = forecast.dt
+    if start >= len(dt):
+        return {}
+    offset = forecast.timezone_offset
+    bounds = {}
+    for day in range((dt[start] + offset) // SECONDS_PER_DAY, (dt[-1] + offset) // SECONDS_PER_DAY + 1):
+        stop = bisect_left(dt, (day + 1) * SECONDS_PER_DAY - offset, start)
+        if stop > start:
+            bounds[day] = (start, stop)
+            start = stop
+    return bounds
+
+def _same_slots(a, a_bounds, b, start, stop):
+    """Whether slots a_bounds of a and start:stop of b match in time, temperature, precipitation and condition"""
+    a_start, a_stop = a_bounds
+    if a is b and a_start == start and a_stop == stop:
+        return True
+    if a_stop - a_start != stop - start:
+        return False
+    if (a.dt[a_start:a_stop] != b.dt[start:stop] or a.temp[a_start:a_stop] != b.temp[start:stop]
+            or a.precipitation[a_start:a_stop] != b.precipitation[start:stop]
+            or a.condition_id[a_start:a_stop] != b.condition_id[start:stop]):
+        return False
+    # Condition codes index per-forecast vocabularies; compare names unless the vocabularies match
+    if a.conditions == b.conditions:
+        return a.condition_code[a_start:a_stop] == b.condition_code[start:stop]
+    return ([a.conditions[code] for code in a.condition_code[a_start:a_stop]]
+            == [b.conditions[code] for code in b.condition_code[start:stop]])
+
+def _summarize(forecast, day, start, stop):
+    """DailySummary of slots start:stop of a CompactForecast"""
+    temps = forecast.temp[start:stop].tolist()
+    return DailySummary(day, weekday_name(day), min(temps), max(temps), sum(temps) / len(temps),
+                        sum(forecast.precipitation[start:stop]),
+                        forecast.conditions[forecast.condition_code[start]],
+                        most_severe(forecast.condition_id[start:stop]), stop - start)
+
+class IncrementalForecast:
+    """Daily aggregates for one location, updated in place as refreshed forecasts arrive
+
+    The state is the applied CompactForecast (the forecast cache's own object, not a copy), the
+    index of its first live slot and one DailySummary per local day, computed when first asked for.
+    """
+
+    def __init__(self):
+        self.timezone_offset = None
+        self._forecast = None   # CompactForecast the summaries were computed from
+        self._start = 0         # slots before this index were retired
+        self._summaries = {}    # local day -> DailySummary, or None until requested
+        self._last = None
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.slots_applied = 0
+
+    def update(self, forecast, max_days=None):
+        """Merge a Forecast or CompactForecast; return its first max_days summaries and the changed days
+
+        Days whose slots are unchanged keep their summary; re-applying the same object is free.
+        """
+        with self._lock:
+            changed = []
+            if forecast is not self._last:
+                changed = self._apply(CompactForecast.from_forecast(forecast), 0, max_days)
+                self._last = forecast
+                self.updates += 1
+            return ForecastUpdate(self._current(max_days), changed)
+
+    def retire_before(self, timestamp, max_days=None):
+        """Drop slots that start before timestamp (e.g. when a refresh failed); same result as update()"""
+        with self._lock:
+            changed = []
+            if self._forecast is not None:
+                cut = bisect_left(self._forecast.dt, timestamp)
+                if cut > self._start:
+                    changed = self._apply(self._forecast, cut, max_days)
+            return ForecastUpdate(self._current(max_days), changed)
+
+    def _current(self, max_days):
+        days = sorted(self._summaries)
+        if max_days is not None:
+            days = days[:max_days]
+        if any(self._summaries[day] is None for day in days):
+            bounds = _day_bounds(self._forecast, self._start)
+            for day in days:
+                if self._summaries[day] is None:
+                    self._summaries[day] = _summarize(self._forecast, day, *bounds[day])
+        return [self._summaries[day] for day in days]
+
+    def _apply(self, forecast, start=0, max_days=None):
+        """Make slots start: of forecast the applied ones, recomputing only days that differ (lock held)
+
+        Changed days among the first max_days are summarized now, later ones when first requested.
+        """
+        previous = {}
+        if self._forecast is not None and forecast.timezone_offset == self.timezone_offset:
+            previous = _day_bounds(self._forecast, self._start)
+        # Otherwise there is nothing to compare with, or day boundaries moved: every day is rebuilt
+
+        changed = set(self._summaries)
+        summaries = {}
+        for index, (day, (begin, end)) in enumerate(_day_bounds(forecast, start).items()):
+            bounds = previous.get(day)
+            if bounds is not None and _same_slots(self._forecast, bounds, forecast, begin, end):
+                summaries[day] = self._summaries[day]
+                changed.discard(day)
+            else:
+                wanted = max_days is None or index < max_days
+                summaries[day] = _summarize(forecast, day, begin, end) if wanted else None
+                self.slots_applied += end - begin
+                changed.add(day)
+        self._forecast = forecast
+        self._start = start
+        self._summaries = summaries
+        self.timezone_offset = forecast.timezone_offset
+        return sorted(changed)
+
+    def stats(self):
+        """Merge counters for monitoring"""
+        with self._lock:
+            slots = len(self._forecast) - self._start if self._forecast is not None else 0
+            return {'updates': self.updates, 'slots_applied': self.slots_applied,
+                    'slots': slots, 'days': len(self._summaries)}
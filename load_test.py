@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Load Test Harness
+Drives utils.get_weather_and_forecast against mock_server.py and reports latency percentiles
+
+Run: python load_test.py --users 20 --duration 30 --cities 200 --latency-median 0.1
+Use --no-cache to measure the raw upstream path, --host to target an already running mock server.
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the weather fetch path against a mock API")
+    parser.add_argument('--users', type=int, default=20, help="concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=20, help="seconds to run")
+    parser.add_argument('--cities', type=int, default=200, help="distinct cities in the workload")
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of city popularity")
+    parser.add_argument('--think-time', type=float, default=0.0, help="seconds each user waits between lookups")
+    parser.add_argument('--no-cache', action='store_true', help="disable the response caches")
+    parser.add_argument('--host', default=None, help="existing mock server URL; starts one in-process if omitted")
+    parser.add_argument('--latency-median', type=float, default=0.1)
+    parser.add_argument('--latency-p99', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--forecast-slots', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+def configure_environment(host, no_cache):
+    """Point the app at the mock API; must run before utils is imported"""
+    os.environ['OPENWEATHER_HOST'] = host
+    os.environ['IP_LOCATION_URL'] = f"{host}/json/"
+    os.environ.setdefault('OPENWEATHER_API_KEY', 'load-test')
+    os.environ.setdefault('GEOCODE_DB_PATH', ':memory:')
+    os.environ.setdefault('HISTORY_ENABLED', 'false')
+    # The mock has no quota; keep the limiter out of the measurement
+    os.environ.setdefault('OWM_RATE_LIMIT_PER_MINUTE', '1000000')
+    os.environ.setdefault('OWM_RATE_LIMIT_BURST', '100000')
+    if no_cache:
+        for name in ('CURRENT_WEATHER_TTL', 'FORECAST_TTL', 'CURRENT_WEATHER_MAX_STALE',
+                     'FORECAST_MAX_STALE', 'STALE_IF_ERROR'):
+            os.environ[name] = '0'
+
+def zipf_weights(n, skew):
+    """Popularity weights for n items, most popular first"""
+    return [1.0 / (rank ** skew) for rank in range(1, n + 1)]
+
+def percentile(ordered, p):
+    """Value at quantile p (0-1) of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+def run(args, fetch):
+    """Run the workload and return (latencies, errors, elapsed)"""
+    cities = [f"Loadtown {i}" for i in range(args.cities)]
+    weights = zipf_weights(args.cities, args.skew)
+    deadline = time.monotonic() + args.duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def user(seed):
+        rng = random.Random(seed)
+        local, failed = [], 0
+        while time.monotonic() < deadline:
+            city = rng.choices(cities, weights)[0]
+            started = time.monotonic()
+            current, forecast = fetch(city=city)
+            local.append(time.monotonic() - started)
+            if current is None or forecast is None:
+                failed += 1
+            if args.think_time:
+                time.sleep(args.think_time)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=user, args=(args.seed + i,)) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors[0], time.monotonic() - started
+
+def main():
+    args = parse_args()
+    server = None
+    host = args.host
+    if host is None:
+        from mock_server import MockConfig, start_server
+        config = MockConfig(args.latency_median, args.latency_p99, args.error_rate,
+                            forecast_slots=args.forecast_slots, seed=args.seed)
+        server = start_server(config)
+        host = f"http://127.0.0.1:{server.server_port}"
+    configure_environment(host, args.no_cache)
+
+    import utils
+
+    print(f"🧪 {args.users} users for {args.duration:g}s over {args.cities} cities "
+          f"(cache {'off' if args.no_cache else 'on'}) against {host}")
+    latencies, errors, elapsed = run(args, utils.get_weather_and_forecast)
+
+    total = len(latencies)
+    print(f"\nRequests:   {total} in {elapsed:.1f}s ({total / elapsed:.1f}/s)")
+    print(f"Errors:     {errors} ({errors / total:.1%})" if total else "Errors:     0")
+    print("Latency ms: " + "  ".join(
+        f"{label}={percentile(latencies, p) * 1000:.1f}"
+        for label, p in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))
+    ))
+    for cache in utils.get_cache_stats():
+        print(f"Cache {cache['name']}: hit ratio {cache['hit_ratio']:.1%} "
+              f"({cache['hits']} hits, {cache.get('stale_hits', 0)} stale, {cache['misses']} misses)")
+    coalescing = utils.get_coalescing_stats()
+    print(f"Coalescing: {coalescing}")
+    if server is not None:
+        print(f"Upstream:   {config.requests} requests "
+              f"({config.errors} injected errors)")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
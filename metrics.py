@@ -0,0 +1,243 @@
+"""
+Metrics for Weather App
+Low-overhead counters, gauges and stage latency histograms exported in Prometheus text format
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Sidecar endpoint (http://host:METRICS_PORT/metrics) and/or a file rewritten periodically
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_FILE = os.getenv('METRICS_FILE', '')
+METRICS_FILE_INTERVAL = float(os.getenv('METRICS_FILE_INTERVAL', '15'))
+
+# Seconds; covers sub-millisecond parsing up to slow upstream calls
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _label_order(item):
+    return tuple(str(v) for v in item[0])
+
+def _render_samples(name, documentation, kind, labelnames, values):
+    """Prometheus text lines for one metric family of plain samples"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in sorted(values.items(), key=_label_order):
+        lines.append(f"{name}{_format_labels(labelnames, labels)} {value}")
+    return lines
+
+class _Metric:
+    """Shared bookkeeping: name, help text, label names and a lock over per-label values"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        """Prometheus text lines for this metric"""
+        with self._lock:
+            values = dict(self._values)
+        return _render_samples(self.name, self.documentation, self.kind, self.labelnames, values)
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    """Value that goes up and down per label set"""
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(_Metric):
+    """Fixed-bucket distribution per label set"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = {labels: (list(s[0]), s[1], s[2]) for labels, s in self._values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = [repr(b) for b in self.buckets] + ['+Inf']
+        bucket_labels = self.labelnames + ('le',)
+        for labels, (counts, total, count) in sorted(values.items(), key=_label_order):
+            cumulative = 0
+            for le, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels, labels + (le,))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+class Registry:
+    """Metrics plus collectors that report gauges computed at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """collect() returns [(name, documentation, labelnames, {labels_tuple: value})] gauges"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            for name, documentation, labelnames, values in collect():
+                lines.extend(_render_samples(name, documentation, 'gauge', labelnames, values))
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+stage_seconds = REGISTRY.register(Histogram(
+    'weather_stage_seconds', 'Time spent per processing stage (fetch, parse, aggregate, render)', ['stage']))
+upstream_requests = REGISTRY.register(Counter(
+    'weather_upstream_requests_total', 'Upstream HTTP requests by endpoint and status', ['endpoint', 'status']))
+upstream_in_flight = REGISTRY.register(Gauge(
+    'weather_upstream_in_flight', 'Upstream HTTP requests currently in flight'))
+upstream_in_flight.set(0)
+
+@contextmanager
+def stage_timer(stage):
+    """Record the duration of a block under weather_stage_seconds{stage}"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage)
+
+def timed(stage):
+    """Decorator recording each call's duration under weather_stage_seconds{stage}"""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stage_seconds.observe(time.perf_counter() - started, stage)
+        return wrapper
+    return decorator
+
+def render_metrics():
+    """Current metrics in Prometheus text format"""
+    return REGISTRY.render()
+
+def write_metrics_file(path=METRICS_FILE):
+    """Atomically write the current metrics to a file (for node_exporter's textfile collector)"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(render_metrics())
+    os.replace(temp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_http_server = None
+_file_writer_started = False
+_exporter_lock = threading.Lock()
+
+def start_metrics_exporter(port=METRICS_PORT, path=METRICS_FILE):
+    """Start the sidecar endpoint and/or file writer once per process, as configured
+
+    A port that cannot be bound (e.g. another app process holds it) is logged rather than
+    raised into the page, and bound on a later call once it is free.
+    """
+    global _http_server, _file_writer_started
+    if not METRICS_ENABLED:
+        return
+    with _exporter_lock:
+        if port and _http_server is None:
+            try:
+                server = ThreadingHTTPServer((METRICS_HOST, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning("Metrics endpoint not started on %s:%s: %s", METRICS_HOST, port, e)
+            else:
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+                _http_server = server
+        if path and not _file_writer_started:
+            def write_forever():
+                while True:
+                    write_metrics_file(path)
+                    time.sleep(METRICS_FILE_INTERVAL)
+            threading.Thread(target=write_forever, name='metrics-file', daemon=True).start()
+            _file_writer_started = True
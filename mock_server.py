@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Mock Weather API Server
+Local stand-in for OpenWeatherMap and ip-api.com with tunable latency, errors and payload size
+
+Run: python mock_server.py --port 8000 --latency-median 0.1 --latency-p99 0.8 --error-rate 0.02
+Then point the app at it with OPENWEATHER_HOST=http://127.0.0.1:8000
+and IP_LOCATION_URL=http://127.0.0.1:8000/json/
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# z-score of the 99th percentile of a standard normal distribution
+_Z99 = 2.326
+
+CONDITIONS = [
+    (800, 'Clear', 'clear sky', '01'),
+    (801, 'Clouds', 'few clouds', '02'),
+    (803, 'Clouds', 'broken clouds', '04'),
+    (500, 'Rain', 'light rain', '10'),
+    (502, 'Rain', 'heavy intensity rain', '10'),
+    (300, 'Drizzle', 'light intensity drizzle', '09'),
+    (211, 'Thunderstorm', 'thunderstorm', '11'),
+    (600, 'Snow', 'light snow', '13'),
+    (701, 'Mist', 'mist', '50'),
+]
+
+class MockConfig:
+    """Latency distribution, failure mix and payload shape for the mock API"""
+
+    def __init__(self, latency_median=0.1, latency_p99=0.5, error_rate=0.0,
+                 rate_limit_share=0.0, forecast_slots=40, padding_bytes=0, seed=None):
+        self.latency_median = latency_median
+        self.latency_p99 = max(latency_p99, latency_median)
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share
+        self.forecast_slots = forecast_slots
+        self.padding_bytes = padding_bytes
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def sample_latency(self):
+        """Draw a lognormal latency matching the configured median and p99"""
+        if self.latency_median <= 0:
+            return 0.0
+        mu = math.log(self.latency_median)
+        sigma = (math.log(self.latency_p99) - mu) / _Z99
+        with self._lock:
+            return self._random.lognormvariate(mu, sigma)
+
+    def sample_failure(self):
+        """Return an HTTP error status to inject, or None"""
+        with self._lock:
+            self.requests += 1
+            if self._random.random() >= self.error_rate:
+                return None
+            self.errors += 1
+            return 429 if self._random.random() < self.rate_limit_share else 503
+
+def _seed_for(*parts):
+    """Stable per-location seed so repeated lookups return consistent data"""
+    return zlib.crc32('|'.join(str(p) for p in parts).encode('utf-8'))
+
+def _location(params):
+    """Resolve query params to (name, lat, lon)"""
+    if 'q' in params:
+        name = params['q'][0].split(',')[0].strip().title()
+        rng = random.Random(_seed_for(name.lower()))
+        return name, round(rng.uniform(-60, 70), 4), round(rng.uniform(-180, 180), 4)
+    lat = float(params.get('lat', ['0'])[0])
+    lon = float(params.get('lon', ['0'])[0])
+    return f"Place {lat:.2f},{lon:.2f}", lat, lon
+
+def current_payload(name, lat, lon, config):
+    """Build a /data/2.5/weather style response"""
+    rng = random.Random(_seed_for(name, int(time.time() // 600)))
+    cid, main, description, icon = rng.choice(CONDITIONS)
+    temp = round(rng.uniform(-10, 35), 2)
+    payload = {
+        'coord': {'lon': lon, 'lat': lat},
+        'weather': [{'id': cid, 'main': main, 'description': description, 'icon': icon + 'd'}],
+        'base': 'stations',
+        'main': {
+            'temp': temp, 'feels_like': temp - 1, 'temp_min': temp - 2, 'temp_max': temp + 2,
+            'pressure': rng.randint(990, 1030), 'humidity': rng.randint(20, 100)
+        },
+        'visibility': 10000,
+        'wind': {'speed': round(rng.uniform(0, 12), 1), 'deg': rng.randint(0, 359)},
+        'clouds': {'all': rng.randint(0, 100)},
+        'dt': int(time.time()),
+        'sys': {'country': 'XX', 'sunrise': int(time.time()) - 20000, 'sunset': int(time.time()) + 20000},
+        'timezone': 0,
+        'id': _seed_for(name) % 10000000,
+        'name': name,
+        'cod': 200
+    }
+    if config.padding_bytes:
+        payload['padding'] = 'x' * config.padding_bytes
+    return payload
+
+def forecast_payload(name, lat, lon, config):
+    """Build a /data/2.5/forecast style response"""
+    rng = random.Random(_seed_for(name, 'forecast', int(time.time() // 10800)))
+    start = int(time.time()) // 10800 * 10800 + 10800
+    base_temp = rng.uniform(-5, 30)
+    slots = []
+    for i in range(config.forecast_slots):
+        cid, main, description, icon = rng.choice(CONDITIONS)
+        temp = round(base_temp + 6 * math.sin(i * math.pi / 4) + rng.uniform(-2, 2), 2)
+        slot = {
+            'dt': start + i * 10800,
+            'main': {'temp': temp, 'feels_like': temp - 1, 'temp_min': temp - 1, 'temp_max': temp + 1,
+                     'pressure': 1010, 'humidity': rng.randint(20, 100)},
+            'weather': [{'id': cid, 'main': main, 'description': description, 'icon': icon + 'd'}],
+            'clouds': {'all': rng.randint(0, 100)},
+            'wind': {'speed': round(rng.uniform(0, 12), 1), 'deg': rng.randint(0, 359)},
+            'pop': round(rng.random(), 2),
+            'dt_txt': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + i * 10800))
+        }
+        if main in ('Rain', 'Drizzle', 'Thunderstorm'):
+            slot['rain'] = {'3h': round(rng.uniform(0.1, 8), 2)}
+        elif main == 'Snow':
+            slot['snow'] = {'3h': round(rng.uniform(0.1, 5), 2)}
+        slots.append(slot)
+    payload = {
+        'cod': '200', 'message': 0, 'cnt': len(slots), 'list': slots,
+        'city': {'id': _seed_for(name) % 10000000, 'name': name, 'coord': {'lat': lat, 'lon': lon},
+                 'country': 'XX', 'timezone': int(round(lon / 15)) * 3600}
+    }
+    if config.padding_bytes:
+        payload['padding'] = 'x' * config.padding_bytes
+    return payload
+
+def make_handler(config):
+    """Build a request handler class bound to a MockConfig"""
+
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            if status == 429:
+                self.send_header('Retry-After', '1')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            time.sleep(config.sample_latency())
+            failure = config.sample_failure()
+            if failure:
+                self._send(failure, {'cod': failure, 'message': 'injected failure'})
+                return
+
+            if url.path == '/json/':
+                self._send(200, {'status': 'success', 'city': 'Mocksville', 'lat': 51.5, 'lon': -0.12})
+                return
+            name, lat, lon = _location(params)
+            if params.get('q', [''])[0].lower().startswith('nowhere'):
+                if url.path == '/geo/1.0/direct':
+                    self._send(200, [])
+                else:
+                    self._send(404, {'cod': '404', 'message': 'city not found'})
+            elif url.path == '/data/2.5/weather':
+                self._send(200, current_payload(name, lat, lon, config))
+            elif url.path == '/data/2.5/forecast':
+                self._send(200, forecast_payload(name, lat, lon, config))
+            elif url.path == '/geo/1.0/direct':
+                self._send(200, [{'name': name, 'lat': lat, 'lon': lon, 'country': 'XX'}])
+            else:
+                self._send(404, {'message': 'unknown endpoint'})
+
+    return MockHandler
+
+def start_server(config=None, host='127.0.0.1', port=0):
+    """Start the mock server on a daemon thread and return it (server.server_port has the port)"""
+    server = ThreadingHTTPServer((host, port), make_handler(config or MockConfig()))
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, name='mock-weather-api', daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenWeatherMap / ip-api server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-median', type=float, default=0.1, help="seconds")
+    parser.add_argument('--latency-p99', type=float, default=0.5, help="seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument('--rate-limit-share', type=float, default=0.0, help="fraction of failures returned as 429")
+    parser.add_argument('--forecast-slots', type=int, default=40)
+    parser.add_argument('--padding-bytes', type=int, default=0, help="extra bytes added to each payload")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_median, args.latency_p99, args.error_rate,
+                        args.rate_limit_share, args.forecast_slots, args.padding_bytes, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    print(f"🧪 Mock weather API on http://{args.host}:{args.port}")
+    print(f"   OPENWEATHER_HOST=http://{args.host}:{args.port}")
+    print(f"   IP_LOCATION_URL=http://{args.host}:{args.port}/json/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed {config.requests} requests ({config.errors} injected errors)")
+
+if __name__ == "__main__":
+    main()
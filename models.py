@@ -0,0 +1,31 @@
+"""
+Weather Data Models
+Provider-independent records for current conditions and forecasts
+"""
+
+from collections import namedtuple
+
+# Temperatures in °C, times as UTC unix timestamps, precipitation in mm
+CurrentWeather = namedtuple('CurrentWeather', [
+    'name', 'lat', 'lon', 'temp', 'temp_min', 'temp_max',
+    'condition', 'description', 'condition_id', 'icon', 'observed_at', 'provider'
+])
+
+ForecastSlot = namedtuple('ForecastSlot', [
+    'dt', 'temp', 'temp_min', 'temp_max', 'condition', 'condition_id', 'icon', 'precipitation'
+])
+
+# timezone_offset is the location's UTC offset in seconds
+Forecast = namedtuple('Forecast', ['lat', 'lon', 'timezone_offset', 'slots', 'provider'])
+
+SECONDS_PER_DAY = 86400
+# Day 0 of the unix epoch (1970-01-01) was a Thursday
+WEEKDAY_NAMES = ('Thu', 'Fri', 'Sat', 'Sun', 'Mon', 'Tue', 'Wed')
+
+def local_day(timestamp, timezone_offset=0):
+    """Local calendar day of a UTC timestamp, counted in days since 1970-01-01"""
+    return (timestamp + timezone_offset) // SECONDS_PER_DAY
+
+def weekday_name(day):
+    """Short weekday name of a local_day() value"""
+    return WEEKDAY_NAMES[day % 7]
@@ -0,0 +1,84 @@
+"""
+Operator Dashboard
+API quota and cost accounting for the weather app; requires OPERATOR_TOKEN
+"""
+
+import hmac
+import os
+from datetime import datetime, timezone
+import streamlit as st
+from quota import get_quota_ledger, WARNING, EXCEEDED
+from rate_limit import get_rate_limiter
+from utils import API_KEY, get_cache_stats, get_coalescing_stats
+
+OPERATOR_TOKEN = os.getenv('OPERATOR_TOKEN', '')
+
+st.set_page_config(page_title="Weather App - Operator", page_icon="🛠️", layout="wide")
+
+def is_operator():
+    """Check the session, ?token= or a password prompt against OPERATOR_TOKEN"""
+    if st.session_state.get('operator'):
+        return True
+    token = st.query_params.get('token') or st.text_input("Operator token", type="password")
+    if token and hmac.compare_digest(token.encode('utf-8'), OPERATOR_TOKEN.encode('utf-8')):
+        st.session_state['operator'] = True
+        return True
+    if token:
+        st.error("❌ Invalid operator token")
+    return False
+
+def show_usage(ledger):
+    """Today's usage, burn rate and end-of-day projection against the quota"""
+    usage = ledger.usage()
+    cols = st.columns(4)
+    cols[0].metric("Calls today (UTC)", f"{usage['used']:,}")
+    cols[1].metric("Calls / minute", f"{usage['calls_per_minute']:.1f}")
+    cols[2].metric("Projected today", f"{usage['projected']:,.0f}")
+    cols[3].metric("Daily quota", f"{usage['quota']:,}")
+    st.progress(min(1.0, usage['projected_ratio']),
+                text=f"Projected {usage['projected_ratio']:.0%} of quota")
+
+    if usage['status'] == EXCEEDED:
+        st.error("🚨 Daily quota exhausted: further calls may be rejected or billed as overage")
+    elif usage['status'] == WARNING:
+        st.warning(f"⚠️ Projected to use {usage['projected_ratio']:.0%} of the daily quota; consider shedding "
+                   "background refreshes (lower OWM_BACKGROUND_MAX_WAIT or REFRESH_WORKERS) or raising cache TTLs")
+
+    history = ledger.per_minute_history()
+    st.caption("Billable upstream calls per minute (last hour)")
+    st.bar_chart(
+        {'minutes from now': list(range(1 - len(history), 1)), 'calls': [count for _, count in history]},
+        x='minutes from now', y='calls'
+    )
+
+def show_breakdown(ledger):
+    """Calls by endpoint and caller, and how many lookups caching avoided"""
+    left, right = st.columns(2)
+    with left:
+        st.subheader("By endpoint")
+        st.dataframe(ledger.by_endpoint(), hide_index=True)
+    with right:
+        st.subheader("By caller")
+        st.dataframe(
+            [dict(row, saved_ratio=row['saved_ratio'] * 100) for row in ledger.by_caller()], hide_index=True,
+            column_config={'saved_ratio': st.column_config.ProgressColumn(
+                "saved", format="%.0f%%", min_value=0.0, max_value=100.0)}
+        )
+
+    st.subheader("Caches and pacing")
+    st.dataframe(get_cache_stats(), hide_index=True)
+    cols = st.columns(2)
+    cols[0].json(get_coalescing_stats())
+    cols[1].json(get_rate_limiter(API_KEY).stats())
+
+st.title("🛠️ Operator Dashboard")
+
+if not OPERATOR_TOKEN:
+    st.info("The operator dashboard is disabled. Set OPERATOR_TOKEN to enable it.")
+elif is_operator():
+    ledger = get_quota_ledger()
+    st.caption(f"Accounting since 00:00 UTC · refreshed {datetime.now(timezone.utc):%H:%M:%S} UTC")
+    show_usage(ledger)
+    show_breakdown(ledger)
+    if st.button("🔄 Refresh"):
+        st.rerun()
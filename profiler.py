@@ -0,0 +1,116 @@
+"""
+Rerun Profiler for Weather App
+Opt-in cProfile of each Streamlit rerun with rotating profile files and an operator summary
+"""
+
+import cProfile
+import hmac
+import os
+import pstats
+import threading
+import time
+import streamlit as st
+
+# Profile every rerun, or only operators' reruns whose URL carries ?<PROFILE_QUERY_PARAM>=<OPERATOR_TOKEN>
+# (the query switch is off unless both are set)
+PROFILE_RERUNS = os.getenv('PROFILE_RERUNS', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_QUERY_PARAM = os.getenv('PROFILE_QUERY_PARAM', '')
+OPERATOR_TOKEN = os.getenv('OPERATOR_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('.cache', 'profiles'))
+# Newest profile files kept; older ones are deleted
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '10'))
+
+# Script import time of the first rerun in this process (later reruns hit sys.modules)
+_first_import_seconds = None
+_rotate_lock = threading.Lock()
+
+def note_import_time(seconds):
+    """Record how long the script's imports took; the first call per process is kept"""
+    global _first_import_seconds
+    if _first_import_seconds is None:
+        _first_import_seconds = seconds
+
+def _switched_on():
+    """Whether an operator turned on profiling for this rerun with the query switch"""
+    if not PROFILE_QUERY_PARAM or not OPERATOR_TOKEN:
+        return False
+    value = st.query_params.get(PROFILE_QUERY_PARAM, '')
+    if not value:
+        return False
+    # Sessions signed in on the operator page may use ?profile=1; anyone else needs the token
+    if st.session_state.get('operator') and value.lower() in ('1', 'true', 'yes'):
+        return True
+    return hmac.compare_digest(value.encode('utf-8'), OPERATOR_TOKEN.encode('utf-8'))
+
+def is_enabled():
+    """Whether this rerun should be profiled"""
+    return PROFILE_RERUNS or _switched_on()
+
+def top_functions(profile, n=PROFILE_TOP_N):
+    """The n functions with the most self time as dicts"""
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'self_ms': round(tottime * 1000, 3),
+            'cumulative_ms': round(cumtime * 1000, 3)
+        })
+    rows.sort(key=lambda row: row['self_ms'], reverse=True)
+    return rows[:n]
+
+def save_profile(profile, directory=PROFILE_DIR, keep=PROFILE_KEEP):
+    """Dump a profile as <directory>/rerun-<time>-<pid>.prof and delete the oldest beyond keep"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"rerun-{time.time_ns()}-{os.getpid()}.prof")
+    profile.dump_stats(path)
+    with _rotate_lock:
+        # Names start with a nanosecond timestamp, so they sort oldest first
+        files = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+        for old in files[:-keep] if keep > 0 else []:
+            try:
+                os.remove(os.path.join(directory, old))
+            except OSError:
+                pass
+    return path
+
+def render_summary(summary):
+    """Show a collapsed profile summary panel for operators"""
+    with st.expander("⏱️ Rerun profile", expanded=False):
+        cols = st.columns(3)
+        cols[0].metric("Wall", f"{summary['wall_ms']:.1f} ms")
+        cols[1].metric("CPU", f"{summary['cpu_ms']:.1f} ms")
+        if summary['first_import_ms'] is not None:
+            cols[2].metric("Imports (first run)", f"{summary['first_import_ms']:.0f} ms")
+        st.caption("Functions are from the script thread only; wall time includes waiting on fetch "
+                   f"workers and CPU time is process-wide. Saved to {summary['path']}")
+        st.dataframe(summary['top'], hide_index=True)
+
+def run_profiled(main):
+    """Run main(), profiling it if enabled for this rerun; costs one flag check otherwise
+
+    The summary panel names internal modules and functions, so only operators see it: a
+    PROFILE_RERUNS profile of anyone else's rerun is saved to PROFILE_DIR without one.
+    """
+    switched = _switched_on()
+    if not (PROFILE_RERUNS or switched):
+        return main()
+
+    profile = cProfile.Profile()
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        return profile.runcall(main)
+    finally:
+        # Runs on st.stop()/rerun exceptions too, so every rerun leaves a profile
+        summary = {
+            'wall_ms': (time.perf_counter() - wall_started) * 1000,
+            'cpu_ms': (time.process_time() - cpu_started) * 1000,
+            'first_import_ms': _first_import_seconds * 1000 if _first_import_seconds is not None else None,
+            'top': top_functions(profile),
+            'path': save_profile(profile)
+        }
+        if switched or st.session_state.get('operator'):
+            render_summary(summary)
@@ -0,0 +1,385 @@
+"""
+Weather Providers
+Pluggable weather backends normalized to models.py, with racing and failover
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import httpx
+import requests
+from http_client import http_get, redact
+from async_http import fetch_json
+from decoding import decode_current, decode_forecast, DecodeError
+from rate_limit import get_rate_limiter, RateLimitTimeout, BACKGROUND
+from resilience import CircuitOpenError
+
+PROVIDER_MODE = os.getenv('WEATHER_PROVIDER_MODE', 'failover')
+PROVIDER_WORKERS = int(os.getenv('PROVIDER_WORKERS', '8'))
+
+# Seconds a failed call is assumed to cost when ranking providers
+FAILURE_PENALTY = 1.0
+
+FAILOVER = 'failover'
+RACE = 'race'
+
+class ProviderError(Exception):
+    """Raised when a provider (or every provider in a pool) cannot answer"""
+
+class LocationNotFound(ProviderError):
+    """Raised when a provider answered but does not know the location (e.g. an unknown city)"""
+
+class WeatherProvider:
+    """Interface every weather backend implements"""
+    name = 'provider'
+
+    def current_by_coords(self, lat, lon):
+        """Return CurrentWeather for coordinates"""
+        raise NotImplementedError
+
+    def current_by_city(self, city):
+        """Return CurrentWeather for a city name"""
+        raise NotImplementedError
+
+    def forecast(self, lat, lon):
+        """Return a Forecast for coordinates"""
+        raise NotImplementedError
+
+    # Coroutine forms for async_client and batch; by default the blocking call runs in a worker thread
+    async def current_by_coords_async(self, lat, lon):
+        return await asyncio.to_thread(self.current_by_coords, lat, lon)
+
+    async def current_by_city_async(self, city):
+        return await asyncio.to_thread(self.current_by_city, city)
+
+    async def forecast_async(self, lat, lon):
+        return await asyncio.to_thread(self.forecast, lat, lon)
+
+def normalize_owm_current(data, provider='openweathermap'):
+    """Convert an OpenWeatherMap /weather payload (raw or parsed) to CurrentWeather"""
+    try:
+        return decode_current(data, provider)
+    except DecodeError as e:
+        raise ProviderError(str(e)) from e
+
+def normalize_owm_forecast(data, provider='openweathermap'):
+    """Convert an OpenWeatherMap /forecast payload (raw or parsed) to Forecast"""
+    try:
+        return decode_forecast(data, provider)
+    except DecodeError as e:
+        raise ProviderError(str(e)) from e
+
+class OpenWeatherMapProvider(WeatherProvider):
+    """OpenWeatherMap 2.5 current weather and 5-day/3-hour forecast"""
+    name = 'openweathermap'
+
+    def __init__(self, api_key, base_url):
+        self.api_key = api_key
+        self.base_url = base_url
+
+    def _get(self, path, params):
+        """GET an endpoint's raw JSON body, raising ProviderError on failure"""
+        limiter = get_rate_limiter(self.api_key)
+        try:
+            # Every attempt spends a token; a hedged duplicate only goes out if there is spare quota
+            response = http_get(f"{self.base_url}/{path}", params=dict(params, appid=self.api_key, units='metric'),
+                                acquire=limiter.acquire, may_hedge=lambda: limiter.try_acquire(BACKGROUND))
+        except (requests.exceptions.RequestException, RateLimitTimeout) as e:
+            # requests quotes the URL, API key included, in its messages; the cause is dropped for the same reason
+            raise ProviderError(f"{self.name} {path} failed: {type(e).__name__}: {redact(e)}") from None
+        if response.status_code == 404:
+            raise LocationNotFound(f"{self.name} does not know {params}")
+        if not response.ok:
+            raise ProviderError(f"{self.name} {path} failed: HTTP {response.status_code}")
+        return response.content
+
+    def current_by_coords(self, lat, lon):
+        return normalize_owm_current(self._get('weather', {'lat': lat, 'lon': lon}), self.name)
+
+    def current_by_city(self, city):
+        return normalize_owm_current(self._get('weather', {'q': city}), self.name)
+
+    def forecast(self, lat, lon):
+        return normalize_owm_forecast(self._get('forecast', {'lat': lat, 'lon': lon}), self.name)
+
+    async def _get_async(self, path, params, normalize):
+        """Coroutine form of _get over the event loop's httpx client, returning the normalized record"""
+        try:
+            return await fetch_json(f"{self.base_url}/{path}", dict(params, appid=self.api_key, units='metric'),
+                                    lambda body: normalize(body, self.name), get_rate_limiter(self.api_key))
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                raise LocationNotFound(f"{self.name} does not know {params}") from None
+            raise ProviderError(f"{self.name} {path} failed: HTTP {e.response.status_code}") from None
+        except (httpx.HTTPError, RateLimitTimeout, CircuitOpenError) as e:
+            # httpx quotes the URL, API key included, in its messages too
+            raise ProviderError(f"{self.name} {path} failed: {type(e).__name__}: {redact(e)}") from None
+
+    async def current_by_coords_async(self, lat, lon):
+        return await self._get_async('weather', {'lat': lat, 'lon': lon}, normalize_owm_current)
+
+    async def current_by_city_async(self, city):
+        return await self._get_async('weather', {'q': city}, normalize_owm_current)
+
+    async def forecast_async(self, lat, lon):
+        return await self._get_async('forecast', {'lat': lat, 'lon': lon}, normalize_owm_forecast)
+
+class StubProvider(WeatherProvider):
+    """Canned responses with optional delay and failure, for offline tests and load runs"""
+
+    def __init__(self, name, current=None, forecast=None, delay=0.0, fail=False):
+        self.name = name
+        self._current = current
+        self._forecast = forecast
+        self.delay = delay
+        self.fail = fail
+
+    def _answer(self, value):
+        """Return value after the configured delay, or fail"""
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail or value is None:
+            raise ProviderError(f"{self.name} has no answer")
+        return value
+
+    def current_by_coords(self, lat, lon):
+        return self._answer(self._current)
+
+    def current_by_city(self, city):
+        return self._answer(self._current)
+
+    def forecast(self, lat, lon):
+        return self._answer(self._forecast)
+
+class ProviderHealth:
+    """Exponentially weighted latency and error rate for one provider"""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        """Fold one call outcome into the averages"""
+        with self._lock:
+            self.calls += 1
+            self.latency = seconds if self.latency is None else (
+                self.alpha * seconds + (1 - self.alpha) * self.latency)
+            self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+
+    def score(self):
+        """Expected cost of a call; lower is better (untried providers go first)"""
+        if self.latency is None:
+            return 0.0
+        # A failure costs a retry elsewhere, however fast it failed
+        return self.latency + self.error_rate * FAILURE_PENALTY
+
+class ProviderPool:
+    """Several providers behind one interface, raced or tried in order of measured health"""
+
+    def __init__(self, providers, mode=PROVIDER_MODE, race_width=2):
+        if not providers:
+            raise ValueError("ProviderPool needs at least one provider")
+        self.providers = list(providers)
+        self.mode = mode
+        self.race_width = race_width
+        self.health = {p.name: ProviderHealth() for p in self.providers}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=PROVIDER_WORKERS, thread_name_prefix='weather-provider')
+
+    def add(self, provider):
+        """Add a provider, replacing any of the same name (its measured health is kept)"""
+        with self._lock:
+            self.health.setdefault(provider.name, ProviderHealth())
+            self.providers = [p for p in self.providers if p.name != provider.name] + [provider]
+
+    def close(self):
+        """Stop the race worker threads once running calls finish"""
+        self._executor.shutdown(wait=False)
+
+    def ranked(self):
+        """Providers ordered best first by latency and error rate"""
+        return sorted(self.providers, key=lambda p: self.health[p.name].score())
+
+    def _timed(self, provider, method, args):
+        """Call a provider method and record its health"""
+        started = time.monotonic()
+        try:
+            result = getattr(provider, method)(*args)
+        except LocationNotFound:
+            # A clean "no such place" is an answer, not a sign of an unhealthy provider
+            self.health[provider.name].record(time.monotonic() - started, True)
+            raise
+        except Exception:
+            self.health[provider.name].record(time.monotonic() - started, False)
+            raise
+        self.health[provider.name].record(time.monotonic() - started, True)
+        return result
+
+    async def _timed_async(self, provider, method, args):
+        """Await a provider's coroutine method and record its health"""
+        started = time.monotonic()
+        try:
+            result = await getattr(provider, method + '_async')(*args)
+        except LocationNotFound:
+            self.health[provider.name].record(time.monotonic() - started, True)
+            raise
+        except Exception:
+            self.health[provider.name].record(time.monotonic() - started, False)
+            raise
+        self.health[provider.name].record(time.monotonic() - started, True)
+        return result
+
+    def _call(self, method, *args):
+        """Dispatch a call according to the pool mode"""
+        if self.mode == RACE:
+            return self._race(method, args)
+        return self._failover(method, args)
+
+    def _failover(self, method, args):
+        """Try providers best first until one answers"""
+        errors = []
+        for provider in self.ranked():
+            try:
+                return self._timed(provider, method, args)
+            except Exception as e:
+                errors.append((provider, e))
+        raise _all_failed(errors)
+
+    def _race(self, method, args):
+        """Ask the best few providers at once and take the first answer"""
+        contenders = self.ranked()[:self.race_width]
+        # Each contender runs in a copy of the caller's context so quota attribution and priority carry over
+        pending = {
+            self._executor.submit(contextvars.copy_context().run, self._timed, p, method, args): p
+            for p in contenders
+        }
+        errors = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                if future.exception() is None:
+                    return future.result()
+                errors.append((provider, future.exception()))
+        # Every contender failed; fall back to the rest in order
+        rest = [p for p in self.ranked() if p not in contenders]
+        for provider in rest:
+            try:
+                return self._timed(provider, method, args)
+            except Exception as e:
+                errors.append((provider, e))
+        raise _all_failed(errors)
+
+    async def _call_async(self, method, *args):
+        """Coroutine form of _call: the same failover or race over the providers' async methods"""
+        if self.mode == RACE:
+            return await self._race_async(method, args)
+        return await self._failover_async(method, args)
+
+    async def _failover_async(self, method, args):
+        """Try providers best first until one answers"""
+        errors = []
+        for provider in self.ranked():
+            try:
+                return await self._timed_async(provider, method, args)
+            except Exception as e:
+                errors.append((provider, e))
+        raise _all_failed(errors)
+
+    async def _race_async(self, method, args):
+        """Ask the best few providers at once and take the first answer"""
+        contenders = self.ranked()[:self.race_width]
+        # Tasks inherit the caller's context, so quota attribution and priority carry over
+        pending = {asyncio.ensure_future(self._timed_async(p, method, args)): p for p in contenders}
+        errors = []
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider = pending.pop(task)
+                if task.exception() is None:
+                    # Like the threaded race, losers run to completion so their health is still measured
+                    for loser in pending:
+                        loser.add_done_callback(_discard_outcome)
+                    return task.result()
+                errors.append((provider, task.exception()))
+        rest = [p for p in self.ranked() if p not in contenders]
+        for provider in rest:
+            try:
+                return await self._timed_async(provider, method, args)
+            except Exception as e:
+                errors.append((provider, e))
+        raise _all_failed(errors)
+
+    def current_by_coords(self, lat, lon):
+        return self._call('current_by_coords', lat, lon)
+
+    def current_by_city(self, city):
+        return self._call('current_by_city', city)
+
+    def forecast(self, lat, lon):
+        return self._call('forecast', lat, lon)
+
+    async def current_by_coords_async(self, lat, lon):
+        return await self._call_async('current_by_coords', lat, lon)
+
+    async def current_by_city_async(self, city):
+        return await self._call_async('current_by_city', city)
+
+    async def forecast_async(self, lat, lon):
+        return await self._call_async('forecast', lat, lon)
+
+    def stats(self):
+        """Return per-provider health for monitoring"""
+        return [
+            {'name': name, 'calls': h.calls, 'latency': h.latency, 'error_rate': h.error_rate}
+            for name, h in self.health.items()
+        ]
+
+def _discard_outcome(task):
+    """Done callback for a race loser: retrieve its error so asyncio does not report it as unhandled"""
+    if not task.cancelled():
+        task.exception()
+
+def _all_failed(errors):
+    """Error for a call no provider answered: LocationNotFound if none of them knew the location"""
+    message = "; ".join(f"{provider.name}: {e}" for provider, e in errors)
+    if all(isinstance(e, LocationNotFound) for _, e in errors):
+        return LocationNotFound(message)
+    return ProviderError("All providers failed: " + message)
+
+_registry = {}
+_registry_lock = threading.Lock()
+_pool = None
+
+def register_provider(provider):
+    """Add a provider to the registry (and to the process-wide pool if it already exists)"""
+    with _registry_lock:
+        _registry[provider.name] = provider
+        if _pool is not None:
+            _pool.add(provider)
+
+def get_provider(name):
+    """Get a registered provider by name"""
+    return _registry.get(name)
+
+def list_providers():
+    """Names of all registered providers"""
+    return list(_registry)
+
+def get_provider_pool():
+    """Get the process-wide pool over every registered provider, created on first use
+
+    One pool per process keeps the measured health that ranks providers and one set of race workers.
+    """
+    global _pool
+    if _pool is None:
+        with _registry_lock:
+            if _pool is None:
+                _pool = ProviderPool(_registry.values())
+    return _pool
@@ -0,0 +1,179 @@
+"""
+API Quota Accounting for Weather App
+Upstream calls per host, endpoint and caller, calls saved by caching, and projected daily usage
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Billable calls allowed per UTC day (the 2.5 free tier is 1,000,000 per month)
+DAILY_QUOTA = int(os.getenv('OWM_DAILY_QUOTA', '33000'))
+# Only calls to the OpenWeatherMap host count toward the quota; others (the IP lookup) are just tallied
+QUOTA_HOST = urlsplit(os.getenv('OPENWEATHER_HOST', 'http://api.openweathermap.org')).netloc
+# Warn once projected usage passes this fraction of the quota
+QUOTA_WARN_RATIO = float(os.getenv('QUOTA_WARN_RATIO', '0.8'))
+# Minutes of per-minute history kept, and used for the rate behind the projection
+QUOTA_HISTORY_MINUTES = 60
+QUOTA_RATE_WINDOW_MINUTES = 15
+
+# Why a lookup did not need an upstream call
+SAVED_CACHE = 'cache'
+SAVED_COALESCED = 'coalesced'
+
+OK = 'ok'
+WARNING = 'warning'
+EXCEEDED = 'exceeded'
+
+_caller = contextvars.ContextVar('api_caller', default='other')
+
+@contextmanager
+def api_caller(name):
+    """Attribute upstream calls made in this block (or decorated function) to the named feature"""
+    token = _caller.set(name)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+def current_caller():
+    """Feature that upstream calls from the current context are attributed to"""
+    return _caller.get()
+
+class QuotaLedger:
+    """Counts upstream calls and avoided calls for the current UTC day"""
+
+    def __init__(self, daily_quota=DAILY_QUOTA, quota_host=QUOTA_HOST, clock=time.time):
+        self.daily_quota = daily_quota
+        self.quota_host = quota_host
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reset_day(self._day())
+
+    def _day(self):
+        return int(self._clock() // 86400)
+
+    def _reset_day(self, day):
+        """Start a new accounting day (lock held or during init)"""
+        self.day = day
+        self.calls = defaultdict(int)          # (host, endpoint, caller, background) -> count
+        self.saved = defaultdict(int)          # (caller, reason) -> count
+        self.minutes = deque()                 # [minute, billable count] for the last QUOTA_HISTORY_MINUTES
+
+    def _roll(self):
+        """Reset at UTC midnight (lock held)"""
+        day = self._day()
+        if day != self.day:
+            self._reset_day(day)
+
+    def record_call(self, endpoint, caller=None, background=False, host=None):
+        """Count one request sent upstream; host defaults to the quota host"""
+        host = host or self.quota_host
+        minute = int(self._clock() // 60)
+        with self._lock:
+            self._roll()
+            self.calls[(host, endpoint, caller or current_caller(), background)] += 1
+            if host != self.quota_host:
+                return
+            if self.minutes and self.minutes[-1][0] == minute:
+                self.minutes[-1][1] += 1
+            else:
+                self.minutes.append([minute, 1])
+                while self.minutes[0][0] <= minute - QUOTA_HISTORY_MINUTES:
+                    self.minutes.popleft()
+
+    def record_saved(self, reason, caller=None):
+        """Count one lookup answered without an upstream call"""
+        with self._lock:
+            self._roll()
+            self.saved[(caller or current_caller(), reason)] += 1
+
+    def calls_per_minute(self, window=QUOTA_RATE_WINDOW_MINUTES):
+        """Average upstream calls per minute over the last `window` minutes, this one included"""
+        now_minute = int(self._clock() // 60)
+        with self._lock:
+            recent = sum(count for minute, count in self.minutes if minute > now_minute - window)
+        return recent / window
+
+    def per_minute_history(self):
+        """[(minute_start_timestamp, calls)] for the last QUOTA_HISTORY_MINUTES minutes, oldest first"""
+        now_minute = int(self._clock() // 60)
+        with self._lock:
+            counts = {minute: count for minute, count in self.minutes}
+        return [(m * 60, counts.get(m, 0))
+                for m in range(now_minute - QUOTA_HISTORY_MINUTES + 1, now_minute + 1)]
+
+    def usage(self):
+        """Calls so far today, projected end-of-day total and the quota status"""
+        now = self._clock()
+        rate = self.calls_per_minute()
+        with self._lock:
+            self._roll()
+            used = sum(count for (host, _, _, _), count in self.calls.items() if host == self.quota_host)
+        minutes_left = (86400 - now % 86400) / 60
+        projected = used + rate * minutes_left
+        if used >= self.daily_quota:
+            status = EXCEEDED
+        elif projected >= self.daily_quota * QUOTA_WARN_RATIO:
+            status = WARNING
+        else:
+            status = OK
+        return {
+            'used': used,
+            'quota': self.daily_quota,
+            'calls_per_minute': rate,
+            'projected': projected,
+            'projected_ratio': projected / self.daily_quota if self.daily_quota else 0.0,
+            'status': status
+        }
+
+    def by_endpoint(self):
+        """[{host, endpoint, caller, source, billable, calls}] sorted by calls, most first"""
+        with self._lock:
+            calls = dict(self.calls)
+        rows = [
+            {'host': host, 'endpoint': endpoint, 'caller': caller,
+             'source': 'background' if background else 'interactive',
+             'billable': host == self.quota_host, 'calls': count}
+            for (host, endpoint, caller, background), count in calls.items()
+        ]
+        return sorted(rows, key=lambda row: row['calls'], reverse=True)
+
+    def by_caller(self):
+        """[{caller, calls, saved_<reason>..., saved_ratio}] sorted by calls (all hosts), most first"""
+        with self._lock:
+            calls = dict(self.calls)
+            saved = dict(self.saved)
+        rows = {}
+        for (_, _, caller, _), count in calls.items():
+            rows.setdefault(caller, defaultdict(int))['calls'] += count
+        for (caller, reason), count in saved.items():
+            rows.setdefault(caller, defaultdict(int))[f'saved_{reason}'] += count
+        result = []
+        for caller, row in rows.items():
+            saved_total = row[f'saved_{SAVED_CACHE}'] + row[f'saved_{SAVED_COALESCED}']
+            lookups = row['calls'] + saved_total
+            result.append({
+                'caller': caller,
+                'calls': row['calls'],
+                'saved_cache': row[f'saved_{SAVED_CACHE}'],
+                'saved_coalesced': row[f'saved_{SAVED_COALESCED}'],
+                'saved_ratio': saved_total / lookups if lookups else 0.0
+            })
+        return sorted(result, key=lambda row: row['calls'], reverse=True)
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_quota_ledger():
+    """Get the process-wide quota ledger"""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = QuotaLedger()
+    return _ledger
@@ -0,0 +1,161 @@
+"""
+Rate Limiting for Weather App
+Token-bucket pacing of upstream API calls per API key, with priorities
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# OpenWeatherMap free tier allows 60 calls per minute per key
+RATE_LIMIT_PER_MINUTE = float(os.getenv('OWM_RATE_LIMIT_PER_MINUTE', '60'))
+RATE_LIMIT_BURST = float(os.getenv('OWM_RATE_LIMIT_BURST', '10'))
+# How long a call may queue for a token before failing fast (seconds)
+INTERACTIVE_MAX_WAIT = float(os.getenv('OWM_RATE_LIMIT_MAX_WAIT', '2'))
+BACKGROUND_MAX_WAIT = float(os.getenv('OWM_BACKGROUND_MAX_WAIT', '30'))
+
+# Lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_priority = contextvars.ContextVar('request_priority', default=INTERACTIVE)
+_max_wait = contextvars.ContextVar('request_max_wait', default=None)
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a call could not get a token before its queue deadline"""
+
+@contextmanager
+def request_priority(priority, max_wait=None):
+    """Run upstream calls in this block at the given priority, queueing up to max_wait seconds for
+    a token (default: the priority class's deadline)"""
+    token = _priority.set(priority)
+    wait_token = _max_wait.set(max_wait)
+    try:
+        yield
+    finally:
+        _max_wait.reset(wait_token)
+        _priority.reset(token)
+
+def current_priority():
+    """Priority of upstream calls made from the current context"""
+    return _priority.get()
+
+def default_max_wait(priority):
+    """Queue deadline for a priority class, unless request_priority() set one for this context"""
+    max_wait = _max_wait.get()
+    if max_wait is not None:
+        return max_wait
+    return INTERACTIVE_MAX_WAIT if priority <= INTERACTIVE else BACKGROUND_MAX_WAIT
+
+class TokenBucket:
+    """Token bucket whose waiters are served in priority order"""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self.granted = 0
+        self.timeouts = 0
+
+    def _refill(self):
+        """Add tokens earned since the last update (lock held)"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def _until_next_token(self):
+        """Seconds until one whole token is available (lock held)"""
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+    def try_acquire(self, priority=INTERACTIVE):
+        """Take a token without waiting; queued callers of equal or higher priority go first"""
+        with self._cond:
+            self._refill()
+            if self._waiters and self._waiters[0][0] <= priority:
+                return False
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.granted += 1
+                return True
+            return False
+
+    def acquire(self, priority=None, max_wait=None):
+        """Block until a token is granted, or raise RateLimitTimeout after max_wait seconds"""
+        if priority is None:
+            priority = current_priority()
+        if max_wait is None:
+            max_wait = default_max_wait(priority)
+        entry = (priority, next(self._seq))
+        with self._cond:
+            deadline = time.monotonic() + max_wait
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = self._refill()
+                    if self._waiters[0] == entry and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        self.granted += 1
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise RateLimitTimeout(f"No API quota token within {max_wait:.1f}s")
+                    if self._waiters[0] == entry:
+                        remaining = min(remaining, self._until_next_token())
+                    self._cond.wait(remaining)
+            finally:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    async def acquire_async(self, priority=None, max_wait=None):
+        """Coroutine form of acquire(); yields to the event loop while waiting"""
+        if priority is None:
+            priority = current_priority()
+        if max_wait is None:
+            max_wait = default_max_wait(priority)
+        deadline = time.monotonic() + max_wait
+        while not self.try_acquire(priority):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._cond:
+                    self.timeouts += 1
+                raise RateLimitTimeout(f"No API quota token within {max_wait:.1f}s")
+            with self._cond:
+                wait = self._until_next_token() or 0.05
+            await asyncio.sleep(min(wait, remaining))
+
+    def stats(self):
+        """Return token and queue counters for monitoring"""
+        with self._cond:
+            self._refill()
+            return {
+                'tokens': self._tokens,
+                'queued': len(self._waiters),
+                'granted': self.granted,
+                'timeouts': self.timeouts
+            }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(api_key):
+    """Get the shared limiter for an API key"""
+    with _limiters_lock:
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            limiter = TokenBucket(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+            _limiters[api_key] = limiter
+        return limiter
@@ -0,0 +1,180 @@
+"""
+Resilience for Weather App
+Retry budget with jittered backoff and per-host circuit breakers for upstream calls
+"""
+
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from rate_limit import RateLimitTimeout
+
+# Retries: attempts per request, all within RETRY_BUDGET seconds end to end
+RETRY_ATTEMPTS = int(os.getenv('HTTP_RETRY_ATTEMPTS', '3'))
+RETRY_BUDGET = float(os.getenv('HTTP_RETRY_BUDGET', '8'))
+RETRY_BASE_DELAY = float(os.getenv('HTTP_RETRY_BASE_DELAY', '0.2'))
+RETRY_MAX_DELAY = float(os.getenv('HTTP_RETRY_MAX_DELAY', '2'))
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Circuit breaker: open after this many consecutive failures, probe again after the cooldown
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a host whose circuit breaker is open"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit open for {self.name}; failing fast")
+
+    def record_success(self):
+        """Close the circuit after a healthy response"""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """Count a failure, opening the circuit at the threshold or on a failed probe"""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self):
+        """Return breaker state for monitoring"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'failures': self.failures,
+                'rejected': self.rejected
+            }
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(url):
+    """Get the shared circuit breaker for a URL's host"""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host)
+            _breakers[host] = breaker
+        return breaker
+
+def get_breaker_stats():
+    """Get the state of every circuit breaker"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.stats() for breaker in breakers]
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than a server's Retry-After"""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+def call_with_retries(send, url, connect_timeout, read_timeout,
+                      attempts=RETRY_ATTEMPTS, budget=RETRY_BUDGET, acquire=None):
+    """Call send(timeout) under the host's circuit breaker, retrying within a time budget
+
+    acquire(max_wait=...), e.g. a rate limiter's, runs before every attempt so retries spend
+    quota like first tries; the first waits as long as the limiter allows, a retry only for
+    what is left of the budget.
+    """
+    breaker = get_circuit_breaker(url)
+    deadline = None
+    error = response = None
+    for attempt in range(attempts):
+        if acquire is not None:
+            if deadline is None:
+                acquire(max_wait=None)
+            else:
+                try:
+                    acquire(max_wait=deadline - time.monotonic())
+                except RateLimitTimeout:
+                    # No quota for a retry within the budget: settle for the last outcome
+                    if error is not None:
+                        raise error
+                    return response
+        if deadline is None:
+            deadline = time.monotonic() + budget
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # The token came too late to leave any time for the request
+            if error is not None:
+                raise error
+            return response
+        breaker.check()
+        timeout = (min(connect_timeout, remaining), min(read_timeout, remaining))
+        error = response = retry_after = None
+        try:
+            response = send(timeout)
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            if not isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                raise
+            error = e
+        except BaseException:
+            # Any other way out still settles the call, or a half-open probe would never be released
+            breaker.record_failure()
+            raise
+        else:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRYABLE_STATUS:
+                return response
+            retry_after = response.headers.get('Retry-After')
+
+        # Out of attempts or budget: hand back the last response, or raise the last error
+        delay = backoff_delay(attempt, retry_after)
+        if attempt + 1 >= attempts or time.monotonic() + delay >= deadline:
+            if error is not None:
+                raise error
+            return response
+        time.sleep(delay)
@@ -4,6 +4,7 @@ Handles loading and rendering HTML templates
 """
 
 import os
+from metrics import timed
 
 def load_template(template_name):
     """Load HTML template from templates directory"""
@@ -23,6 +24,7 @@ def load_css():
     except FileNotFoundError:
         return "/* CSS file not found */"
 
+@timed('render')
 def render_weather_card(city_name, weather_icon, temperature, min_temp, max_temp, description, forecast_days_html):
     """Render the main weather card with data"""
     template = load_template('weather_card.html')
@@ -46,6 +48,7 @@ def render_forecast_day(day_name, icon, max_temp, min_temp):
         min_temp=int(min_temp)
     )
 
+@timed('render')
 def render_forecast_days(forecast_list):
     """Render all forecast days"""
     forecast_html = ""
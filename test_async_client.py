@@ -0,0 +1,40 @@
+"""
+Tests for the async transport and fetchers against the local mock API
+"""
+
+import asyncio
+import pytest
+import httpx
+import resilience
+from async_http import fetch_json
+from mock_server import MockConfig, start_server
+
+@pytest.fixture(autouse=True)
+def breakers(monkeypatch):
+    """Fresh circuit breakers, so failures here do not open circuits for other tests"""
+    monkeypatch.setattr(resilience, '_breakers', {})
+
+@pytest.fixture
+def mock_api():
+    server = start_server(MockConfig(latency_median=0.0, latency_p99=0.0, seed=1))
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+def test_fetch_json_decodes_the_body(mock_api):
+    payload = asyncio.run(fetch_json(f"{mock_api}/data/2.5/weather", {'lat': 51.5, 'lon': -0.12}))
+    assert payload['coord'] == {'lat': 51.5, 'lon': -0.12}
+
+def test_status_errors_do_not_quote_the_api_key(mock_api):
+    params = {'q': 'Nowhere', 'appid': 'SECRETKEY'}
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        asyncio.run(fetch_json(f"{mock_api}/data/2.5/weather", params))
+    assert excinfo.value.response.status_code == 404
+    assert 'SECRETKEY' not in str(excinfo.value)
+    assert 'appid=***' in str(excinfo.value)
+
+def test_transport_errors_do_not_quote_the_api_key():
+    # Nothing listens on the discard port
+    with pytest.raises(httpx.TransportError) as excinfo:
+        asyncio.run(fetch_json('http://127.0.0.1:9/data/2.5/weather', {'q': 'London', 'appid': 'SECRETKEY'}))
+    assert 'SECRETKEY' not in str(excinfo.value)
+    assert excinfo.value.__cause__ is None
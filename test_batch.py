@@ -0,0 +1,72 @@
+"""
+Tests for batch lookups: input order, deduplication and the errors handed to callers
+"""
+
+import threading
+import pytest
+import requests
+import async_client
+import history
+import providers
+import resilience
+from batch import get_weather_for_cities
+from models import CurrentWeather
+from providers import ProviderPool, StubProvider, ProviderError, OpenWeatherMapProvider
+from utils import current_weather_cache
+
+def _current(name):
+    return CurrentWeather(name, 10.0, 20.0, 12.0, 10.0, 14.0, 'Clouds', 'overcast clouds', 804, '04d', 0, name)
+
+@pytest.fixture
+def use_pool(monkeypatch):
+    """Serve batch lookups from the given providers, bypassing the cache and the history"""
+    monkeypatch.setattr(history, 'HISTORY_ENABLED', False)
+    monkeypatch.setattr(resilience, '_breakers', {})
+    monkeypatch.setattr(current_weather_cache, 'get', lambda key: None)
+    monkeypatch.setattr(current_weather_cache, 'set', lambda key, value: None)
+    created = []
+
+    def use(*stubs):
+        pool = ProviderPool(stubs)
+        created.append(pool)
+        monkeypatch.setattr(providers, '_pool', pool)
+        return pool
+
+    yield use
+    for pool in created:
+        pool.close()
+
+class Leaky(StubProvider):
+    """A provider that lets a raw requests error, URL and key included, escape"""
+
+    def current_by_coords(self, lat, lon):
+        raise requests.exceptions.ConnectionError(
+            f"Max retries exceeded with url: /data/2.5/weather?lat={lat}&lon={lon}&appid=SECRETKEY")
+
+def test_results_follow_input_order(use_pool):
+    use_pool(StubProvider('stub', current=_current('Here')))
+    results = get_weather_for_cities([(10.0, 20.0), (30.0, 40.0), (10.0, 20.0), ('bad',)])
+    assert [r.location for r in results] == [(10.0, 20.0), (30.0, 40.0), (10.0, 20.0), ('bad',)]
+    assert [r.data.name for r in results[:3]] == ['Here'] * 3
+    assert results[3].data is None and isinstance(results[3].error, ValueError)
+
+def test_errors_never_quote_the_api_key(use_pool):
+    use_pool(Leaky('leaky'), OpenWeatherMapProvider('SECRETKEY', 'http://127.0.0.1:9/data/2.5'))
+    [result] = get_weather_for_cities([(1.0, 2.0)])
+    assert result.data is None
+    assert isinstance(result.error, ProviderError)
+    assert 'SECRETKEY' not in str(result.error)
+    assert 'appid=***' in str(result.error)
+
+def test_history_is_recorded_off_the_event_loop(use_pool, monkeypatch):
+    threads = []
+
+    def record(current):
+        threads.append(threading.current_thread().name)
+        return current
+
+    monkeypatch.setattr(async_client, 'record_current', record)
+    use_pool(StubProvider('stub', current=_current('Here')))
+    get_weather_for_cities([(10.0, 20.0), (30.0, 40.0)])
+    assert len(threads) == 2
+    assert 'weather-async' not in threads
@@ -0,0 +1,99 @@
+"""
+Tests for the response cache's FRESH/STALE/EXPIRED transitions and stale-while-revalidate serving
+"""
+
+import threading
+import time
+import pytest
+import cache
+import utils
+from cache import TTLCache, FRESH, STALE, EXPIRED
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+@pytest.fixture
+def swr_cache(clock):
+    # Fresh for 10s, served stale for 20s more, kept as an error fallback for 100s past the TTL
+    return TTLCache(8, ttl=10, max_stale=20, stale_if_error=100)
+
+def test_entry_ages_through_every_state(clock, swr_cache):
+    swr_cache.set('k', 'v')
+    assert swr_cache.lookup('k') == ('v', FRESH)
+    clock.now += 10
+    assert swr_cache.lookup('k') == ('v', STALE)
+    clock.now += 20
+    assert swr_cache.lookup('k') == ('v', EXPIRED)
+    clock.now += 80
+    assert swr_cache.lookup('k') == (None, None)
+    assert len(swr_cache) == 0
+    stats = swr_cache.stats()
+    assert (stats['hits'], stats['stale_hits'], stats['misses'], stats['expirations']) == (1, 1, 2, 1)
+
+def test_get_only_returns_fresh_entries(clock, swr_cache):
+    swr_cache.set('k', 'v')
+    assert swr_cache.get('k') == 'v'
+    clock.now += 10
+    assert swr_cache.get('k') is None
+    # A refresh restarts the entry's age
+    swr_cache.set('k', 'v2')
+    assert swr_cache.get('k') == 'v2'
+
+def test_plain_ttl_cache_expires_at_the_ttl(clock):
+    plain = TTLCache(8, ttl=10)
+    plain.set('k', 'v')
+    clock.now += 9.9
+    assert plain.lookup('k') == ('v', FRESH)
+    clock.now += 0.1
+    assert plain.lookup('k') == (None, None)
+
+def test_least_recently_used_entry_is_evicted(clock):
+    lru = TTLCache(2, ttl=10)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+    assert lru.stats()['evictions'] == 1
+
+def test_stale_entry_is_served_while_refreshing(clock, swr_cache):
+    swr_cache.set('k', 'old')
+    clock.now += 15
+    refreshed = threading.Event()
+
+    def fetch():
+        refreshed.set()
+        return 'new'
+
+    assert utils._cached(swr_cache, 'k', fetch) == 'old'
+    assert refreshed.wait(5)
+    # The background refresh stores its result shortly after fetch() returns
+    for _ in range(500):
+        if swr_cache.get('k') == 'new':
+            break
+        time.sleep(0.01)
+    assert swr_cache.lookup('k') == ('new', FRESH)
+
+def test_expired_entry_is_only_a_fallback_for_errors(clock, swr_cache):
+    swr_cache.set('k', 'old')
+    clock.now += 50
+    assert utils._cached(swr_cache, 'k', lambda: None) == 'old'
+    assert swr_cache.stats()['stale_fallbacks'] == 1
+    # When the upstream answers, the answer wins and is cached
+    assert utils._cached(swr_cache, 'k', lambda: 'new') == 'new'
+    assert swr_cache.lookup('k') == ('new', FRESH)
+
+def test_failures_are_not_cached(clock, swr_cache):
+    assert utils._cached(swr_cache, 'missing', lambda: None) is None
+    assert swr_cache.lookup('missing') == (None, None)
@@ -0,0 +1,86 @@
+"""
+Tests for CompactForecast: round trips, the bytes format and day views
+"""
+
+import pytest
+from compact_forecast import CompactForecast, COLUMNS
+from models import Forecast, ForecastSlot, SECONDS_PER_DAY
+
+# 2024-01-01 00:00 UTC, a Monday
+MIDNIGHT = 1704067200
+
+def _forecast(slots=8, timezone_offset=0, start=MIDNIGHT):
+    """A forecast of 3-hour slots with a repeating condition pattern"""
+    conditions = [('Clear', 800, '01d'), ('Rain', 500, '10d'), ('Clouds', 803, '04n')]
+    return Forecast(51.5, -0.12, timezone_offset, [
+        ForecastSlot(start + i * 10800, 10.0 + i, 9.0 + i, 11.5 + i, *conditions[i % 3], 0.25 * (i % 2))
+        for i in range(slots)
+    ], 'openweathermap')
+
+def test_round_trip_through_forecast():
+    forecast = _forecast(slots=40)
+    compact = CompactForecast.from_forecast(forecast)
+    assert len(compact) == 40
+    assert compact.to_forecast() == forecast
+    assert compact[-1].to_slot() == forecast.slots[-1]
+    assert CompactForecast.from_forecast(compact) is compact
+
+def test_round_trip_through_bytes():
+    compact = CompactForecast.from_forecast(_forecast(slots=40, timezone_offset=-18000))
+    restored = CompactForecast.from_bytes(compact.to_bytes())
+    assert restored.to_forecast() == compact.to_forecast()
+    assert restored.timezone_offset == -18000
+    assert restored.provider == 'openweathermap'
+    for name, _ in COLUMNS:
+        assert getattr(restored, name) == getattr(compact, name)
+
+def test_empty_forecast():
+    compact = CompactForecast.from_forecast(Forecast(None, None, 0, [], None))
+    assert len(compact) == 0
+    assert compact.days() == []
+    assert compact.nbytes == 0
+    restored = CompactForecast.from_bytes(compact.to_bytes())
+    assert len(restored) == 0
+    assert restored.lat is None and restored.lon is None and restored.provider is None
+    assert restored.conditions == () and restored.icons == ()
+
+def test_empty_string_vocabulary_entry():
+    forecast = Forecast(1.0, 2.0, 0, [ForecastSlot(MIDNIGHT, 1.0, 0.0, 2.0, 'Clear', 800, '', 0.0)], 'stub')
+    restored = CompactForecast.from_bytes(CompactForecast.from_forecast(forecast).to_bytes())
+    assert restored.to_forecast() == forecast
+
+def test_truncated_bytes_raise_value_error():
+    data = CompactForecast.from_forecast(_forecast(slots=16)).to_bytes()
+    for size in (0, 10, len(data) // 2, len(data) - 1):
+        with pytest.raises(ValueError):
+            CompactForecast.from_bytes(data[:size])
+
+def test_bad_magic_raises_value_error():
+    data = CompactForecast.from_forecast(_forecast()).to_bytes()
+    with pytest.raises(ValueError):
+        CompactForecast.from_bytes(b'XXXX' + data[4:])
+
+def test_days_split_on_local_midnight():
+    # 12 slots from 00:00 UTC span 1.5 days in UTC, and start the evening before at UTC-6
+    utc = CompactForecast.from_forecast(_forecast(slots=12))
+    assert [(d.start, d.stop) for d in utc.days()] == [(0, 8), (8, 12)]
+    assert [d.weekday for d in utc.days()] == ['Mon', 'Tue']
+
+    behind = CompactForecast.from_forecast(_forecast(slots=12, timezone_offset=-6 * 3600))
+    days = behind.days()
+    assert [(d.start, d.stop) for d in days] == [(0, 2), (2, 10), (10, 12)]
+    assert days[0].day == MIDNIGHT // SECONDS_PER_DAY - 1
+    assert days[0].weekday == 'Sun'
+
+def test_days_limit_and_aggregates():
+    compact = CompactForecast.from_forecast(_forecast(slots=40))
+    days = compact.days(max_days=2)
+    assert [(d.start, d.stop) for d in days] == [(0, 8), (8, 16)]
+    first = days[0]
+    assert len(first) == 8
+    assert first.min_temp == 10.0 and first.max_temp == 17.0
+    assert first.precipitation == pytest.approx(1.0)
+    assert first.condition == 'Clear'
+    assert [slot.dt for slot in first.slots] == list(compact.dt[:8])
+    # A limit past the end returns every day
+    assert len(compact.days(max_days=10)) == 5
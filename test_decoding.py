@@ -0,0 +1,38 @@
+"""
+Tests for payload decoding: forecast slots that the compact arrays cannot hold are DecodeErrors
+"""
+
+import json
+import pytest
+from decoding import DecodeError, decode_forecast, decode_compact_forecast
+
+def _payload(dt=1704067200, condition_id=500):
+    return json.dumps({
+        'city': {'coord': {'lat': 51.5, 'lon': -0.12}, 'timezone': 0},
+        'list': [{
+            'dt': dt,
+            'main': {'temp': 10.0, 'temp_min': 9.0, 'temp_max': 11.0},
+            'weather': [{'main': 'Rain', 'id': condition_id, 'icon': '10d'}],
+            'rain': {'3h': 0.5},
+        }],
+    })
+
+def test_compact_forecast_from_valid_payload():
+    compact = decode_compact_forecast(_payload())
+    assert list(compact.dt) == [1704067200]
+    assert list(compact.condition_id) == [500]
+
+@pytest.mark.parametrize('dt', [1704067200.5, '1704067200', None, True, -1, 2 ** 32])
+def test_bad_slot_time_is_a_decode_error(dt):
+    with pytest.raises(DecodeError, match='slot time'):
+        decode_compact_forecast(_payload(dt=dt))
+
+@pytest.mark.parametrize('condition_id', [500.0, '500', None, -1, 2 ** 16, 10 ** 30])
+def test_bad_condition_id_is_a_decode_error(condition_id):
+    with pytest.raises(DecodeError, match='condition id'):
+        decode_forecast(_payload(condition_id=condition_id))
+
+def test_missing_condition_id_reads_as_zero():
+    payload = json.loads(_payload())
+    del payload['list'][0]['weather'][0]['id']
+    assert decode_forecast(payload).slots[0].condition_id == 0
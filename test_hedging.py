@@ -0,0 +1,82 @@
+"""
+Tests for request hedging: the hedge budget, the may_hedge() veto and backup races
+"""
+
+import threading
+import time
+import pytest
+import hedging
+from hedging import HedgeBudget, hedged_call
+
+KEY = 'upstream.test/data/2.5/weather'
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Hedging on, with a warmed-up 10 ms latency history and a fresh budget of one hedge"""
+    monkeypatch.setattr(hedging, 'HEDGE_ENABLED', True)
+    monkeypatch.setattr(hedging, '_trackers', {})
+    tracker = hedging.get_latency_tracker(KEY)
+    for _ in range(hedging.HEDGE_MIN_SAMPLES):
+        tracker.record(0.01)
+    budget = HedgeBudget(ratio=0.5, burst=1)
+    budget.earn()
+    budget.earn()
+    monkeypatch.setattr(hedging, '_budget', budget)
+    return budget
+
+def _slow_then_fast():
+    """A call whose first invocation is slow and later ones fast"""
+    calls = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            calls.append(None)
+            first = len(calls) == 1
+        time.sleep(0.3 if first else 0.0)
+        return 'primary' if first else 'backup'
+
+    return call, calls
+
+def test_budget_earns_a_fraction_of_requests_up_to_the_burst():
+    budget = HedgeBudget(ratio=0.25, burst=2)
+    for _ in range(3):
+        budget.earn()
+    assert not budget.available() and not budget.try_spend()
+    budget.earn()
+    assert budget.available() and budget.try_spend()
+    assert not budget.available()
+    for _ in range(100):
+        budget.earn()
+    assert budget.try_spend() and budget.try_spend() and not budget.try_spend()
+    assert (budget.requests, budget.hedges) == (104, 3)
+
+def test_slow_call_is_hedged(budget):
+    call, calls = _slow_then_fast()
+    assert hedged_call(call, KEY) == 'backup'
+    assert len(calls) == 2
+    assert (budget.hedges, budget.hedge_wins) == (1, 1)
+
+def test_veto_keeps_the_budget(budget):
+    call, calls = _slow_then_fast()
+    vetoes = []
+    assert hedged_call(call, KEY, may_hedge=lambda: vetoes.append(True) and False) == 'primary'
+    assert len(calls) == 1 and vetoes
+    assert budget.hedges == 0
+    # The credit is still there for the next slow call the limiter does allow
+    call, calls = _slow_then_fast()
+    assert hedged_call(call, KEY, may_hedge=lambda: True) == 'backup'
+    assert budget.hedges == 1
+
+def test_no_credit_skips_may_hedge(budget):
+    assert budget.try_spend()
+    call, calls = _slow_then_fast()
+    asked = []
+    assert hedged_call(call, KEY, may_hedge=lambda: asked.append(True) or True) == 'primary'
+    # may_hedge() typically takes a rate-limit token, so it is not asked when no backup can go out
+    assert not asked and len(calls) == 1
+
+def test_fast_call_is_not_hedged(budget):
+    asked = []
+    assert hedged_call(lambda: 'quick', KEY, may_hedge=lambda: asked.append(True) or True) == 'quick'
+    assert not asked and budget.hedges == 0
@@ -0,0 +1,131 @@
+"""
+Tests for the observation history: appends, compaction, downsampling and retention
+"""
+
+import os
+import threading
+import numpy as np
+import pytest
+from history import HistoryStore, location_key, ACTIVE_FILE
+
+DAY = 86400
+# 2024-03-15 12:00 UTC; months on either side give segment boundaries to cross
+NOW = 1710504000
+LAT, LON = 51.5, -0.12
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path), retention_days=60, raw_days=7, compact_records=10_000)
+
+def _files(store):
+    return sorted(os.listdir(os.path.join(store.root, location_key(LAT, LON))))
+
+def test_record_and_scan_before_compaction(store):
+    for i in range(5):
+        store.record(LAT, LON, NOW - 600 * i, 10.0 + i, 800)
+    records = store.scan(LAT, LON)
+    assert list(records['t']) == [NOW - 600 * i for i in reversed(range(5))]
+    assert list(records['temp']) == [14.0, 13.0, 12.0, 11.0, 10.0]
+    assert list(store.scan(LAT, LON, NOW - 1200, NOW)['t']) == [NOW - 1200, NOW - 600]
+    assert len(store.scan(9.0, 9.0)) == 0
+
+def test_compaction_writes_month_segments(store):
+    # Hourly observations for the last 20 days cross from February into March
+    times = [NOW - 3600 * i for i in range(20 * 24)]
+    for t in times:
+        store.record(LAT, LON, t, 5.0)
+    store.compact(LAT, LON, now=NOW)
+    assert _files(store) == ['2024-02.npy', '2024-03.npy', 'compact.lock']
+    records = store.scan(LAT, LON)
+    assert list(records['t']) == sorted(times)
+    assert int(records['samples'].sum()) == len(times)
+    # Records appended after a compaction are read alongside the segments
+    store.record(LAT, LON, NOW + 60, 6.0)
+    assert store.scan(LAT, LON, NOW, NOW + 3600)['temp'].tolist() == [5.0, 6.0]
+
+def test_old_records_are_downsampled_to_hourly(store):
+    old = NOW - 10 * DAY
+    for minute in range(0, 60, 10):
+        store.record(LAT, LON, old + minute * 60, float(minute), 800)
+    store.record(LAT, LON, NOW - 60, 1.0, 800)
+    store.compact(LAT, LON, now=NOW)
+    records = store.scan(LAT, LON)
+    assert len(records) == 2
+    hour = records[0]
+    assert int(hour['samples']) == 6
+    assert (float(hour['temp_min']), float(hour['temp_max'])) == (0.0, 50.0)
+    assert float(hour['temp']) == pytest.approx(25.0)
+
+def test_retention_drops_expired_records_and_segments(store):
+    store.record(LAT, LON, NOW - 90 * DAY, 1.0)
+    store.record(LAT, LON, NOW - 61 * DAY, 2.0)
+    store.record(LAT, LON, NOW - DAY, 3.0)
+    store.compact(LAT, LON, now=NOW)
+    assert store.scan(LAT, LON)['temp'].tolist() == [3.0]
+    assert '2023-12.npy' not in _files(store)
+
+    # A later compaction retires a segment that already exists
+    store.compact(LAT, LON, now=NOW + 60 * DAY)
+    assert len(store.scan(LAT, LON)) == 0
+    assert _files(store) == ['compact.lock']
+
+def test_compaction_of_records_already_past_retention(tmp_path):
+    store = HistoryStore(str(tmp_path), retention_days=10)
+    store.record(LAT, LON, NOW - 10.5 * DAY, 10.0)
+    store.compact(LAT, LON, now=NOW)
+    # The pending file is consumed, so later compactions and records work normally
+    assert _files(store) == ['compact.lock']
+    store.record(LAT, LON, NOW - DAY, 11.0)
+    store.compact(LAT, LON, now=NOW)
+    assert store.scan(LAT, LON)['temp'].tolist() == [11.0]
+
+def test_record_triggers_compaction(tmp_path):
+    store = HistoryStore(str(tmp_path), compact_records=50)
+    for i in range(120):
+        store.record(LAT, LON, NOW - i * 60, 1.0)
+    assert store.compactions >= 2
+    assert int(store.scan(LAT, LON)['samples'].sum()) == 120
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    store = HistoryStore(str(tmp_path), compact_records=100)
+
+    def write(worker):
+        for i in range(250):
+            store.record(LAT, LON, NOW - worker * 100_000 - i, float(worker))
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records = store.scan(LAT, LON)
+    assert int(records['samples'].sum()) == 1000
+    assert np.all(np.diff(records['t'].astype(np.int64)) > 0)
+    assert ACTIVE_FILE in _files(store) or store.compactions
+
+def test_downsample_buckets(store):
+    for i in range(12):
+        store.record(LAT, LON, NOW + i * 900, float(i))
+    buckets = store.downsample(LAT, LON, 3 * 3600)
+    assert buckets.samples.tolist() == [12]
+    assert (buckets.temp_min[0], buckets.temp_max[0]) == (0.0, 11.0)
+    assert buckets.temp_mean[0] == pytest.approx(5.5)
+
+def test_repeated_observation_is_stored_once(store):
+    # The API repeats an observation until the next one; every fetch records it
+    for _ in range(3):
+        store.record(LAT, LON, NOW - 600, 8.0)
+    store.compact(LAT, LON, now=NOW)
+    assert store.scan(LAT, LON)['samples'].tolist() == [1]
+
+def test_late_observation_joins_merged_hour(store):
+    hour = NOW - 10 * DAY
+    for minute in (10, 20, 30):
+        store.record(LAT, LON, hour + minute * 60, 4.0)
+    store.compact(LAT, LON, now=NOW)
+    # Arrives after its hour was merged, with the merged record's own timestamp
+    store.record(LAT, LON, hour, 8.0)
+    store.compact(LAT, LON, now=NOW)
+    records = store.scan(LAT, LON)
+    assert records['samples'].tolist() == [4]
+    assert float(records['temp'][0]) == pytest.approx(5.0)
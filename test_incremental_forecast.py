@@ -0,0 +1,96 @@
+"""
+Tests for IncrementalForecast: day-level diffs, retirement and timezone changes
+"""
+
+from compact_forecast import CompactForecast
+from incremental_forecast import IncrementalForecast
+from models import Forecast, ForecastSlot, SECONDS_PER_DAY
+
+# 2024-01-01 00:00 UTC, a Monday
+MIDNIGHT = 1704067200
+FIRST_DAY = MIDNIGHT // SECONDS_PER_DAY
+
+def _forecast(start=MIDNIGHT, slots=40, timezone_offset=0, bump=None):
+    """3-hour slots whose temperature is the slot's hour of the day; bump raises one slot by 5"""
+    return CompactForecast.from_forecast(Forecast(51.5, -0.12, timezone_offset, [
+        ForecastSlot(dt, (dt % SECONDS_PER_DAY) / 3600 + (5 if dt == bump else 0), 0.0, 30.0,
+                     'Rain' if dt % SECONDS_PER_DAY == 0 else 'Clouds', 500, '10d', 0.5)
+        for dt in range(start, start + slots * 10800, 10800)
+    ], 'stub'))
+
+def test_first_update_summarizes_every_day():
+    update = IncrementalForecast().update(_forecast())
+    assert update.changed == [FIRST_DAY + i for i in range(5)]
+    first = update.days[0]
+    assert (first.weekday, first.min_temp, first.max_temp, first.slots) == ('Mon', 0.0, 21.0, 8)
+    assert first.temp_mean == 10.5
+    assert first.precipitation == 4.0
+    assert first.condition == 'Rain'
+
+def test_refresh_recomputes_only_changed_days():
+    aggregate = IncrementalForecast()
+    aggregate.update(_forecast())
+    before = aggregate.stats()['slots_applied']
+    update = aggregate.update(_forecast(bump=MIDNIGHT + 2 * SECONDS_PER_DAY + 10800))
+    assert update.changed == [FIRST_DAY + 2]
+    assert update.days[2].max_temp == 21.0 and update.days[2].temp_mean == 11.125
+    assert aggregate.stats()['slots_applied'] - before == 8
+
+def test_window_moves_by_one_slot():
+    aggregate = IncrementalForecast()
+    aggregate.update(_forecast())
+    update = aggregate.update(_forecast(start=MIDNIGHT + 10800))
+    # The first day lost a slot and the next day gained a partial first slot
+    assert update.changed == [FIRST_DAY, FIRST_DAY + 5]
+    assert update.days[0].slots == 7
+    assert update.days[0].condition == 'Clouds'
+
+def test_same_object_is_a_no_op():
+    aggregate = IncrementalForecast()
+    forecast = _forecast()
+    aggregate.update(forecast)
+    assert aggregate.update(forecast, max_days=5).changed == []
+    assert aggregate.stats()['updates'] == 1
+
+def test_retire_before():
+    aggregate = IncrementalForecast()
+    aggregate.update(_forecast())
+    update = aggregate.retire_before(MIDNIGHT + SECONDS_PER_DAY + 3 * 10800)
+    assert update.changed == [FIRST_DAY, FIRST_DAY + 1]
+    assert update.days[0].day == FIRST_DAY + 1
+    assert (update.days[0].slots, update.days[0].min_temp) == (5, 9.0)
+    assert aggregate.stats()['slots'] == 40 - 11
+    assert aggregate.retire_before(MIDNIGHT).changed == []
+
+def test_timezone_change_rebuilds_every_day():
+    aggregate = IncrementalForecast()
+    aggregate.update(_forecast())
+    update = aggregate.update(_forecast(timezone_offset=-6 * 3600))
+    assert update.days[0].day == FIRST_DAY - 1
+    assert update.days[0].slots == 2
+    assert FIRST_DAY - 1 in update.changed and FIRST_DAY in update.changed
+
+def test_days_past_max_days_are_summarized_on_request():
+    aggregate = IncrementalForecast()
+    forecast = _forecast(slots=44)
+    assert len(aggregate.update(forecast, max_days=2).days) == 2
+    days = aggregate.update(forecast).days
+    assert len(days) == 6
+    assert days[5].slots == 4 and days[5].max_temp == 9.0
+
+def test_day_condition_id_is_its_most_severe():
+    # Light drizzle in the morning, rain in the afternoon whose intensity a refresh revises
+    def forecast(rain_id):
+        return CompactForecast.from_forecast(Forecast(51.5, -0.12, 0, [
+            ForecastSlot(MIDNIGHT + i * 10800, 10.0, 9.0, 11.0, 'Drizzle' if i < 4 else 'Rain',
+                         300 if i < 4 else rain_id, '09n' if i < 2 else '10d', 0.0)
+            for i in range(8)
+        ], 'stub'))
+
+    aggregate = IncrementalForecast()
+    first = aggregate.update(forecast(502)).days[0]
+    assert (first.condition, first.condition_id) == ('Drizzle', 502)
+    # Same condition names, different ids: still a changed day; equally light conditions pick the earliest
+    update = aggregate.update(forecast(500))
+    assert update.changed == [FIRST_DAY]
+    assert update.days[0].condition_id == 300
@@ -0,0 +1,38 @@
+"""
+Tests for the metrics exporter's endpoint startup
+"""
+
+import socket
+import urllib.request
+import pytest
+import metrics
+
+@pytest.fixture
+def exporter(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(metrics, '_http_server', None)
+    yield
+    if metrics._http_server is not None:
+        metrics._http_server.shutdown()
+        metrics._http_server.server_close()
+
+def test_port_in_use_is_logged_and_retried(exporter, caplog):
+    holder = socket.socket()
+    holder.bind((metrics.METRICS_HOST, 0))
+    holder.listen()
+    port = holder.getsockname()[1]
+    try:
+        metrics.start_metrics_exporter(port=port, path='')
+    finally:
+        holder.close()
+    assert metrics._http_server is None
+    assert 'Metrics endpoint not started' in caplog.text
+
+    # Once the port is free a later rerun starts the endpoint
+    metrics.start_metrics_exporter(port=port, path='')
+    assert metrics._http_server is not None
+    with urllib.request.urlopen(f"http://{metrics.METRICS_HOST}:{port}/metrics", timeout=5) as response:
+        assert response.status == 200
+    server = metrics._http_server
+    metrics.start_metrics_exporter(port=port, path='')
+    assert metrics._http_server is server
@@ -0,0 +1,44 @@
+"""
+Tests for who gets a rerun profiled and who sees the summary panel
+"""
+
+from types import SimpleNamespace
+import pytest
+import profiler
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """A fake Streamlit session; returns a function that runs one rerun and reports (profiled, panel shown)"""
+    session = SimpleNamespace(query_params={}, session_state={})
+    monkeypatch.setattr(profiler, 'st', session)
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiler, 'save_profile', lambda profile: str(tmp_path / 'rerun.prof'))
+    panels = []
+    monkeypatch.setattr(profiler, 'render_summary', panels.append)
+
+    def rerun(query=None, operator=False):
+        session.query_params = query or {}
+        session.session_state = {'operator': True} if operator else {}
+        panels.clear()
+        profiled = []
+        profiler.run_profiled(lambda: profiled.append(profiler.is_enabled()))
+        return bool(profiled[0]), bool(panels)
+
+    return rerun
+
+def test_off_by_default(app):
+    assert app() == (False, False)
+    assert app({'profile': 'secret'}) == (False, False)
+
+def test_profile_reruns_shows_the_panel_to_operators_only(app, monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILE_RERUNS', True)
+    assert app() == (True, False)
+    assert app(operator=True) == (True, True)
+
+def test_query_switch_needs_the_operator_token(app, monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILE_QUERY_PARAM', 'profile')
+    monkeypatch.setattr(profiler, 'OPERATOR_TOKEN', 'secret')
+    assert app({'profile': 'secret'}) == (True, True)
+    assert app({'profile': 'guess'}) == (False, False)
+    assert app({'profile': '1'}) == (False, False)
+    assert app({'profile': '1'}, operator=True) == (True, True)
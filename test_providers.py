@@ -0,0 +1,204 @@
+"""
+Offline tests for the provider layer: normalization, failover and racing against stub providers
+"""
+
+import asyncio
+import os
+import time
+import pytest
+import providers
+import resilience
+from models import CurrentWeather, Forecast, ForecastSlot
+from providers import (
+    StubProvider, ProviderPool, ProviderError, LocationNotFound,
+    normalize_owm_current, normalize_owm_forecast, register_provider, get_provider_pool,
+    FAILOVER, RACE
+)
+from quota import api_caller, current_caller
+from http_client import redact
+from mock_server import MockConfig, start_server
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'benchmarks', 'fixtures')
+
+def _current(name):
+    return CurrentWeather(name, 51.5, -0.1, 12.0, 10.0, 14.0, 'Clouds', 'overcast clouds', 804, '04d', 0, name)
+
+FORECAST = Forecast(51.5, -0.1, 0, [ForecastSlot(0, 12.0, 11.0, 13.0, 'Rain', 500, '10d', 0.4)], 'stub')
+
+@pytest.fixture
+def pools():
+    """Build pools that are shut down after the test"""
+    created = []
+
+    def make(stubs, mode=FAILOVER):
+        pool = ProviderPool(stubs, mode=mode)
+        created.append(pool)
+        return pool
+
+    yield make
+    for pool in created:
+        pool.close()
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+def test_normalize_owm_current_fixture():
+    current = normalize_owm_current(_fixture('current_weather.json'))
+    assert isinstance(current, CurrentWeather)
+    assert current.provider == 'openweathermap'
+    assert isinstance(current.temp, float)
+
+def test_normalize_owm_forecast_fixture():
+    forecast = normalize_owm_forecast(_fixture('forecast.json'))
+    assert isinstance(forecast, Forecast)
+    assert forecast.slots
+    assert all(isinstance(slot, ForecastSlot) for slot in forecast.slots)
+
+def test_normalize_rejects_malformed_payload():
+    with pytest.raises(ProviderError):
+        normalize_owm_current(b'{"coord": {}}')
+    with pytest.raises(ProviderError):
+        normalize_owm_forecast(b'not json')
+
+def test_redact_masks_api_key():
+    message = "Max retries exceeded with url: /data/2.5/weather?lat=1&lon=2&appid=SECRETKEY&units=metric"
+    assert redact(message) == "Max retries exceeded with url: /data/2.5/weather?lat=1&lon=2&appid=***&units=metric"
+    assert redact("for url 'http://host/geo?q=x&appid=SECRETKEY'") == "for url 'http://host/geo?q=x&appid=***'"
+
+def test_provider_error_never_carries_api_key(monkeypatch):
+    monkeypatch.setattr(resilience, '_breakers', {})
+    # Nothing listens on the discard port, so every attempt fails with a connection error
+    provider = providers.OpenWeatherMapProvider('SECRETKEY', 'http://127.0.0.1:9/data/2.5')
+    with pytest.raises(ProviderError) as excinfo:
+        provider.current_by_coords(1, 2)
+    assert 'SECRETKEY' not in str(excinfo.value)
+    assert 'weather failed: ConnectionError' in str(excinfo.value)
+    assert excinfo.value.__cause__ is None
+
+def test_failover_skips_failing_provider(pools):
+    pool = pools([StubProvider('down', fail=True), StubProvider('up', current=_current('up'), forecast=FORECAST)])
+    assert pool.current_by_coords(51.5, -0.1).name == 'up'
+    assert pool.forecast(51.5, -0.1) is FORECAST
+    # The failure is remembered, so the healthy provider is now tried first
+    assert [p.name for p in pool.ranked()] == ['up', 'down']
+    assert pool.health['down'].error_rate > 0
+
+def test_failover_prefers_lower_measured_latency(pools):
+    slow = StubProvider('slow', current=_current('slow'), delay=0.05)
+    fast = StubProvider('fast', current=_current('fast'))
+    pool = pools([slow, fast])
+    pool.health['slow'].record(0.05, True)
+    pool.health['fast'].record(0.001, True)
+    assert pool.current_by_city('London').name == 'fast'
+    assert pool.health['slow'].calls == 1
+
+def test_failover_all_failed(pools):
+    pool = pools([StubProvider('a', fail=True), StubProvider('b', fail=True)])
+    with pytest.raises(ProviderError) as excinfo:
+        pool.current_by_city('London')
+    assert not isinstance(excinfo.value, LocationNotFound)
+    assert 'a:' in str(excinfo.value) and 'b:' in str(excinfo.value)
+
+def test_location_not_found_from_every_provider(pools):
+    class Unknown(StubProvider):
+        def current_by_city(self, city):
+            raise LocationNotFound(f"{self.name} does not know {city}")
+
+    pool = pools([Unknown('a'), Unknown('b')])
+    with pytest.raises(LocationNotFound):
+        pool.current_by_city('Atlantis')
+    # Not knowing a place does not count against a provider's health
+    assert pool.health['a'].error_rate == 0.0
+
+def test_race_takes_first_answer(pools):
+    slow = StubProvider('slow', current=_current('slow'), delay=0.5)
+    fast = StubProvider('fast', current=_current('fast'), delay=0.01)
+    pool = pools([slow, fast], mode=RACE)
+    started = time.monotonic()
+    assert pool.current_by_coords(51.5, -0.1).name == 'fast'
+    assert time.monotonic() - started < 0.4
+
+def test_race_falls_back_past_failed_contenders(pools):
+    pool = pools([
+        StubProvider('a', fail=True),
+        StubProvider('b', fail=True),
+        StubProvider('c', forecast=FORECAST),
+    ], mode=RACE)
+    pool.health['c'].record(1.0, True)  # ranked last, so it is not a contender
+    assert pool.forecast(51.5, -0.1) is FORECAST
+    assert pool.health['a'].calls == pool.health['b'].calls == 1
+
+def test_race_keeps_caller_context(pools):
+    seen = []
+
+    class Recording(StubProvider):
+        def current_by_coords(self, lat, lon):
+            seen.append(current_caller())
+            return super().current_by_coords(lat, lon)
+
+    pool = pools([Recording('a', current=_current('a')), Recording('b', current=_current('b'))], mode=RACE)
+    with api_caller('feature'):
+        pool.current_by_coords(51.5, -0.1)
+    time.sleep(0.05)
+    assert seen and set(seen) == {'feature'}
+
+def test_async_failover_uses_the_same_health(pools):
+    pool = pools([StubProvider('down', fail=True), StubProvider('up', current=_current('up'), forecast=FORECAST)])
+    assert asyncio.run(pool.current_by_city_async('London')).name == 'up'
+    assert asyncio.run(pool.forecast_async(51.5, -0.1)) is FORECAST
+    assert [p.name for p in pool.ranked()] == ['up', 'down']
+
+def test_async_race_takes_first_answer(pools):
+    slow = StubProvider('slow', current=_current('slow'), delay=0.5)
+    fast = StubProvider('fast', current=_current('fast'), delay=0.01)
+    pool = pools([slow, fast], mode=RACE)
+
+    async def race():
+        started = time.monotonic()
+        with api_caller('feature'):
+            current = await pool.current_by_coords_async(51.5, -0.1)
+        return current, time.monotonic() - started
+
+    current, elapsed = asyncio.run(race())
+    assert current.name == 'fast'
+    assert elapsed < 0.4
+
+def test_async_race_falls_back_past_failed_contenders(pools):
+    pool = pools([
+        StubProvider('a', fail=True),
+        StubProvider('b', fail=True),
+        StubProvider('c', forecast=FORECAST),
+    ], mode=RACE)
+    pool.health['c'].record(1.0, True)
+    assert asyncio.run(pool.forecast_async(51.5, -0.1)) is FORECAST
+
+def test_openweathermap_async_against_mock_server():
+    server = start_server(MockConfig(latency_median=0.0, latency_p99=0.0, seed=1))
+    provider = providers.OpenWeatherMapProvider('SECRETKEY', f"http://127.0.0.1:{server.server_port}/data/2.5")
+
+    async def fetch():
+        current = await provider.current_by_coords_async(51.5, -0.12)
+        forecast = await provider.forecast_async(51.5, -0.12)
+        with pytest.raises(LocationNotFound):
+            await provider.current_by_city_async('Nowhere')
+        return current, forecast
+
+    try:
+        current, forecast = asyncio.run(fetch())
+    finally:
+        server.shutdown()
+    assert isinstance(current, CurrentWeather) and current.provider == 'openweathermap'
+    assert isinstance(forecast, Forecast) and forecast.slots
+
+def test_get_provider_pool_is_shared(monkeypatch):
+    monkeypatch.setattr(providers, '_registry', {})
+    monkeypatch.setattr(providers, '_pool', None)
+    register_provider(StubProvider('a', fail=True))
+    pool = get_provider_pool()
+    assert get_provider_pool() is pool
+    # Providers registered later join the existing pool and its health
+    register_provider(StubProvider('b', current=_current('b')))
+    assert pool.current_by_coords(0, 0).name == 'b'
+    assert set(pool.health) == {'a', 'b'}
+    pool.close()
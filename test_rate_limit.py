@@ -0,0 +1,92 @@
+"""
+Tests for the token bucket: refill, queue deadlines and priority ordering
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+import rate_limit
+from rate_limit import (
+    TokenBucket, RateLimitTimeout, request_priority, current_priority, default_max_wait,
+    INTERACTIVE, BACKGROUND, INTERACTIVE_MAX_WAIT, BACKGROUND_MAX_WAIT
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+def test_burst_then_steady_rate(clock):
+    bucket = TokenBucket(60, 3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    clock.now += 0.5
+    assert not bucket.try_acquire()
+    clock.now += 0.5
+    assert bucket.try_acquire()
+    assert bucket.stats()['granted'] == 4
+
+def test_refill_is_capped_at_the_burst(clock):
+    bucket = TokenBucket(60, 2)
+    bucket.try_acquire()
+    bucket.try_acquire()
+    clock.now += 3600
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+
+def test_acquire_times_out():
+    bucket = TokenBucket(0.6, 1)
+    bucket.acquire()
+    started = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire(max_wait=0.05)
+    assert time.monotonic() - started < 1
+    assert bucket.stats()['timeouts'] == 1
+    assert bucket.stats()['queued'] == 0
+
+def test_interactive_waiters_are_served_before_background():
+    # One token every 50 ms, none to start with
+    bucket = TokenBucket(1200, 1)
+    bucket.acquire()
+    order = []
+
+    def wait_for_token(name, priority):
+        bucket.acquire(priority=priority, max_wait=5)
+        order.append(name)
+
+    background = threading.Thread(target=wait_for_token, args=('background', BACKGROUND))
+    background.start()
+    time.sleep(0.01)
+    interactive = threading.Thread(target=wait_for_token, args=('interactive', INTERACTIVE))
+    interactive.start()
+    time.sleep(0.01)
+    # Queued interactive work also blocks a background try_acquire
+    assert not bucket.try_acquire(BACKGROUND)
+    background.join()
+    interactive.join()
+    assert order == ['interactive', 'background']
+
+def test_acquire_async_times_out():
+    bucket = TokenBucket(0.6, 1)
+    bucket.acquire()
+    with pytest.raises(RateLimitTimeout):
+        asyncio.run(bucket.acquire_async(max_wait=0.05))
+    asyncio.run(TokenBucket(60, 1).acquire_async(max_wait=0))
+
+def test_request_priority_sets_priority_and_queue_deadline():
+    assert current_priority() == INTERACTIVE
+    assert default_max_wait(INTERACTIVE) == INTERACTIVE_MAX_WAIT
+    with request_priority(BACKGROUND):
+        assert current_priority() == BACKGROUND
+        assert default_max_wait(BACKGROUND) == BACKGROUND_MAX_WAIT
+        with request_priority(BACKGROUND, max_wait=float('inf')):
+            assert default_max_wait(BACKGROUND) == float('inf')
+        assert default_max_wait(BACKGROUND) == BACKGROUND_MAX_WAIT
+    assert current_priority() == INTERACTIVE
@@ -0,0 +1,207 @@
+"""
+Tests for retries, the retry budget and circuit breakers, with a fake clock and a fake send
+"""
+
+import asyncio
+import pytest
+import requests
+import resilience
+import async_http
+from resilience import CircuitBreaker, CircuitOpenError, call_with_retries, CLOSED, OPEN, HALF_OPEN
+from rate_limit import RateLimitTimeout
+
+URL = 'http://upstream.test/data/2.5/weather'
+
+class FakeClock:
+    """Stands in for the time module: monotonic() and a sleep() that only advances it"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class FakeSend:
+    """Returns or raises the scripted outcomes in order, recording each attempt's timeout"""
+
+    def __init__(self, clock, *outcomes, latency=0.1):
+        self.clock = clock
+        self.outcomes = list(outcomes)
+        self.latency = latency
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        self.clock.now += self.latency
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return FakeResponse(outcome) if isinstance(outcome, int) else outcome
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, 'time', clock)
+    # Deterministic backoff: always the full jitter window
+    monkeypatch.setattr(resilience.random, 'uniform', lambda low, high: high)
+    monkeypatch.setattr(resilience, '_breakers', {})
+    return clock
+
+def _call(send, **kwargs):
+    return call_with_retries(send, URL, 3.0, 10.0, **kwargs)
+
+def test_breaker_opens_at_threshold_and_fails_fast(clock):
+    breaker = CircuitBreaker('host', failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.stats()['rejected'] == 1
+
+def test_breaker_half_open_allows_one_probe(clock):
+    breaker = CircuitBreaker('host', failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0 and breaker.allow()
+
+def test_breaker_failed_probe_reopens(clock):
+    breaker = CircuitBreaker('host', failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+def test_retries_until_success(clock):
+    send = FakeSend(clock, 503, 502, 200)
+    assert _call(send).status_code == 200
+    assert len(send.timeouts) == 3
+    assert clock.slept == [0.2, 0.4]
+    assert resilience.get_circuit_breaker(URL).state == CLOSED
+
+def test_client_errors_are_not_retried(clock):
+    send = FakeSend(clock, 404)
+    assert _call(send).status_code == 404
+    assert len(send.timeouts) == 1
+    assert resilience.get_circuit_breaker(URL).failures == 0
+
+def test_retry_after_is_honoured_within_the_budget(clock):
+    send = FakeSend(clock, FakeResponse(429, {'Retry-After': '3'}), 200)
+    assert _call(send).status_code == 200
+    assert clock.slept == [3.0]
+
+def test_budget_ends_retries_with_the_last_response(clock):
+    # A Retry-After past the budget is not waited out
+    send = FakeSend(clock, FakeResponse(503, {'Retry-After': '60'}), 200)
+    assert _call(send, budget=8).status_code == 503
+    assert len(send.timeouts) == 1
+    assert clock.slept == []
+
+def test_attempt_timeouts_shrink_to_the_remaining_budget(clock):
+    send = FakeSend(clock, 503, 200, latency=3.0)
+    _call(send, budget=5)
+    assert send.timeouts[0] == (3.0, 5.0)
+    # 3s for the first attempt and 0.2s of backoff leave 1.8s
+    assert send.timeouts[1] == pytest.approx((1.8, 1.8))
+
+def test_connection_errors_raise_after_the_last_attempt(clock):
+    error = requests.exceptions.ConnectionError('refused')
+    send = FakeSend(clock, error, error, error)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        _call(send)
+    assert len(send.timeouts) == 3
+
+def test_other_request_errors_are_not_retried(clock):
+    send = FakeSend(clock, requests.exceptions.InvalidURL('bad'))
+    with pytest.raises(requests.exceptions.InvalidURL):
+        _call(send)
+    assert len(send.timeouts) == 1
+
+def test_every_attempt_acquires_a_token(clock):
+    waits = []
+    send = FakeSend(clock, 503, 503, 200)
+    _call(send, acquire=lambda max_wait: waits.append(max_wait))
+    # The first attempt waits as long as the limiter allows, retries only for what is left of the budget
+    assert waits[0] is None
+    assert waits[1] == pytest.approx(8 - 0.1 - 0.2)
+    assert len(waits) == 3
+
+def test_no_token_for_a_retry_settles_for_the_last_response(clock):
+    def acquire(max_wait):
+        if max_wait is not None:
+            raise RateLimitTimeout("no token")
+
+    send = FakeSend(clock, 503, 200)
+    assert _call(send, acquire=acquire).status_code == 503
+    assert len(send.timeouts) == 1
+
+def test_late_token_gives_up_without_sending_or_wedging_the_breaker(clock):
+    breaker = resilience.get_circuit_breaker(URL)
+    breaker.failure_threshold = 1
+    breaker.reset_timeout = 5
+
+    def acquire(max_wait):
+        if max_wait is not None:
+            # The token arrives at the deadline, after the breaker's cooldown
+            clock.now += max_wait + 1
+
+    send = FakeSend(clock, requests.exceptions.ConnectionError('refused'), 200)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        _call(send, acquire=acquire)
+    assert len(send.timeouts) == 1
+    # No probe was started, so the next call may probe the host
+    assert breaker.allow() and breaker.state == HALF_OPEN
+
+def test_unexpected_error_releases_the_half_open_probe(clock):
+    breaker = resilience.get_circuit_breaker(URL)
+    breaker.failure_threshold = 1
+    breaker.reset_timeout = 5
+    breaker.record_failure()
+    clock.now += 5
+    send = FakeSend(clock, ValueError('bad timeout'))
+    with pytest.raises(ValueError):
+        _call(send)
+    assert breaker.state == OPEN
+    clock.now += 5
+    assert _call(FakeSend(clock, 200)).status_code == 200
+    assert breaker.state == CLOSED
+
+def test_async_fetch_releases_the_half_open_probe(clock, monkeypatch):
+    monkeypatch.setattr(async_http, 'time', clock)
+
+    async def broken_get(url, host, endpoint, params, timeout):
+        raise ValueError('bad timeout')
+
+    monkeypatch.setattr(async_http, '_counted_get', broken_get)
+    breaker = resilience.get_circuit_breaker(URL)
+    breaker.failure_threshold = 1
+    breaker.reset_timeout = 5
+    breaker.record_failure()
+    clock.now += 5
+    with pytest.raises(ValueError):
+        asyncio.run(async_http.fetch_json(URL))
+    clock.now += 5
+    assert breaker.allow()
@@ -0,0 +1,86 @@
+"""
+Tests for single-flight coalescing of concurrent identical lookups
+"""
+
+import threading
+import time
+import pytest
+from singleflight import SingleFlight
+
+def _run_concurrently(flight, key, fn, callers):
+    """Start callers threads on flight.do(key, fn) while the leader is held; returns their outcomes"""
+    outcomes = [None] * callers
+    release = threading.Event()
+    started = threading.Barrier(callers + 1)
+
+    def held():
+        release.wait(5)
+        return fn()
+
+    def call(index):
+        started.wait()
+        try:
+            outcomes[index] = ('result', flight.do(key, held))
+        except Exception as e:
+            outcomes[index] = ('error', e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    # Let every caller reach do() before the leader finishes
+    while flight.stats()['leaders'] + flight.stats()['coalesced'] < callers:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    outcomes = _run_concurrently(flight, 'london', lambda: calls.append(1) or 'sunny', callers=8)
+    assert outcomes == [('result', 'sunny')] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 7}
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+    error = RuntimeError('upstream down')
+
+    def fail():
+        raise error
+
+    outcomes = _run_concurrently(flight, 'london', fail, callers=4)
+    assert outcomes == [('error', error)] * 4
+    # A failure is not remembered: the next call runs again
+    assert flight.do('london', lambda: 'recovered') == 'recovered'
+    assert flight.in_flight() == 0
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    entered = threading.Barrier(2, timeout=5)
+
+    def both_inside(value):
+        # Only passes if both keys are being fetched at the same time
+        entered.wait()
+        return value
+
+    results = {}
+    threads = [
+        threading.Thread(target=lambda key=key: results.update({key: flight.do(key, lambda: both_inside(key))}))
+        for key in ('london', 'paris')
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {'london': 'london', 'paris': 'paris'}
+    assert flight.stats()['coalesced'] == 0
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    assert [flight.do('k', lambda i=i: i) for i in range(3)] == [0, 1, 2]
+    assert flight.stats()['leaders'] == 3
+    with pytest.raises(ValueError):
+        flight.do('k', lambda: int('x'))
@@ -3,106 +3,314 @@ Weather App Utilities
 Helper functions for weather data processing and UI components
 """
 
-import requests
+import logging
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables before the modules below read their settings
 load_dotenv()
+
+from http_client import http_get, redact
+from conditions import icon_for_condition, classify
+from incremental_forecast import IncrementalForecast
+from compact_forecast import CompactForecast
+from decoding import decode_geocode, decode_ip_location
+from providers import (
+    OpenWeatherMapProvider, ProviderError, LocationNotFound, register_provider, get_provider_pool
+)
+from metrics import REGISTRY, timed
+from quota import get_quota_ledger, api_caller, current_caller, SAVED_CACHE, SAVED_COALESCED
+from cache import TTLCache, FRESH, STALE
+from singleflight import SingleFlight
+from rate_limit import get_rate_limiter, request_priority, BACKGROUND, RateLimitTimeout
+from geocode_store import get_geocode_store, normalize_city_name, NOT_FOUND
+from history import record_current
+
+logger = logging.getLogger(__name__)
+
+# Failures a fetcher turns into a None result (network, HTTP status, bad JSON, no quota)
+FETCH_ERRORS = (requests.exceptions.RequestException, ValueError, RateLimitTimeout)
+
 API_KEY = os.getenv('OPENWEATHER_API_KEY')
 
+# API endpoints (hosts can point at mock_server.py for load testing)
+OPENWEATHER_HOST = os.getenv('OPENWEATHER_HOST', 'http://api.openweathermap.org')
+BASE_URL = f"{OPENWEATHER_HOST}/data/2.5"
+GEOCODING_URL = f"{OPENWEATHER_HOST}/geo/1.0/direct"
+IP_LOCATION_URL = os.getenv('IP_LOCATION_URL', 'http://ip-api.com/json/')
+
+# Weather and forecasts come from the provider pool; OpenWeatherMap is always registered and
+# other backends join it through providers.register_provider()
+register_provider(OpenWeatherMapProvider(API_KEY, BASE_URL))
+
+# Response caches (current conditions change faster than the 5-day forecast)
+CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', '1024'))
+CURRENT_WEATHER_TTL = float(os.getenv('CURRENT_WEATHER_TTL', '600'))
+FORECAST_TTL = float(os.getenv('FORECAST_TTL', '1800'))
+# Past TTL, entries are served while a background refresh runs, up to MAX_STALE
+# seconds; up to STALE_IF_ERROR seconds they are a fallback when the API fails
+CURRENT_WEATHER_MAX_STALE = float(os.getenv('CURRENT_WEATHER_MAX_STALE', '600'))
+FORECAST_MAX_STALE = float(os.getenv('FORECAST_MAX_STALE', '1800'))
+STALE_IF_ERROR = float(os.getenv('STALE_IF_ERROR', '21600'))
+current_weather_cache = TTLCache(CACHE_SIZE, CURRENT_WEATHER_TTL, name='current_weather',
+                                 max_stale=CURRENT_WEATHER_MAX_STALE, stale_if_error=STALE_IF_ERROR)
+forecast_cache = TTLCache(CACHE_SIZE, FORECAST_TTL, name='forecast',
+                          max_stale=FORECAST_MAX_STALE, stale_if_error=STALE_IF_ERROR)
+
+# Running daily aggregates per forecast location, so a refreshed forecast only
+# recomputes the days whose slots changed (and a rerun on the same forecast, none)
+forecast_aggregates = TTLCache(CACHE_SIZE, FORECAST_TTL + FORECAST_MAX_STALE + STALE_IF_ERROR,
+                               name='forecast_aggregates')
+
+# Identical lookups already in flight (from any session/thread) share one request
+_flight = SingleFlight()
+
+# Persistent city -> coordinates store, warm-loaded from disk at startup
+geocode_store = get_geocode_store()
+
+# Worker pool for fetching current conditions and forecast side by side
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', '8'))
+_fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='weather-fetch')
+
+# Worker pool for background revalidation of stale cache entries
+REFRESH_WORKERS = int(os.getenv('REFRESH_WORKERS', '2'))
+_refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='weather-refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
 def get_weather_icon(condition):
     """Get weather icon based on condition"""
-    icons = {
-        'clear': '☀️',
-        'clouds': '☁️',
-        'rain': '🌧️',
-        'drizzle': '🌦️',
-        'thunderstorm': '⛈️',
-        'snow': '❄️',
-        'mist': '🌫️',
-        'fog': '🌫️',
-        'haze': '🌫️'
-    }
-    for key, icon in icons.items():
-        if key in condition.lower():
-            return icon
-    return '🌤️'
+    return icon_for_condition(condition)
+
+def get_condition_icon(condition_id, icon_code=None, condition=''):
+    """Get the condition table's icon for a condition id, the night variant for a night icon code ('..n')
+
+    Records from a provider without OpenWeatherMap ids fall back to the icon for the condition name.
+    """
+    style = classify(condition_id, icon_code)
+    if not style.id and condition:
+        return get_weather_icon(condition)
+    return style.emoji
+
+def _city_key(city):
+    """Normalize a city name into a cache key"""
+    return ('city', normalize_city_name(city))
+
+def _coords_key(kind, lat, lon):
+    """Round coordinates into a cache key (3 decimals is ~100 m)"""
+    return (kind, round(float(lat), 3), round(float(lon), 3))
+
+def _cached(cache, key, fetch):
+    """Return a cached response or fetch and store it; failures are not cached"""
+    data, state = cache.lookup(key)
+    if state == FRESH:
+        get_quota_ledger().record_saved(SAVED_CACHE)
+        return data
+    if state == STALE:
+        # Serve now, revalidate off the request path
+        _refresh_in_background(cache, key, fetch)
+        return data
+    led = []
+
+    def lead():
+        led.append(True)
+        return _fetch_and_store(cache, key, fetch)
+
+    fresh = _flight.do(key, lead)
+    if not led:
+        get_quota_ledger().record_saved(SAVED_COALESCED)
+    if fresh is None and data is not None:
+        # Upstream failed: an old answer beats an error page
+        cache.record_stale_fallback()
+        return data
+    return fresh
+
+def _refresh_in_background(cache, key, fetch):
+    """Schedule one background refresh per key"""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    caller = current_caller()
+
+    def refresh():
+        try:
+            # Background traffic yields API quota to interactive searches
+            with request_priority(BACKGROUND), api_caller(caller):
+                _flight.do(key, lambda: _fetch_and_store(cache, key, fetch))
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
 
+    _refresh_executor.submit(refresh)
+
+def _fetch_and_store(cache, key, fetch):
+    """Fetch a response and cache it if the fetch succeeded"""
+    data = fetch()
+    if data is not None:
+        cache.set(key, data)
+    return data
+
+def _owm_get(url, params):
+    """Send an OpenWeatherMap request (geocoding), spending one of the API key's rate-limit tokens per attempt"""
+    limiter = get_rate_limiter(API_KEY)
+    # A hedged duplicate only goes out if there is spare quota right now
+    return http_get(url, params=params, acquire=limiter.acquire,
+                    may_hedge=lambda: limiter.try_acquire(BACKGROUND))
+
+def get_cache_stats():
+    """Get hit/miss/eviction counters for the response caches"""
+    return [current_weather_cache.stats(), forecast_cache.stats(), geocode_store.stats()]
+
+def get_coalescing_stats():
+    """Get counters for lookups that shared an in-flight request"""
+    return _flight.stats()
+
+def _collect_metrics():
+    """Cache and coalescing gauges, read when metrics are scraped rather than per request"""
+    caches = get_cache_stats()
+    return [
+        ('weather_cache_hit_ratio', 'Fraction of lookups served from cache', ('cache',),
+         {(c['name'],): c['hit_ratio'] for c in caches}),
+        ('weather_cache_entries', 'Entries held per cache', ('cache',),
+         {(c['name'],): c['size'] for c in caches}),
+        ('weather_coalesced_in_flight', 'Distinct lookups currently being fetched', (),
+         {(): _flight.in_flight()}),
+    ]
+
+REGISTRY.register_collector(_collect_metrics)
+
+@api_caller('get_forecast_data')
 def get_forecast_data(lat, lon):
-    """Get 5-day forecast data"""
-    url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
+    """Get the 5-day forecast as a CompactForecast (cached for FORECAST_TTL seconds)"""
+    return _cached(forecast_cache, _coords_key('forecast', lat, lon),
+                   lambda: _fetch_forecast_data(lat, lon))
+
+def _fetch_forecast_data(lat, lon):
+    """Fetch the 5-day forecast from the provider pool"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
-    except:
+        return CompactForecast.from_forecast(get_provider_pool().forecast(lat, lon))
+    except ProviderError as e:
+        logger.warning("Forecast fetch failed for (%s, %s): %s", lat, lon, e)
         return None
 
+@api_caller('get_location_by_ip')
 def get_location_by_ip():
     """Get approximate location using IP geolocation"""
     try:
-        response = requests.get('http://ip-api.com/json/')
+        response = http_get(IP_LOCATION_URL)
         if response.status_code == 200:
-            data = response.json()
-            if data['status'] == 'success':
-                return data['lat'], data['lon'], data['city']
-    except:
-        pass
+            location = decode_ip_location(response.content)
+            if location:
+                return location
+    except FETCH_ERRORS as e:
+        logger.warning("IP geolocation failed: %s", e)
     return None, None, None
 
+@api_caller('get_weather_by_coords')
 def get_weather_by_coords(lat, lon):
-    """Get weather data using coordinates"""
-    url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
+    """Get CurrentWeather using coordinates (cached for CURRENT_WEATHER_TTL seconds)"""
+    return _cached(current_weather_cache, _coords_key('weather', lat, lon),
+                   lambda: _fetch_weather_by_coords(lat, lon))
+
+def _fetch_weather_by_coords(lat, lon):
+    """Fetch current weather by coordinates from the provider pool"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
-    except:
+        return record_current(get_provider_pool().current_by_coords(lat, lon))
+    except ProviderError as e:
+        logger.warning("Weather fetch failed for (%s, %s): %s", lat, lon, e)
         return None
 
+@api_caller('get_weather_by_city')
 def get_weather_by_city(city):
-    """Get weather data by city name"""
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
+    """Get CurrentWeather by city name (cached for CURRENT_WEATHER_TTL seconds)"""
+    if geocode_store.lookup(city) is NOT_FOUND:
+        return None
+    data = _cached(current_weather_cache, _city_key(city), lambda: _fetch_weather_by_city(city))
+    if data:
+        geocode_store.record(city, data.lat, data.lon, data.name)
+    return data
+
+def _fetch_weather_by_city(city):
+    """Fetch current weather by city name from the provider pool"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
-    except:
+        return record_current(get_provider_pool().current_by_city(city))
+    except LocationNotFound:
+        geocode_store.record_missing(city)
+        return None
+    except ProviderError as e:
+        logger.warning("Weather fetch failed for %r: %s", city, e)
         return None
 
-def process_forecast_data(forecast_data):
-    """Process forecast data into daily summaries"""
+@api_caller('get_coordinates')
+def get_coordinates(city_name):
+    """Get coordinates for a city using OpenWeatherMap Geocoding API"""
+    cached = geocode_store.lookup(city_name)
+    if cached is NOT_FOUND:
+        return None, None, None
+    if cached:
+        return cached
+    params = {'q': city_name, 'limit': 1, 'appid': API_KEY}
+    try:
+        response = _owm_get(GEOCODING_URL, params)
+        response.raise_for_status()
+        match = decode_geocode(response.content)
+    except FETCH_ERRORS as e:
+        logger.warning("Geocoding failed for %r: %s", city_name, redact(e))
+        return None, None, None
+    if match:
+        geocode_store.record(city_name, *match)
+        return match
+    geocode_store.record_missing(city_name)
+    return None, None, None
+
+def get_weather_and_forecast(city=None, lat=None, lon=None):
+    """Get (CurrentWeather, Forecast), fetching both in parallel when coordinates are known"""
+    if lat is None or lon is None:
+        coords = geocode_store.lookup(city)
+        if coords is NOT_FOUND:
+            return None, None
+        if coords is None:
+            # Unknown city: the current weather lookup is what tells us where it is
+            current_data = get_weather_by_city(city)
+            if not current_data:
+                return None, None
+            return current_data, get_forecast_data(current_data.lat, current_data.lon)
+        lat, lon = coords[0], coords[1]
+
+    forecast_future = _fetch_executor.submit(get_forecast_data, lat, lon)
+    if city:
+        current_data = get_weather_by_city(city)
+    else:
+        current_data = get_weather_by_coords(lat, lon)
+    return current_data, forecast_future.result()
+
+@timed('aggregate')
+def process_forecast_data(forecast_data, max_days=5):
+    """Process a CompactForecast (or Forecast) into summaries of its first max_days local days"""
     if not forecast_data:
         return []
-    
-    # Group forecast by day
-    daily_forecasts = {}
-    for item in forecast_data['list']:
-        date = datetime.fromtimestamp(item['dt']).date()
-        if date not in daily_forecasts:
-            daily_forecasts[date] = {
-                'temps': [],
-                'condition': item['weather'][0]['main'],
-                'icon': get_weather_icon(item['weather'][0]['main'])
-            }
-        daily_forecasts[date]['temps'].append(item['main']['temp'])
-    
-    # Convert to list format with day names
-    days = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-    forecast_list = []
-    
-    for i, (date, data) in enumerate(list(daily_forecasts.items())[:5]):
-        day_name = days[i] if i < len(days) else date.strftime("%a")
-        min_temp = min(data['temps'])
-        max_temp = max(data['temps'])
-        
-        forecast_list.append({
-            'day': day_name,
-            'icon': data['icon'],
-            'max_temp': int(max_temp),
-            'min_temp': int(min_temp)
-        })
-    
-    return forecast_list
+    return [
+        {
+            'day': day.weekday,
+            # Forecast days are drawn in their daytime variant, by the day's most severe condition
+            'icon': get_condition_icon(day.condition_id, condition=day.condition),
+            'max_temp': int(day.max_temp),
+            'min_temp': int(day.min_temp)
+        }
+        for day in update_forecast_aggregate(forecast_data, max_days).days
+    ]
+
+def update_forecast_aggregate(forecast_data, max_days=None):
+    """Merge a forecast into its location's running daily aggregates; returns a ForecastUpdate"""
+    if forecast_data.lat is None or forecast_data.lon is None:
+        return IncrementalForecast().update(forecast_data, max_days)
+    key = _coords_key('forecast_days', forecast_data.lat, forecast_data.lon)
+    aggregate = forecast_aggregates.get(key)
+    if aggregate is None:
+        aggregate = IncrementalForecast()
+        forecast_aggregates.set(key, aggregate)
+    return aggregate.update(forecast_data, max_days)
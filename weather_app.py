@@ -3,6 +3,8 @@ import requests
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from http_client import http_get
+from conditions import icon_for_condition
 
 # Load API key from environment
 load_dotenv()
@@ -188,41 +190,27 @@ st.markdown("""
 
 def get_weather_icon(condition):
     """Get weather icon based on condition"""
-    icons = {
-        'clear': '☀️',
-        'clouds': '☁️',
-        'rain': '🌧️',
-        'drizzle': '🌦️',
-        'thunderstorm': '⛈️',
-        'snow': '❄️',
-        'mist': '🌫️',
-        'fog': '🌫️',
-        'haze': '🌫️'
-    }
-    for key, icon in icons.items():
-        if key in condition.lower():
-            return icon
-    return '🌤️'
+    return icon_for_condition(condition)
 
 def get_forecast_data(lat, lon):
     """Get 5-day forecast data"""
     url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
     try:
-        response = requests.get(url)
+        response = http_get(url)
         response.raise_for_status()
         return response.json()
-    except:
+    except (requests.exceptions.RequestException, ValueError):
         return None
 
 def get_location_by_ip():
     """Get approximate location using IP geolocation"""
     try:
-        response = requests.get('http://ip-api.com/json/')
+        response = http_get('http://ip-api.com/json/')
         if response.status_code == 200:
             data = response.json()
             if data['status'] == 'success':
                 return data['lat'], data['lon'], data['city']
-    except:
+    except (requests.exceptions.RequestException, ValueError, KeyError):
         pass
     return None, None, None
 
@@ -230,10 +218,10 @@ def get_weather_by_coords(lat, lon):
     """Get weather data using coordinates"""
     url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
     try:
-        response = requests.get(url)
+        response = http_get(url)
         response.raise_for_status()
         return response.json()
-    except:
+    except (requests.exceptions.RequestException, ValueError):
         return None
 
 # Search inputs
@@ -281,7 +269,7 @@ if (city and search_btn) or use_auto_location:
                     st.stop()
             else:
                 current_url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
-                current_response = requests.get(current_url)
+                current_response = http_get(current_url)
                 current_response.raise_for_status()
                 current_data = current_response.json()
                 lat = current_data['coord']['lat']
@@ -6,6 +6,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 import os
 from dotenv import load_dotenv
+from http_client import http_get
+from conditions import classify, classify_icon
+from geocode_store import get_geocode_store, NOT_FOUND
 
 # Load environment variables
 load_dotenv()
@@ -159,8 +162,17 @@ if not API_KEY:
     st.error("⚠️ OpenWeatherMap API key not found! Please check your .env file.")
     st.stop()
 
+# City coordinates persisted across runs
+geocode_store = get_geocode_store()
+
 def get_coordinates(city_name):
     """Get coordinates for a city using OpenWeatherMap Geocoding API"""
+    cached = geocode_store.lookup(city_name)
+    if cached is NOT_FOUND:
+        return None, None, None
+    if cached:
+        return cached
+    
     geocoding_url = f"http://api.openweathermap.org/geo/1.0/direct"
     params = {
         'q': city_name,
@@ -169,13 +181,15 @@ def get_coordinates(city_name):
     }
     
     try:
-        response = requests.get(geocoding_url, params=params)
+        response = http_get(geocoding_url, params=params)
         response.raise_for_status()
         data = response.json()
         
         if data:
+            geocode_store.record(city_name, data[0]['lat'], data[0]['lon'], data[0]['name'])
             return data[0]['lat'], data[0]['lon'], data[0]['name']
         else:
+            geocode_store.record_missing(city_name)
             return None, None, None
     except requests.exceptions.RequestException:
         return None, None, None
@@ -191,7 +205,7 @@ def get_current_weather(lat, lon):
     }
     
     try:
-        response = requests.get(current_url, params=params)
+        response = http_get(current_url, params=params)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -200,34 +214,11 @@ def get_current_weather(lat, lon):
 
 def get_weather_emoji(icon_code):
     """Get emoji based on weather icon code"""
-    icon_map = {
-        '01d': '☀️', '01n': '🌙',
-        '02d': '⛅', '02n': '☁️',
-        '03d': '☁️', '03n': '☁️',
-        '04d': '☁️', '04n': '☁️',
-        '09d': '🌧️', '09n': '🌧️',
-        '10d': '🌦️', '10n': '🌧️',
-        '11d': '⛈️', '11n': '⛈️',
-        '13d': '❄️', '13n': '❄️',
-        '50d': '🌫️', '50n': '🌫️'
-    }
-    return icon_map.get(icon_code, '🌤️')
+    return classify_icon(icon_code).emoji
 
-def get_weather_background(weather_condition, is_day=True):
-    """Get dynamic background based on weather condition"""
-    if 'clear' in weather_condition.lower():
-        if is_day:
-            return "linear-gradient(135deg, #74b9ff 0%, #0984e3 50%, #fdcb6e 100%)"
-        else:
-            return "linear-gradient(135deg, #2d3436 0%, #636e72 50%, #74b9ff 100%)"
-    elif 'cloud' in weather_condition.lower():
-        return "linear-gradient(135deg, #636e72 0%, #74b9ff 50%, #ddd 100%)"
-    elif 'rain' in weather_condition.lower():
-        return "linear-gradient(135deg, #2d3436 0%, #636e72 50%, #74b9ff 100%)"
-    elif 'snow' in weather_condition.lower():
-        return "linear-gradient(135deg, #ddd 0%, #74b9ff 50%, #fff 100%)"
-    else:
-        return "linear-gradient(135deg, #667eea 0%, #764ba2 100%)"
+def get_weather_background(condition_id, icon_code):
+    """Get dynamic background based on weather condition id and day/night icon"""
+    return classify(condition_id, icon_code).background
 
 # Main app
 st.markdown('<h1 class="main-title">🌤️ Weather</h1>', unsafe_allow_html=True)
@@ -268,12 +259,12 @@ if 'current_weather' in st.session_state:
     
     # Get weather-based styling
     weather_condition = current_weather['weather'][0]['description']
+    condition_id = current_weather['weather'][0]['id']
     icon_code = current_weather['weather'][0]['icon']
-    is_day = 'd' in icon_code
     temp = current_weather['main']['temp']
     
     # Dynamic background based on weather
-    dynamic_bg = get_weather_background(weather_condition, is_day)
+    dynamic_bg = get_weather_background(condition_id, icon_code)
     
     # Temperature color coding
     if temp >= 30:
@@ -4,6 +4,8 @@ import pandas as pd
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from http_client import http_get
+from geocode_store import get_geocode_store, NOT_FOUND
 
 # Load environment variables
 load_dotenv()
@@ -24,8 +26,17 @@ if not API_KEY:
     st.error("⚠️ OpenWeatherMap API key not found! Please check your .env file.")
     st.stop()
 
+# City coordinates persisted across runs
+geocode_store = get_geocode_store()
+
 def get_coordinates(city_name):
     """Get coordinates for a city using OpenWeatherMap Geocoding API"""
+    cached = geocode_store.lookup(city_name)
+    if cached is NOT_FOUND:
+        return None, None, None
+    if cached:
+        return cached
+    
     geocoding_url = f"http://api.openweathermap.org/geo/1.0/direct"
     params = {
         'q': city_name,
@@ -34,13 +45,15 @@ def get_coordinates(city_name):
     }
     
     try:
-        response = requests.get(geocoding_url, params=params)
+        response = http_get(geocoding_url, params=params)
         response.raise_for_status()
         data = response.json()
         
         if data:
+            geocode_store.record(city_name, data[0]['lat'], data[0]['lon'], data[0]['name'])
             return data[0]['lat'], data[0]['lon'], data[0]['name']
         else:
+            geocode_store.record_missing(city_name)
             return None, None, None
     except requests.exceptions.RequestException:
         return None, None, None
@@ -56,7 +69,7 @@ def get_current_weather(lat, lon):
     }
     
     try:
-        response = requests.get(current_url, params=params)
+        response = http_get(current_url, params=params)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e: